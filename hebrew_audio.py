@@ -0,0 +1,418 @@
+"""
+   Audio playback for the Hebrew Studies app.
+
+   The pygame mixer plays a clip on its own, the only thing that
+  used to freeze the window was waiting for the clip to finish.
+  The AudioPlayer does that waiting on a background thread and
+  posts the result back to the Tk main loop through a TkDispatcher
+  so the app stays responsive while the audio plays.
+
+   Decoded clips are kept in a SoundCache and the clips likely to
+  be played next can be decoded ahead of time on a prefetch thread
+  so stepping through a lesson doesn't wait on the MP3 decoder.
+
+   pygame is only imported, and its mixer initialized, the first time
+  a clip is played, so neither slows down the start of the app, nor
+  does a missing sound device until audio is wanted. Nothing is
+  prefetched until then.
+
+"""
+
+import collections
+import queue
+import threading
+import traceback
+
+#  Imported by AudioPlayer.start_mixer the first time it's needed
+pygame = None
+
+# How often, in seconds, the player checks whether a clip has finished
+POLL_INTERVAL = 0.01
+
+# Memory, in bytes, the decoded clips in the SoundCache may use
+CACHE_BUDGET = 64 * 1024 * 1024
+
+# Number of clips after the current one decoded ahead of time
+PREFETCH_COUNT = 3
+
+
+#_____________________________________
+#            sound_size
+#_____________________________________
+def sound_size(sound):
+    """
+       Returns the number of bytes of decoded samples held by the
+      pygame Sound, i.e. its length times the mixer's frequency,
+      channels and sample size.
+    """
+    frequency, sample_format, channels = pygame.mixer.get_init()
+    sample_bytes = abs(sample_format) // 8
+    return int(sound.get_length() * frequency) * channels * sample_bytes
+
+
+#====================================================================
+#                           SoundCache
+#====================================================================
+class SoundCache():
+    """
+       A least recently used cache of decoded pygame Sounds keyed by
+      their file paths. Once the decoded samples use more than budget
+      bytes the least recently used Sounds are dropped.
+       The cache is shared by the player and the prefetch threads so
+      every access holds its lock. Files are decoded outside the lock.
+    """
+    def __init__(self, budget=CACHE_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self.sounds = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    #_____________________________________
+    #               get
+    #_____________________________________
+    def get(self, path):
+        """
+           Returns the Sound for the file, decoding it and adding
+          it to the cache if it isn't already there.
+        """
+        with self.lock:
+            if path in self.sounds:
+                self.sounds.move_to_end(path)
+                return self.sounds[path][0]
+        sound = pygame.mixer.Sound(path)
+        self.add(path, sound)
+        return sound
+
+    #_____________________________________
+    #               add
+    #_____________________________________
+    def add(self, path, sound):
+        """
+           Adds the Sound as the most recently used and drops the least
+          recently used Sounds until the cache is within its budget.
+          The Sound just added is never dropped.
+        """
+        size = sound_size(sound)
+        with self.lock:
+            if path in self.sounds:
+                self.size -= self.sounds.pop(path)[1]
+            self.sounds[path] = (sound, size)
+            self.size += size
+            while self.size > self.budget and len(self.sounds) > 1:
+                _, (_, dropped) = self.sounds.popitem(last=False)
+                self.size -= dropped
+
+    #_____________________________________
+    #            __contains__
+    #_____________________________________
+    def __contains__(self, path):
+        """
+           True if the file's Sound is in the cache.
+        """
+        with self.lock:
+            return path in self.sounds
+
+    #_____________________________________
+    #               clear
+    #_____________________________________
+    def clear(self):
+        """
+           Drops every Sound in the cache.
+        """
+        with self.lock:
+            self.sounds.clear()
+            self.size = 0
+
+
+#====================================================================
+#                              Clip
+#====================================================================
+class Clip():
+    """
+       An audio file waiting to be played or playing along with the
+      functions to call when it's done.
+        on_done(completed) is called with True if the clip played to
+      the end and False if it was stopped or interrupted.
+        on_error(exception) is called if the file couldn't be played.
+    """
+    def __init__(self, path, on_done=None, on_error=None):
+        self.path = path
+        self.on_done = on_done
+        self.on_error = on_error
+
+
+#====================================================================
+#                           AudioPlayer
+#====================================================================
+class AudioPlayer():
+    """
+       Plays audio files one after the other on a background thread.
+        play()      stops whatever is playing, drops the queue and
+                    plays the file straight away.
+        queue()     plays the file once everything before it is done.
+        interrupt() stops the current file and goes on to the next.
+        stop()      stops the current file and drops the queue.
+        prefetch()  decodes the files on the prefetch thread so they're
+                    ready in the cache when they're played.
+       The commands return immediately and the completion callbacks
+      of each clip are called on the Tk main loop by the dispatcher.
+    """
+    def __init__(self, dispatcher=None, cache=None):
+        self.dispatcher = dispatcher
+        self.cache = cache if cache is not None else SoundCache()
+        self.commands = queue.SimpleQueue()
+        self.pending = []
+        self.current = None
+        self.channel = None
+        self.mixer_started = False
+        self.mixer_error = None
+        self.mixer_lock = threading.Lock()
+        self.prefetch_paths = []
+        self.prefetch_ready = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name='AudioPlayer',
+                                       daemon=True)
+        self.thread.start()
+        self.prefetcher = threading.Thread(target=self.run_prefetch,
+                                           name='AudioPrefetch', daemon=True)
+        self.prefetcher.start()
+
+    #_____________________________________
+    #               run
+    #_____________________________________
+    def run(self):
+        """
+           Carries out the commands until close() is called. While a
+          clip is playing it checks every POLL_INTERVAL seconds whether
+          it has finished.
+        """
+        while True:
+            try:
+                if self.current:
+                    command = self.commands.get(timeout=POLL_INTERVAL)
+                else:
+                    command = self.commands.get()
+            except queue.Empty:
+                command = ()
+            if command is None:
+                break
+            if command:
+                action, clip = command
+                if action == 'play':
+                    self.finish_current(completed=False)
+                    self.drop_pending()
+                    self.pending.append(clip)
+                elif action == 'queue':
+                    self.pending.append(clip)
+                elif action == 'interrupt':
+                    self.finish_current(completed=False)
+                elif action == 'stop':
+                    self.finish_current(completed=False)
+                    self.drop_pending()
+            elif not self.channel.get_busy():
+                self.finish_current(completed=True)
+
+            if not self.current and self.pending:
+                self.start(self.pending.pop(0))
+
+        self.finish_current(completed=False)
+        self.drop_pending()
+        with self.prefetch_ready:
+            self.prefetch_paths = None
+            self.prefetch_ready.notify()
+        self.prefetcher.join()
+        self.cache.clear()
+        if self.mixer_started and not self.mixer_error:
+            pygame.mixer.quit()
+
+    #_____________________________________
+    #            start_mixer
+    #_____________________________________
+    def start_mixer(self):
+        """
+           Imports pygame and initializes its mixer the first time it's
+          called by the player thread, then lets the prefetch thread
+          start decoding. Returns the error that stopped the mixer from
+          starting, if there was one.
+        """
+        global pygame
+
+        with self.mixer_lock:
+            if self.mixer_started:
+                return self.mixer_error
+            self.mixer_started = True
+            try:
+                import pygame
+                pygame.mixer.init()
+            except Exception as err:
+                self.mixer_error = err
+                traceback.print_exc()
+        with self.prefetch_ready:
+            self.prefetch_ready.notify()
+        return self.mixer_error
+
+    #_____________________________________
+    #            run_prefetch
+    #_____________________________________
+    def run_prefetch(self):
+        """
+           Decodes the files passed to prefetch() into the cache one
+          at a time, most urgent first, until the player is closed.
+           It waits for the player thread to start the mixer when the
+          first clip is played, so prefetching never starts it.
+        """
+        while True:
+            with self.prefetch_ready:
+                while self.prefetch_paths is not None and \
+                      (self.prefetch_paths == [] or not self.mixer_started):
+                    self.prefetch_ready.wait()
+                if self.prefetch_paths is None:
+                    break
+                path = self.prefetch_paths.pop(0)
+            #  Waits for the player thread to finish starting the mixer
+            if self.start_mixer():
+                break
+            if path in self.cache:
+                continue
+            try:
+                self.cache.get(path)
+            except Exception as err:
+                #  The file will be reported if and when it's played
+                print(f'Unable to prefetch {path}: {err}')
+
+    #_____________________________________
+    #               start
+    #_____________________________________
+    def start(self, clip):
+        """
+           Starts playing the clip's Sound, decoding it first if it
+          isn't in the cache.
+        """
+        try:
+            if self.start_mixer():
+                raise self.mixer_error
+            sound = self.cache.get(clip.path)
+            self.channel = sound.play()
+            if self.channel is None:
+                #  Force a channel if all of them are somehow in use
+                self.channel = pygame.mixer.find_channel(True)
+                self.channel.play(sound)
+            self.current = clip
+        except Exception as err:
+            self.post(clip.on_error, err)
+
+    #_____________________________________
+    #          finish_current
+    #_____________________________________
+    def finish_current(self, completed):
+        """
+           Stops the current clip, if there is one, and reports
+          whether it played to the end.
+        """
+        if self.current:
+            if not completed:
+                self.channel.stop()
+            clip, self.current = self.current, None
+            self.channel = None
+            self.post(clip.on_done, completed)
+
+    #_____________________________________
+    #           drop_pending
+    #_____________________________________
+    def drop_pending(self):
+        """
+           Drops the queued clips. Each one is reported as not
+          completed.
+        """
+        pending, self.pending = self.pending, []
+        for clip in pending:
+            self.post(clip.on_done, False)
+
+    #_____________________________________
+    #               post
+    #_____________________________________
+    def post(self, function, *args):
+        """
+           Calls the function on the Tk main loop, or straight away
+          if the player has no dispatcher.
+        """
+        if function is None:
+            return
+        if self.dispatcher:
+            self.dispatcher.post(function, *args)
+        else:
+            try:
+                function(*args)
+            except Exception:
+                traceback.print_exc()
+
+    #_____________________________________
+    #               play
+    #_____________________________________
+    def play(self, path, on_done=None, on_error=None):
+        """
+           Plays the file now, stopping anything already playing
+          or queued.
+        """
+        self.commands.put(('play', Clip(path, on_done, on_error)))
+
+    #_____________________________________
+    #               queue
+    #_____________________________________
+    def queue(self, path, on_done=None, on_error=None):
+        """
+           Plays the file after the files already queued.
+        """
+        self.commands.put(('queue', Clip(path, on_done, on_error)))
+
+    #_____________________________________
+    #             prefetch
+    #_____________________________________
+    def prefetch(self, paths):
+        """
+           Decodes the files, in order, on the prefetch thread.
+          Replaces any files still waiting from an earlier call since
+          they're no longer the ones coming up next.
+        """
+        with self.prefetch_ready:
+            if self.prefetch_paths is not None:
+                self.prefetch_paths = list(paths)
+                self.prefetch_ready.notify()
+
+    #_____________________________________
+    #            interrupt
+    #_____________________________________
+    def interrupt(self):
+        """
+           Stops the current file and goes on to the next one queued.
+        """
+        self.commands.put(('interrupt', None))
+
+    #_____________________________________
+    #               stop
+    #_____________________________________
+    def stop(self):
+        """
+           Stops the current file and drops the queued ones.
+        """
+        self.commands.put(('stop', None))
+
+    #_____________________________________
+    #               busy
+    #_____________________________________
+    @property
+    def busy(self):
+        """
+           True while a file is playing or waiting to be played.
+        """
+        return self.current is not None or len(self.pending) > 0
+
+    #_____________________________________
+    #               close
+    #_____________________________________
+    def close(self, wait=True):
+        """
+           Stops playing and shuts down the mixer.
+        """
+        self.commands.put(None)
+        if wait:
+            self.thread.join()
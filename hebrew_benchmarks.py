@@ -0,0 +1,747 @@
+"""
+   Micro-benchmarks for the Hebrew Studies app. Each benchmark
+  runs against a copy of the data in hebrew_studies.db and prints
+  its timings.
+
+   Usage:
+       python hebrew_benchmarks.py                 runs all of them
+       python hebrew_benchmarks.py remove_niqqud   runs just one
+
+   Benchmarks: remove_niqqud, statement_cache, study_sheet, streaming_sheet,
+               topic_search, fuzzy_search, completion, tracing,
+               query_plans, query_pager, startup, media_index
+
+"""
+
+import contextlib
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import hebrew_db
+import hebrew_media
+import hebrew_repository
+import hebrew_search
+import hebrew_sheets
+import hebrew_text
+import hebrew_trace
+import hebrew_workers
+
+HEBREW_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'hebrew_studies.db')
+
+#  The speed up over the original AudioMgr.remove_niqqud that the
+# bulk niqqud removal, remove_niqqud_column, was asked to reach.
+NIQQUD_SPEED_UP_GOAL = 10
+
+
+#_____________________________________
+#           report
+#_____________________________________
+def report(name, seconds, count, unit='calls'):
+    """
+       Prints the total time and the time per item of a benchmark.
+    """
+    per_item = seconds / count * 1e6 if count else 0
+    print(f'  {name:<34} {seconds * 1000:10.3f} ms'
+          f'  {per_item:10.3f} us per {unit[:-1]}  ({count} {unit})')
+
+
+#_____________________________________
+#           best_time
+#_____________________________________
+def best_time(function, number=10, repeat=5):
+    """
+       Returns the best time in seconds of a single run of the function.
+    """
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+#_____________________________________
+#        benchmark_remove_niqqud
+#_____________________________________
+def benchmark_remove_niqqud(db_path=HEBREW_DB):
+    """
+       Compares removing the niqqud from the HEBREW column of the
+      HEBREW_AUDIO table with the original AudioMgr.remove_niqqud,
+      which made 25 str.replace passes and traced every call, and
+      with the hebrew_text functions, and reports whether the bulk
+      remove_niqqud_column reaches the NIQQUD_SPEED_UP_GOAL. A call
+      per value, however fast, is held back by the Python call
+      itself so remove_niqqud's speed up is only reported.
+    """
+    def display_function(name):
+        print(f'>>>>> Running {name} ')
+
+    def legacy_remove_niqqud(string):
+        current_function = sys._getframe().f_code.co_name
+        display_function(current_function)
+        for n in hebrew_text.NIQQUD:
+            string = string.replace(n, '')
+        for dotted, plain in hebrew_text.DOTTED_LETTERS.items():
+            string = string.replace(dotted, plain)
+        print(string)
+        return string.strip()
+
+    with sqlite3.connect(db_path) as connection:
+        column = [row[0] for row in
+                  connection.execute('SELECT hebrew FROM hebrew_audio;')]
+
+    with open(os.devnull, 'w') as devnull, \
+         contextlib.redirect_stdout(devnull):
+        expected = [legacy_remove_niqqud(text) for text in column]
+        legacy = best_time(lambda: [legacy_remove_niqqud(text)
+                                    for text in column])
+    assert hebrew_text.remove_niqqud_column(column) == expected
+    assert [hebrew_text.remove_niqqud(text) for text in column] == expected
+
+    per_row = best_time(lambda: [hebrew_text.remove_niqqud(text)
+                                 for text in column])
+    bulk = best_time(lambda: hebrew_text.remove_niqqud_column(column))
+
+    print(f'remove_niqqud over {len(column)} HEBREW_AUDIO rows:')
+    report('original AudioMgr.remove_niqqud', legacy, len(column), 'rows')
+    report('hebrew_text.remove_niqqud', per_row, len(column), 'rows')
+    report('hebrew_text.remove_niqqud_column', bulk, len(column), 'rows')
+    print(f'  speed up per row: {legacy / per_row:.1f}x')
+    speed_up = legacy / bulk
+    verdict = 'pass' if speed_up >= NIQQUD_SPEED_UP_GOAL else 'FAIL'
+    print(f'  speed up bulk: {speed_up:.1f}x'
+          f'  ({verdict}, goal {NIQQUD_SPEED_UP_GOAL}x)')
+
+
+#_____________________________________
+#          copy_database
+#_____________________________________
+@contextlib.contextmanager
+def copy_database(db_path=HEBREW_DB):
+    """
+       Yields the path of a temporary copy of the database with the
+      app's start up migrations, indexes and views applied so the
+      benchmarks never change the real one.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'hebrew_studies.db')
+        shutil.copyfile(db_path, path)
+        with contextlib.closing(hebrew_db.open_database(path)) as connection:
+            hebrew_db.migrate_categories(connection)
+            hebrew_db.create_search_keys(connection)
+            hebrew_db.create_lookup_indexes(connection)
+            hebrew_db.create_audio_fts(connection)
+            hebrew_db.create_audio_detail_view(connection)
+        yield path
+
+
+#_____________________________________
+#      benchmark_statement_cache
+#_____________________________________
+def benchmark_statement_cache(db_path=HEBREW_DB, passes=10, repeat=7):
+    """
+       Times the same named hebrew_repository statements on
+      connections with the statement cache turned off and at its
+      default size, so the only difference is whether the prepared
+      statement and its plan are reused. Each statement is run for
+      every row passes times and the best of repeat runs is kept.
+    """
+    with copy_database(db_path) as path:
+        with contextlib.closing(hebrew_db.open_database(path)) as connection:
+            url_ids = [row[0] for row in
+                       connection.execute('SELECT url_id FROM webpage;')]
+            audio_ids = [row[0] for row in
+                         connection.execute('SELECT audio_id FROM hebrew_audio;')]
+
+        def get_url(connection):
+            for url_id in url_ids:
+                hebrew_repository.fetch_one(connection, 'webpage', 'url',
+                                            (url_id,))
+
+        def get_detail(connection):
+            for audio_id in audio_ids:
+                hebrew_repository.fetch_one(connection, 'audio', 'detail',
+                                            {'audio_id': audio_id,
+                                             'category': 'animals'})
+
+        results = {}
+        for cached_statements in (0, hebrew_db.STATEMENT_CACHE_SIZE):
+            connection = sqlite3.connect(path, cached_statements=cached_statements)
+            connection.row_factory = sqlite3.Row
+            with contextlib.closing(connection):
+                for name, function in (('url', get_url), ('detail', get_detail)):
+                    function(connection)
+                    results[name, cached_statements] = \
+                        best_time(lambda: function(connection), number=passes,
+                                  repeat=repeat)
+
+    cache = hebrew_db.STATEMENT_CACHE_SIZE
+    for name, ids in (('url', url_ids), ('detail', audio_ids)):
+        print(f'{name} statement over {len(ids)} rows,'
+              f' best of {repeat} runs of {passes} passes:')
+        report('statement cache off', results[name, 0], len(ids))
+        report(f'statement cache of {cache}', results[name, cache], len(ids))
+        print(f'  speed up: {results[name, 0] / results[name, cache]:.2f}x')
+
+
+#_____________________________________
+#        synthetic_lesson
+#_____________________________________
+def synthetic_lesson(word_count, db_path=HEBREW_DB):
+    """
+       Returns word_count study sheet rows made by cycling through
+      the HEBREW_AUDIO table, numbering the English so each word is
+      unique. One in ten has no audio.
+    """
+    with sqlite3.connect(db_path) as connection:
+        words = connection.execute('SELECT english, hebrew, audio_file'
+                                   ' FROM hebrew_audio'
+                                   ' ORDER BY audio_id;').fetchall()
+    return [{'english': f'{english} {i}',
+             'hebrew': hebrew,
+             'audio_file': 'No Audio' if i % 10 == 0 else audio_file}
+            for i, (english, hebrew, audio_file)
+            in enumerate(words[i % len(words)] for i in range(word_count))]
+
+
+#_____________________________________
+#       benchmark_study_sheet
+#_____________________________________
+def benchmark_study_sheet(db_path=HEBREW_DB, word_count=10000):
+    """
+       Measures the throughput, in rows per second, of the
+      hebrew_sheets row renderers on the study sheet of a synthetic 10,000
+      word lesson in each of the languages, both rendering the HTML and
+      rendering it and writing it to a file.
+    """
+    rows = synthetic_lesson(word_count, db_path)
+    print(f'Study sheet of a synthetic {word_count} word lesson:')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'study_sheet.html')
+        for language, niqqud in (('English, Hebrew', True),
+                                 ('Hebrew', True),
+                                 ('Hebrew', False),
+                                 ('English', True)):
+            def render_sheet():
+                hebrew_sheets.render_study_sheet(rows, language, niqqud,
+                                                 lesson='Synthetic 1')
+
+            def write_sheet():
+                with open(path, 'w', encoding='utf8') as study_file:
+                    hebrew_sheets.write_study_sheet(study_file, rows, language,
+                                                    niqqud, lesson='Synthetic 1')
+
+            name = language if language != 'Hebrew' or niqqud \
+                   else 'Hebrew without niqqud'
+            print(f'  {name}:')
+            for step, function in (('render', render_sheet),
+                                   ('render and write', write_sheet)):
+                seconds = best_time(function, number=1, repeat=5)
+                report(step, seconds, word_count, unit='rows')
+                print(f'  {"":<34} {word_count / seconds:10.0f} rows per second')
+            print(f'  {"":<34} {os.path.getsize(path) / 1e6:10.1f} MB')
+
+
+#_____________________________________
+#      benchmark_streaming_sheet
+#_____________________________________
+def benchmark_streaming_sheet(db_path=HEBREW_DB, sizes=(10000, 100000)):
+    """
+       Compares the peak memory and time of writing the study sheet of
+      ever bigger synthetic categories by fetching all the rows and
+      writing the sheet in one go with streaming it a chunk at a time
+      with hebrew_sheets.create_study_sheet.
+    """
+    def peak_memory(function):
+        tracemalloc.start()
+        start = timeit.default_timer()
+        result = function()
+        seconds = timeit.default_timer() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, seconds, peak
+
+    with copy_database(db_path) as path, \
+         tempfile.TemporaryDirectory() as media, \
+         contextlib.closing(hebrew_db.open_database(path)) as connection:
+        for size in sizes:
+            category = f'synthetic {size}'
+            last_id = connection.execute('SELECT max(audio_id)'
+                                         ' FROM hebrew_audio;').fetchone()[0]
+            with hebrew_db.transaction(connection):
+                connection.executemany(hebrew_repository.sql('audio', 'insert'),
+                                       (hebrew_repository.audio_keys(
+                                            {'english': f'{row["english"]} of {size}',
+                                             'hebrew': row['hebrew'],
+                                             'audio_file': row['audio_file'],
+                                             'lesson': None})
+                                        for row in synthetic_lesson(size, path)))
+                connection.execute(hebrew_repository.sql('category', 'insert'),
+                                   (category,))
+                connection.execute('INSERT INTO category_member(category_id, audio_id)'
+                                   ' SELECT c.category_id, ha.audio_id'
+                                   '  FROM category c, hebrew_audio ha'
+                                   '  WHERE c.name = ? AND ha.audio_id > ?;',
+                                   (category, last_id))
+
+            def fetch_all_and_write():
+                sql_stmt, params = hebrew_repository.sheet_query('Hebrew',
+                                                                 category=category)
+                rows = connection.execute(sql_stmt, params).fetchall()
+                with open(os.path.join(media, 'all.html'), 'w',
+                          encoding='utf8') as study_file:
+                    return hebrew_sheets.write_study_sheet(study_file, rows,
+                                                           'Hebrew',
+                                                           category=category)
+
+            def stream():
+                return hebrew_sheets.create_study_sheet(connection, media,
+                                                        'Hebrew',
+                                                        category=category)[1]
+
+            print(f'Hebrew study sheet of a {size} word category:')
+            for name, function in (('fetchall and one write', fetch_all_and_write),
+                                   ('streamed with fetchmany', stream)):
+                row_count, seconds, peak = peak_memory(function)
+                print(f'  {name:<34} {seconds * 1000:10.1f} ms'
+                      f'  {peak / 1e6:8.1f} MB peak  ({row_count} rows written)')
+
+
+#_____________________________________
+#       benchmark_topic_search
+#_____________________________________
+def benchmark_topic_search(db_path=HEBREW_DB,
+                           searches=('a', 'he', 'the', 'verb', 'pa%', '%ing')):
+    """
+       Compares searching the WEBPAGE topics with the LIKE queries of
+      hebrew_db.webpage_search_query, as search_webpage_table used to,
+      with searching the in-memory hebrew_search.TopicIndex.
+    """
+    with copy_database(db_path) as path, \
+         contextlib.closing(hebrew_db.open_database(path)) as connection:
+
+        def query(search):
+            sql_stmt, params = hebrew_db.webpage_search_query(search)
+            return connection.execute(sql_stmt, params).fetchall()
+
+        load = best_time(lambda: hebrew_search.TopicIndex.query(connection), 1)
+        index = hebrew_search.TopicIndex.query(connection)
+        print(f'Searching {len(index)} WEBPAGE topics:')
+        report('load TopicIndex', load, len(index), 'topics')
+        for search in searches:
+            found = len(index.search(search))
+            report(f"'{search}' LIKE query", best_time(lambda: query(search)), 1)
+            report(f"'{search}' TopicIndex ({found} found)",
+                   best_time(lambda: index.search(search), 100), 1)
+
+
+#_____________________________________
+#        synthetic_lexicon
+#_____________________________________
+def synthetic_lexicon(size, seed=1):
+    """
+       Returns size (audio_id, english, hebrew) rows of made up
+      words. Each Hebrew word is a three letter root in a pattern
+      that may spell it with ו or י and each English word is a few
+      random syllables.
+    """
+    rng = random.Random(seed)
+    letters = 'אבגדהזחטכלמנסעפצקרשת'
+    patterns = ('{0}{1}{2}', '{0}ו{1}{2}', '{0}{1}י{2}', 'מ{0}{1}{2}',
+                '{0}{1}ו{2}', 'ה{0}{1}י{2}', '{0}י{1}ו{2}', 'ת{0}{1}{2}ת')
+    syllables = ('ka', 'lo', 'mi', 'ne', 'ru', 'sha', 'te', 'vo', 'dor',
+                 'ben', 'gal', 'hin', 'pel', 'zum', 'tri', 'est')
+
+    def hebrew_word():
+        return rng.choice(patterns).format(*rng.sample(letters, 3))
+
+    def english_word():
+        return ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+    return [(audio_id,
+             ' '.join(english_word() for _ in range(rng.randint(1, 3))),
+             ' '.join(hebrew_word() for _ in range(rng.randint(1, 2))))
+            for audio_id in range(1, size + 1)]
+
+
+#_____________________________________
+#         misspell_hebrew
+#_____________________________________
+def misspell_hebrew(word, rng):
+    """
+       Returns the Hebrew word as a learner might type it: spelled
+      without its ו and י or with an extra one, or with a letter that
+      sounds alike in place of one of its letters.
+    """
+    spelling = rng.randrange(3)
+    if spelling == 0 and ('ו' in word or 'י' in word):
+        return word.replace('ו', '').replace('י', '') or word
+    if spelling == 1:
+        position = rng.randint(1, len(word) - 1)
+        return word[:position] + rng.choice('וי') + word[position:]
+    for a, b in hebrew_search.SIMILAR_LETTERS:
+        if a in word:
+            return word.replace(a, b, 1)
+    return word[:-1] + 'י' + word[-1]
+
+
+#_____________________________________
+#       benchmark_fuzzy_search
+#_____________________________________
+def benchmark_fuzzy_search(size=500000, searches=200, count=20):
+    """
+       Builds a hebrew_search.FuzzyIndex of a synthetic lexicon of
+      size entries and times fuzzy searches for the misspelled Hebrew
+      of randomly chosen entries. Since a made up word is in many
+      entries, recall is the fraction of searches with an entry
+      containing the word correctly spelled among the top count
+      results. Candidate recall is the fraction whose correctly
+      spelled word was among the similar words found through the
+      n-gram index; the rest of the misses were spelled even more
+      like other words.
+    """
+    rng = random.Random(2)
+    lexicon = synthetic_lexicon(size)
+    start = time.perf_counter()
+    index = hebrew_search.FuzzyIndex(lexicon)
+    build = time.perf_counter() - start
+    print(f'Fuzzy search of {size} synthetic entries'
+          f' ({len(index.vocabulary)} distinct words):')
+    report('build FuzzyIndex', build, size, 'rows')
+
+    times = []
+    found = 0
+    candidates = 0
+    for audio_id, english, hebrew in rng.sample(lexicon, searches):
+        word = hebrew.split()[0]
+        search = misspell_hebrew(word, rng)
+        start = time.perf_counter()
+        results = index.search(search, count)
+        times.append(time.perf_counter() - start)
+        found += any(word in lexicon[result[1] - 1][2].split()
+                     for result in results)
+        key = hebrew_text.search_key(search)
+        candidates += (index.numbers[hebrew_text.search_key(word)] in
+                       index.similar_words(key, hebrew_search.default_distance(key)))
+    times.sort()
+    report('search misspelled Hebrew', sum(times), searches)
+    print(f'  median {times[len(times) // 2] * 1000:.2f} ms,'
+          f' 95th percentile {times[int(len(times) * .95)] * 1000:.2f} ms,'
+          f' recall@{count} {found / searches:.0%},'
+          f' candidate recall {candidates / searches:.0%}')
+
+
+#_____________________________________
+#       benchmark_completion
+#_____________________________________
+def benchmark_completion(size=500000, completions=100000):
+    """
+       Builds a hebrew_search.CompletionTrie of a synthetic lexicon of
+      size entries and times completing prefixes of one to three
+      letters of its words, then adding and removing entries.
+    """
+    rng = random.Random(3)
+    lexicon = synthetic_lexicon(size)
+    start = time.perf_counter()
+    trie = hebrew_search.CompletionTrie(lexicon)
+    build = time.perf_counter() - start
+    print(f'Completion of {size} synthetic entries ({len(trie)} distinct words):')
+    report('build CompletionTrie', build, size, 'rows')
+
+    prefixes = [word[:rng.randint(1, 3)]
+                for word in rng.choices(trie.words, k=completions)]
+    times = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        trie.complete(prefix)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    report('complete a prefix', sum(times), completions)
+    print(f'  median {times[len(times) // 2] * 1e6:.1f} us,'
+          f' 95th percentile {times[int(len(times) * .95)] * 1e6:.1f} us')
+
+    added = lexicon[:1000]
+    start = time.perf_counter()
+    for audio_id, english, hebrew in added:
+        trie.add(size + audio_id, english, hebrew)
+    report('add an audio', time.perf_counter() - start, len(added))
+    start = time.perf_counter()
+    for audio_id, english, hebrew in added:
+        trie.remove(size + audio_id)
+    report('remove an audio', time.perf_counter() - start, len(added))
+
+
+#_____________________________________
+#         benchmark_tracing
+#_____________________________________
+def benchmark_tracing(calls=100000):
+    """
+       Times a small function, like AudioMgr.is_hebrew, called plainly,
+      decorated by hebrew_trace.traced with tracing off and on, and
+      with the sys._getframe and display_function lines every method
+      used to start and end with.
+    """
+    def is_hebrew(string):
+        return '\u0590' <= string[:1] <= '\u05FF'
+
+    def legacy_is_hebrew(string):
+        current_function = sys._getframe().f_code.co_name
+        print(f'>>>>> Running {current_function} ')
+        result = '\u0590' <= string[:1] <= '\u05FF'
+        print(f'<<<<< Exiting {current_function} ')
+        return result
+
+    enabled = hebrew_trace.ENABLED
+    try:
+        hebrew_trace.enable(False)
+        untraced = hebrew_trace.traced(is_hebrew)
+        hebrew_trace.enable(True)
+        traced = hebrew_trace.traced(is_hebrew)
+    finally:
+        hebrew_trace.enable(enabled)
+    assert untraced is is_hebrew
+
+    plain = best_time(lambda: is_hebrew('שלום'), number=calls)
+    off = best_time(lambda: untraced('שלום'), number=calls)
+    on = best_time(lambda: traced('שלום'), number=calls)
+    with open(os.devnull, 'w') as devnull, \
+         contextlib.redirect_stdout(devnull):
+        legacy = best_time(lambda: legacy_is_hebrew('שלום'), number=calls)
+    hebrew_trace.reset()
+
+    print(f'Tracing overhead of a small function over {calls} calls:')
+    report('plain function', plain * calls, calls)
+    report('traced, tracing off', off * calls, calls)
+    report('traced, tracing on', on * calls, calls)
+    report('sys._getframe and display_function', legacy * calls, calls)
+
+
+
+#_____________________________________
+#       benchmark_query_plans
+#_____________________________________
+def benchmark_query_plans(db_path=HEBREW_DB, number=200):
+    """
+       Prints the query plan and time of the app's hot queries, the
+      search box, lesson, category and audio detail lookups, with and
+      without the indexes create_lookup_indexes adds, then the cost
+      the instrumented cursors add to a statement.
+    """
+    with copy_database(db_path) as path, \
+         contextlib.closing(hebrew_db.open_database(path)) as connection:
+        lesson = connection.execute('SELECT l.name FROM lesson l'
+                                    ' JOIN hebrew_audio ha'
+                                    '   ON ha.lesson_id = l.lesson_id'
+                                    ' GROUP BY l.name'
+                                    ' ORDER BY count(*) DESC;').fetchone()[0]
+        category = connection.execute('SELECT name FROM category'
+                                      ' ORDER BY category_id;').fetchone()[0]
+        audio_id = connection.execute('SELECT max(audio_id)'
+                                      ' FROM hebrew_audio;').fetchone()[0]
+        queries = [('search, short text',) + hebrew_db.audio_search_query('של'),
+                   ('search, full text',) + hebrew_db.audio_search_query('שלום'),
+                   ('audio by_lesson', hebrew_repository.sql('audio', 'by_lesson'),
+                    (lesson,)),
+                   ('study sheet of a lesson',)
+                   + hebrew_repository.sheet_query('English', lesson=lesson),
+                   ('category members', hebrew_repository.sql('category', 'members'),
+                    (category,)),
+                   ('audio detail', hebrew_repository.sql('audio', 'detail'),
+                    {'audio_id': audio_id, 'category': category})]
+
+        connection.execute('DROP INDEX IF EXISTS hebrew_audio_lesson;')
+        for indexes in ('without', 'with'):
+            if indexes == 'with':
+                hebrew_db.create_lookup_indexes(connection)
+            print(f'Query plans {indexes} the lookup indexes:')
+            for name, sql_stmt, params in queries:
+                seconds = best_time(lambda: connection.execute(sql_stmt, params)
+                                    .fetchall(), number=number)
+                report(name, seconds * number, number)
+                for line in hebrew_db.query_plan(connection, sql_stmt, params):
+                    print(f'      {line}')
+            print()
+
+        plain = sqlite3.connect(path, cached_statements=hebrew_db.STATEMENT_CACHE_SIZE)
+        plain.row_factory = sqlite3.Row
+        points, scans = number * 10, number // 10
+        with contextlib.closing(plain):
+            results = {}
+            for label, db in (('plain cursor', plain),
+                              ('instrumented cursor', connection)):
+                results[label, 'point'] = best_time(
+                    lambda: db.execute('SELECT english FROM hebrew_audio'
+                                       ' WHERE audio_id = ?;', (audio_id,))
+                    .fetchone(), number=points)
+                results[label, 'scan'] = best_time(
+                    lambda: [row for row in db.execute('SELECT english, audio_id'
+                                                       ' FROM hebrew_audio;')],
+                    number=scans)
+        hebrew_db.statement_log.clear()
+
+    print('Cost of the instrumentation:')
+    for label in ('plain cursor', 'instrumented cursor'):
+        report(f'{label}, point query', results[label, 'point'] * points, points)
+        report(f'{label}, iterate the table', results[label, 'scan'] * scans, scans)
+
+
+#_____________________________________
+#       benchmark_query_pager
+#_____________________________________
+def benchmark_query_pager(db_path=HEBREW_DB, row_count=200000):
+    """
+       Compares the time before the SQL window can show anything of
+      a query returning row_count rows, the time to fetch them all,
+      as run_sql used to, with the time a QueryPager takes to return
+      the first page.
+    """
+    sql_stmt = ('WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1'
+                f' FROM n WHERE i < {row_count})'
+                " SELECT i, 'english ' || i, 'שלום ' || i, i || '.mp3'"
+                ' FROM n;')
+    with copy_database(db_path) as path, \
+         contextlib.closing(hebrew_db.open_database(path)) as connection:
+        fetch_all = best_time(lambda: connection.execute(sql_stmt).fetchall(),
+                              number=1, repeat=3)
+
+        def first_page():
+            pager = hebrew_workers.QueryPager(sql_stmt)
+            pager.open(connection)
+            pager.close()
+
+        first = best_time(first_page, number=10, repeat=3)
+        hebrew_db.statement_log.clear()
+    print(f'Time before the first of {row_count} rows can be shown:')
+    report('fetchall', fetch_all, row_count, 'rows')
+    report('QueryPager first page', first, hebrew_workers.PAGE_ROWS, 'rows')
+    print(f'  speed up: {fetch_all / first:.0f}x')
+
+
+#_____________________________________
+#          launch_app
+#_____________________________________
+def launch_app(directory, pycache, timeout=120):
+    """
+       Starts hebrew_studies.py in the directory, with its bytecode
+      cached under pycache, and returns the seconds from launching it
+      to its first paint and to its becoming interactive, or None if
+      it didn't report them, e.g. because there's no display.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'hebrew_studies.py')
+    env = dict(os.environ, HEBREW_STUDIES_STARTUP='exit',
+               PYTHONPYCACHEPREFIX=pycache)
+    start = time.time()
+    result = subprocess.run([sys.executable, script], cwd=directory, env=env,
+                            capture_output=True, text=True, timeout=timeout)
+    times = {}
+    for line in result.stdout.splitlines():
+        if line.startswith('startup '):
+            unused, milestone, when = line.split()
+            times[milestone] = float(when) - start
+    if 'interactive' not in times:
+        print(f'  hebrew_studies.py exited with {result.returncode}:')
+        print('   ', '\n    '.join(result.stderr.strip().splitlines()[-3:]))
+        return None
+    return times.get('first_paint'), times['interactive']
+
+
+#_____________________________________
+#         benchmark_startup
+#_____________________________________
+def benchmark_startup(db_path=HEBREW_DB, runs=5):
+    """
+       Measures the time from launching the app to the first paint of
+      its window and to its becoming interactive, with everything
+      queried at start up displayed. A cold start compiles every
+      module afresh into an empty bytecode cache, a warm start reuses
+      the cache left by the run before. Neither flushes the operating
+      system's file cache.
+    """
+    with copy_database(db_path) as path, \
+         tempfile.TemporaryDirectory() as pycache_root:
+        directory = os.path.dirname(path)
+        results = {'cold': [], 'warm': []}
+        for run in range(runs):
+            results['cold'].append(launch_app(directory,
+                                              os.path.join(pycache_root, str(run))))
+            results['warm'].append(launch_app(directory,
+                                              os.path.join(pycache_root, str(run))))
+            if results['cold'][-1] is None or results['warm'][-1] is None:
+                print('Unable to time the start up of the app.')
+                return
+
+    print(f'Start up of the app, median of {runs} runs:')
+    for start in ('cold', 'warm'):
+        first_paint = statistics.median(times[0] for times in results[start])
+        interactive = statistics.median(times[1] for times in results[start])
+        print(f'  {start}:  first paint {first_paint * 1000:8.1f} ms'
+              f'   interactive {interactive * 1000:8.1f} ms')
+
+
+#_____________________________________
+#       benchmark_media_index
+#_____________________________________
+def benchmark_media_index(db_path=HEBREW_DB, media=hebrew_media.HEBREW_MEDIA):
+    """
+       Times indexing every audio file in the media folder in one
+      process and on a pool of them, then the incremental indexing
+      the app does at start up, when nothing or one file has changed.
+    """
+    workers = os.cpu_count() or 1
+    with copy_database(db_path) as path, \
+         contextlib.closing(hebrew_db.open_database(path)) as connection:
+        serial = hebrew_media.index_media(connection, media, workers=1,
+                                          force=True)
+        parallel = hebrew_media.index_media(connection, media, workers=workers,
+                                            force=True)
+        unchanged = hebrew_media.index_media(connection, media)
+        #  Forgetting a file makes it look new to the next indexing
+        with hebrew_db.transaction(connection):
+            connection.execute(hebrew_repository.sql('media', 'delete'),
+                               (min(hebrew_media.media_files(media)),))
+        one = hebrew_media.index_media(connection, media)
+        hebrew_db.statement_log.clear()
+
+    print(f"Indexing {serial['files']} audio files:")
+    report('full, read in this process', serial['seconds'], serial['read'], 'files')
+    report(f"full, pool of {parallel['workers']}", parallel['seconds'],
+           parallel['read'], 'files')
+    report('incremental, nothing changed', unchanged['seconds'],
+           unchanged['files'], 'files')
+    report('incremental, one file changed', one['seconds'], one['files'], 'files')
+    print(f"  {len(serial['problems'])} audio files missing or unreadable")
+
+BENCHMARKS = {'remove_niqqud': benchmark_remove_niqqud,
+              'statement_cache': benchmark_statement_cache,
+              'study_sheet': benchmark_study_sheet,
+              'streaming_sheet': benchmark_streaming_sheet,
+              'topic_search': benchmark_topic_search,
+              'fuzzy_search': benchmark_fuzzy_search,
+              'completion': benchmark_completion,
+              'tracing': benchmark_tracing,
+              'query_plans': benchmark_query_plans,
+              'query_pager': benchmark_query_pager,
+              'startup': benchmark_startup,
+              'media_index': benchmark_media_index}
+
+
+#_____________________________________
+#               main
+#_____________________________________
+def main(names):
+    """
+       Runs the named benchmarks or all of them if none are named.
+    """
+    for name in names or BENCHMARKS:
+        BENCHMARKS[name]()
+        print()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,934 @@
+"""
+   Database helpers for the Hebrew Studies app. Creates the full-text
+  tables, indexes and triggers that sit alongside the original tables
+  in hebrew_studies.db and builds the SQL used to search them.
+   Every connection opened by open_database times its statements.
+  The wall time and rows of each are added up in the statement_log,
+  and a statement slower than SLOW_STATEMENT_SECONDS is kept there
+  along with its EXPLAIN QUERY PLAN, so a full table scan shows up
+  as a SCAN in the plan.
+
+"""
+
+import collections
+import contextlib
+import pathlib
+import sqlite3
+import threading
+import time
+
+import hebrew_text
+import hebrew_trace
+
+#  Full-text shadow index of the HEBREW_AUDIO table. The trigram
+# tokenizer matches any substring of three or more characters so it
+# keeps the old LIKE "%text%" behaviour while using an index.
+AUDIO_FTS = 'hebrew_audio_fts'
+FTS_MIN_SEARCH = 3
+
+#  Number of prepared statements each connection keeps for reuse.
+# Comfortably more than the named statements in hebrew_repository.
+STATEMENT_CACHE_SIZE = 256
+
+#  Set by create_audio_fts. If the SQLite library is too old to
+# support FTS5 trigrams the searches fall back to LIKE scans.
+fts_available = False
+
+#  Statements that take longer than this are logged with their
+# query plan, and the number of slow statements kept.
+SLOW_STATEMENT_SECONDS = 0.005
+SLOW_STATEMENTS = 200
+
+#  Number of rows fetched at a time when an InstrumentedCursor is
+# iterated over.
+ITERATION_ROWS = 256
+
+# The statements that have a query plan
+PLANNED_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+#_____________________________________
+#          open_database
+#_____________________________________
+def open_database(path):
+    """
+       Connects to the SQLite3 database, sets queries to return
+      row objects rather than the default tuples and registers
+      the app's SQL functions.
+       The database is switched to write-ahead logging so that a
+      commit appends to the WAL file rather than rewriting the
+      database and the queries never wait on a writer. With WAL,
+      synchronous=NORMAL only syncs at checkpoints and is still
+      safe against corruption.
+    """
+    connection = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE,
+                                 factory=InstrumentedConnection)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode = WAL;')
+    connection.execute('PRAGMA synchronous = NORMAL;')
+    register_functions(connection)
+    return connection
+
+
+#_____________________________________
+#          open_read_only
+#_____________________________________
+def open_read_only(path):
+    """
+       Connects to the database read only, e.g. for a query whose
+      rows are fetched a page at a time, so its statement is left
+      running between pages without holding up, or being interrupted
+      along with, anything else. The database must already be in WAL
+      mode, which open_database sees to.
+    """
+    uri = f'{pathlib.Path(path).resolve().as_uri()}?mode=ro'
+    connection = sqlite3.connect(uri, uri=True, cached_statements=STATEMENT_CACHE_SIZE,
+                                 factory=InstrumentedConnection)
+    connection.row_factory = sqlite3.Row
+    register_functions(connection)
+    return connection
+
+
+#_____________________________________
+#          database_path
+#_____________________________________
+def database_path(connection):
+    """
+       Returns the file name of the connection's main database.
+    """
+    for row in connection.execute('PRAGMA database_list;').fetchall():
+        if row[1] == 'main':
+            return row[2]
+    return ''
+
+
+#====================================================================
+#                          StatementLog
+#====================================================================
+class StatementLog():
+    """
+       The number of times each SQL statement was run with its total
+      and longest wall time and rows, and the latest SLOW_STATEMENTS
+      statements that took longer than SLOW_STATEMENT_SECONDS with
+      their parameters and query plan.
+       Statements are logged by the database worker and read by the
+      Tk main loop, so the log is guarded by a lock. It's reentrant
+      since a cursor the garbage collector drops while the log is
+      being written logs itself from its __del__.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.timings = {}
+        self.slow = collections.deque(maxlen=SLOW_STATEMENTS)
+
+    #_____________________________________
+    #              record
+    #_____________________________________
+    def record(self, sql_stmt, params, seconds, rows, plan=None):
+        """
+           Adds a run of a statement to its timings and, if it was
+          slow and so has a plan, even an empty one, to the slow
+          statements.
+        """
+        with self.lock:
+            timing = self.timings.get(sql_stmt)
+            if timing is None:
+                timing = self.timings[sql_stmt] = [0, 0.0, 0, 0.0]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] += rows
+            timing[3] = max(timing[3], seconds)
+            if plan is not None:
+                self.slow.append({'time': time.time(), 'sql': sql_stmt,
+                                  'params': params, 'seconds': seconds,
+                                  'rows': rows, 'plan': plan})
+
+    #_____________________________________
+    #          slow_statements
+    #_____________________________________
+    def slow_statements(self):
+        """
+           Returns the slow statements, the latest first.
+        """
+        with self.lock:
+            return list(reversed(self.slow))
+
+    #_____________________________________
+    #            statements
+    #_____________________________________
+    def statements(self):
+        """
+           Returns (sql, calls, seconds, rows, longest) for every
+          statement run, the most total time first.
+        """
+        with self.lock:
+            found = [(sql_stmt, *timing) for sql_stmt, timing in self.timings.items()]
+        return sorted(found, key=lambda item: -item[2])
+
+    #_____________________________________
+    #              clear
+    #_____________________________________
+    def clear(self):
+        """
+           Forgets every statement logged.
+        """
+        with self.lock:
+            self.timings.clear()
+            self.slow.clear()
+
+
+statement_log = StatementLog()
+
+
+#_____________________________________
+#            query_plan
+#_____________________________________
+def query_plan(connection, sql_stmt, params=()):
+    """
+       Returns the EXPLAIN QUERY PLAN of a statement as lines indented
+      by their depth in the plan, e.g.
+          SEARCH c USING COVERING INDEX sqlite_autoindex_category_1 (name=?)
+          SCAN ha
+      Run on a plain cursor so the EXPLAIN isn't itself logged.
+    """
+    cursor = sqlite3.Cursor(connection)
+    try:
+        rows = cursor.execute(f'EXPLAIN QUERY PLAN {sql_stmt}', params).fetchall()
+    finally:
+        cursor.close()
+    depths = {0: -1}
+    lines = []
+    for node, parent, unused, detail in rows:
+        depths[node] = depths.get(parent, -1) + 1
+        lines.append('  ' * depths[node] + detail)
+    return lines
+
+
+#====================================================================
+#                       InstrumentedCursor
+#====================================================================
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+       A cursor that times its statements. The time spent executing
+      a statement and fetching its rows, however they're fetched, is
+      added up and logged once the last row has been fetched, or the
+      cursor is closed or reused. Rows taken one at a time with next()
+      rather than a for loop or a fetch aren't timed. A statement that
+      changes rows, executemany and executescript are logged straight
+      away with the number of rows changed.
+       A cursor dropped before its last row was fetched is logged
+      without a query plan, since the EXPLAIN could then be run by the
+      garbage collector on any thread. A statement that raises isn't
+      logged at all.
+    """
+    statement = None
+
+    #_____________________________________
+    #              execute
+    #_____________________________________
+    def execute(self, sql_stmt, parameters=()):
+        self.finish()
+        start = time.perf_counter()
+        super().execute(sql_stmt, parameters)
+        self.start(sql_stmt, parameters, time.perf_counter() - start)
+        return self
+
+    #_____________________________________
+    #            executemany
+    #_____________________________________
+    def executemany(self, sql_stmt, seq_of_parameters):
+        """
+           Runs the statement once for each set of parameters and logs
+          it as a single statement with the last set of parameters.
+        """
+        self.finish()
+        last = [()]
+
+        def remember(seq_of_parameters):
+            for parameters in seq_of_parameters:
+                last[0] = parameters
+                yield parameters
+
+        start = time.perf_counter()
+        super().executemany(sql_stmt, remember(seq_of_parameters))
+        self.start(sql_stmt, last[0], time.perf_counter() - start)
+        return self
+
+    #_____________________________________
+    #           executescript
+    #_____________________________________
+    def executescript(self, sql_script):
+        self.finish()
+        start = time.perf_counter()
+        super().executescript(sql_script)
+        self.start(sql_script, None, time.perf_counter() - start)
+        return self
+
+    #_____________________________________
+    #               start
+    #_____________________________________
+    def start(self, sql_stmt, parameters, seconds):
+        """
+           Begins timing the rows of the statement that just ran, or
+          logs it if it has no rows to fetch.
+        """
+        self.statement = sql_stmt
+        self.parameters = parameters
+        self.seconds = seconds
+        self.rows = 0
+        if self.description is None:
+            self.rows = max(self.rowcount, 0)
+            self.finish()
+        else:
+            self.connection.active_statements += 1
+
+    #_____________________________________
+    #              fetchone
+    #_____________________________________
+    def fetchone(self):
+        if self.statement is None:
+            return super().fetchone()
+        start = time.perf_counter()
+        row = super().fetchone()
+        self.seconds += time.perf_counter() - start
+        if row is None:
+            self.finish()
+        else:
+            self.rows += 1
+        return row
+
+    #_____________________________________
+    #             fetchmany
+    #_____________________________________
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        if self.statement is None:
+            return super().fetchmany(size)
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self.seconds += time.perf_counter() - start
+        self.rows += len(rows)
+        if len(rows) < size:
+            self.finish()
+        return rows
+
+    #_____________________________________
+    #              fetchall
+    #_____________________________________
+    def fetchall(self):
+        if self.statement is None:
+            return super().fetchall()
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self.seconds += time.perf_counter() - start
+        self.rows += len(rows)
+        self.finish()
+        return rows
+
+    #_____________________________________
+    #              __iter__
+    #_____________________________________
+    def __iter__(self):
+        """
+           Iterating over the cursor fetches ITERATION_ROWS rows at a
+          time so the rows are timed a batch rather than a row at a
+          time.
+        """
+        while True:
+            rows = self.fetchmany(ITERATION_ROWS)
+            yield from rows
+            if len(rows) < ITERATION_ROWS:
+                return
+
+    #_____________________________________
+    #               close
+    #_____________________________________
+    def close(self):
+        self.finish()
+        super().close()
+
+    def __del__(self):
+        self.finish(explain=False)
+
+    #_____________________________________
+    #              finish
+    #_____________________________________
+    def finish(self, explain=True):
+        """
+           Logs the statement being fetched, if there is one, with
+          its query plan if it was slow and explain is True.
+        """
+        if self.statement is None:
+            return
+        if self.description is not None:
+            self.connection.active_statements -= 1
+        sql_stmt, params = self.statement, self.parameters
+        self.statement = self.parameters = None
+        plan = None
+        if self.seconds > SLOW_STATEMENT_SECONDS:
+            plan = []
+            if not explain:
+                plan = ['No plan: the cursor was dropped before its last'
+                        ' row was fetched']
+            elif params is not None and \
+                 sql_stmt.lstrip().upper().startswith(PLANNED_STATEMENTS):
+                try:
+                    plan = query_plan(self.connection, sql_stmt, params)
+                except sqlite3.Error as err:
+                    plan = [f'No plan: {err}']
+        statement_log.record(sql_stmt, params, self.seconds, self.rows, plan)
+        if hebrew_trace.ENABLED:
+            hebrew_trace.record('sql', sql_stmt, self.seconds, self.rows)
+
+
+#====================================================================
+#                     InstrumentedConnection
+#====================================================================
+class InstrumentedConnection(sqlite3.Connection):
+    """
+       A connection whose cursors, including the ones execute(),
+      executemany() and executescript() make, are InstrumentedCursors.
+       active_statements counts the cursors whose statements still
+      have rows to fetch, which SQLite keeps running until they're
+      finished, and so would abort along with anything else if the
+      connection were interrupted.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active_statements = 0
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql_stmt, parameters=()):
+        return self.cursor().execute(sql_stmt, parameters)
+
+    def executemany(self, sql_stmt, seq_of_parameters):
+        return self.cursor().executemany(sql_stmt, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+#_____________________________________
+#            transaction
+#_____________________________________
+@contextlib.contextmanager
+def transaction(connection):
+    """
+       A unit of work. Everything executed in the with block is
+      committed together when the block ends, or rolled back if it
+      raises, so each user action costs a single commit.
+        with transaction(connection):
+            connection.execute(...)
+            connection.execute(...)
+       A transaction started inside another one simply becomes part
+      of the outer one.
+    """
+    if connection.in_transaction:
+        yield connection
+        return
+    connection.execute('BEGIN IMMEDIATE;')
+    try:
+        yield connection
+    except BaseException:
+        connection.rollback()
+        raise
+    connection.commit()
+
+
+#_____________________________________
+#        register_functions
+#_____________________________________
+def register_functions(connection):
+    """
+       Registers the Python text functions as deterministic SQL
+      functions. The schema no longer depends on them, but a database
+      last opened by an older version of the app has expression
+      indexes and triggers that call them until create_search_keys
+      has upgraded it, and they're handy in the SQL window.
+    """
+    connection.create_function('search_key', 1, hebrew_text.search_key,
+                               deterministic=True)
+    connection.create_function('remove_niqqud', 1, hebrew_text.remove_niqqud,
+                               deterministic=True)
+
+
+#_____________________________________
+#           add_columns
+#_____________________________________
+def add_columns(connection, table, columns):
+    """
+       Adds the (name, type) columns the table doesn't have yet.
+    """
+    existing = {row[1] for row in connection.execute(f'PRAGMA table_info({table});')}
+    for name, column_type in columns:
+        if name not in existing:
+            connection.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type};')
+
+
+#_____________________________________
+#        create_search_keys
+#_____________________________________
+def create_search_keys(connection):
+    """
+       Adds the HEBREW_KEY and ENGLISH_KEY columns to the HEBREW_AUDIO
+      table and the TOPIC_KEY column to the WEBPAGE table, holding the
+      hebrew_text.search_key of the text, and indexes them so that
+      exact and prefix searches are B-tree lookups rather than table
+      scans.
+       The keys and the HEBREW_NO_NIQQUD column are ordinary columns
+      the app fills in whenever it writes a row, see audio_keys and
+      webpage_keys in hebrew_repository, so any other SQLite client,
+      e.g. the sqlite3 shell behind the DB button, can still write
+      the tables. Since such a client won't fill them in, every key
+      is worked out again here at start up and the rows whose keys
+      are missing or out of date are corrected.
+       Databases from earlier versions indexed search_key(column) and
+      filled HEBREW_NO_NIQQUD with triggers that called the Python
+      functions, which only the app's own connections have. Those
+      indexes and triggers are dropped.
+    """
+    connection.executescript("""
+        DROP INDEX IF EXISTS hebrew_audio_hebrew_key;
+        DROP INDEX IF EXISTS hebrew_audio_english_key;
+        DROP INDEX IF EXISTS webpage_topic_key;
+        DROP TRIGGER IF EXISTS hebrew_audio_no_niqqud_insert;
+        DROP TRIGGER IF EXISTS hebrew_audio_no_niqqud_update;
+        """)
+    with transaction(connection):
+        add_columns(connection, 'hebrew_audio', (('hebrew_key', 'TEXT'),
+                                                 ('english_key', 'TEXT')))
+        add_columns(connection, 'webpage', (('topic_key', 'TEXT'),))
+    connection.executescript("""
+        CREATE INDEX IF NOT EXISTS hebrew_audio_by_hebrew_key
+          ON hebrew_audio(hebrew_key);
+        CREATE INDEX IF NOT EXISTS hebrew_audio_by_english_key
+          ON hebrew_audio(english_key);
+        CREATE INDEX IF NOT EXISTS webpage_by_topic_key
+          ON webpage(topic_key);
+        """)
+
+    rows = connection.execute('SELECT audio_id, english, hebrew,'
+                              '       hebrew_no_niqqud, hebrew_key, english_key'
+                              ' FROM hebrew_audio;').fetchall()
+    no_niqqud = hebrew_text.remove_niqqud_column(row[2] for row in rows)
+    audio = [(keys[0], keys[1], keys[2], row[0])
+             for row, keys in ((row, (no_niqqud_hebrew,
+                                      hebrew_text.search_key(row[2]),
+                                      hebrew_text.search_key(row[1])))
+                               for row, no_niqqud_hebrew in zip(rows, no_niqqud))
+             if tuple(row[3:6]) != keys]
+    rows = connection.execute('SELECT url_id, topic, topic_key'
+                              ' FROM webpage;').fetchall()
+    webpages = [(topic_key, row[0]) for row, topic_key
+                in ((row, hebrew_text.search_key(row[1])) for row in rows)
+                if row[2] != topic_key]
+    if audio or webpages:
+        with transaction(connection):
+            connection.executemany('UPDATE hebrew_audio'
+                                   ' SET hebrew_no_niqqud = ?,'
+                                   '     hebrew_key = ?, english_key = ?'
+                                   ' WHERE audio_id = ?;', audio)
+            connection.executemany('UPDATE webpage'
+                                   ' SET topic_key = ?'
+                                   ' WHERE url_id = ?;', webpages)
+
+
+#_____________________________________
+#       create_lookup_indexes
+#_____________________________________
+def create_lookup_indexes(connection):
+    """
+       Creates the indexes on the foreign keys the app looks rows up
+      by which SQLite doesn't index on its own. Without the one on
+      LESSON_ID listing the audio of a lesson, which the Audio frame
+      and the study sheets do in ENGLISH order, scanned the whole
+      HEBREW_AUDIO table and sorted the result.
+    """
+    connection.executescript("""
+        CREATE INDEX IF NOT EXISTS hebrew_audio_lesson
+          ON hebrew_audio(lesson_id, english);
+        """)
+
+
+#_____________________________________
+#          create_audio_fts
+#_____________________________________
+def create_audio_fts(connection):
+    """
+       Creates the HEBREW_AUDIO_FTS full-text table over the ENGLISH,
+      HEBREW and HEBREW_NO_NIQQUD columns of the HEBREW_AUDIO table
+      along with the triggers that keep it in sync.
+       The index is only populated the first time it's created,
+      afterwards the triggers take care of every insert, update
+      and delete.
+    """
+    global fts_available
+
+    exists = connection.execute("SELECT 1 FROM sqlite_master"
+                                " WHERE type = 'table' AND name = ?;",
+                                (AUDIO_FTS,)).fetchone()
+    try:
+        connection.executescript(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {AUDIO_FTS}
+              USING fts5(english, hebrew, hebrew_no_niqqud,
+                         content='hebrew_audio',
+                         content_rowid='audio_id',
+                         tokenize='trigram');
+
+            CREATE TRIGGER IF NOT EXISTS {AUDIO_FTS}_insert
+              AFTER INSERT ON hebrew_audio
+            BEGIN
+              INSERT INTO {AUDIO_FTS}(rowid, english, hebrew, hebrew_no_niqqud)
+                VALUES (new.audio_id, new.english, new.hebrew,
+                        new.hebrew_no_niqqud);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {AUDIO_FTS}_delete
+              AFTER DELETE ON hebrew_audio
+            BEGIN
+              INSERT INTO {AUDIO_FTS}({AUDIO_FTS}, rowid, english, hebrew,
+                                      hebrew_no_niqqud)
+                VALUES ('delete', old.audio_id, old.english, old.hebrew,
+                        old.hebrew_no_niqqud);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS {AUDIO_FTS}_update
+              AFTER UPDATE OF english, hebrew, hebrew_no_niqqud
+              ON hebrew_audio
+            BEGIN
+              INSERT INTO {AUDIO_FTS}({AUDIO_FTS}, rowid, english, hebrew,
+                                      hebrew_no_niqqud)
+                VALUES ('delete', old.audio_id, old.english, old.hebrew,
+                        old.hebrew_no_niqqud);
+              INSERT INTO {AUDIO_FTS}(rowid, english, hebrew, hebrew_no_niqqud)
+                VALUES (new.audio_id, new.english, new.hebrew,
+                        new.hebrew_no_niqqud);
+            END;
+            """)
+        if not exists:
+            with transaction(connection):
+                connection.execute(f"INSERT INTO {AUDIO_FTS}({AUDIO_FTS})"
+                                   " VALUES ('rebuild');")
+        fts_available = True
+    except sqlite3.OperationalError as err:
+        # No FTS5 or no trigram tokenizer in this SQLite build
+        print(f'Full-text search unavailable: {err.args[0]}')
+        fts_available = False
+    return fts_available
+
+
+#_____________________________________
+#        migrate_categories
+#_____________________________________
+def migrate_categories(connection):
+    """
+       Moves the members of every category from its own table, e.g.
+      ANIMALS or BODY_PARTS, into the single CATEGORY_MEMBER table and
+      gives the CATEGORY table a CATEGORY_ID.
+       Each legacy table is replaced by a view of the same name over
+      CATEGORY_MEMBER so that SQL written against the old tables,
+      e.g. "SELECT audio_id FROM animals", keeps working.
+       Does nothing once CATEGORY_MEMBER exists. The whole migration
+      is one transaction so it either completes or leaves the old
+      tables as they were.
+    """
+    exists = connection.execute("SELECT 1 FROM sqlite_master"
+                                " WHERE type = 'table'"
+                                "   AND name = 'category_member';").fetchone()
+    if exists:
+        return False
+
+    with transaction(connection):
+        connection.execute('ALTER TABLE category RENAME TO category_orig;')
+        connection.execute('CREATE TABLE category'
+                           ' (category_id INTEGER PRIMARY KEY,'
+                           '  name VARCHAR(30) NOT NULL UNIQUE);')
+        connection.execute('INSERT INTO category(category_id, name)'
+                           ' SELECT rowid, name FROM category_orig'
+                           '  ORDER BY rowid;')
+        connection.execute('DROP TABLE category_orig;')
+        connection.execute('CREATE TABLE category_member'
+                           ' (category_id INTEGER NOT NULL,'
+                           '  audio_id INTEGER NOT NULL,'
+                           '  PRIMARY KEY (category_id, audio_id),'
+                           '  FOREIGN KEY (category_id)'
+                           '  REFERENCES category(category_id),'
+                           '  FOREIGN KEY (audio_id)'
+                           '  REFERENCES hebrew_audio(audio_id))'
+                           ' WITHOUT ROWID;')
+        connection.execute('CREATE INDEX category_member_audio'
+                           ' ON category_member(audio_id, category_id);')
+
+        tables = {row[0].lower(): row[0] for row in
+                  connection.execute("SELECT name FROM sqlite_master"
+                                     " WHERE type = 'table';")}
+        categories = connection.execute('SELECT category_id, name'
+                                        ' FROM category;').fetchall()
+        for category_id, name in categories:
+            legacy_table = tables.get(name.replace(' ', '_').lower())
+            if legacy_table is None:
+                continue
+            connection.execute('INSERT OR IGNORE INTO category_member'
+                               ' SELECT ?, audio_id'
+                               f' FROM "{legacy_table}";',
+                               (category_id,))
+            connection.execute(f'DROP TABLE "{legacy_table}";')
+            connection.execute(f'CREATE VIEW "{legacy_table}" AS'
+                               ' SELECT audio_id FROM category_member'
+                               f' WHERE category_id = {category_id};')
+    return True
+
+
+#_____________________________________
+#          is_prefix_search
+#_____________________________________
+def is_prefix_search(search):
+    """
+       A search ending in a single '%', e.g. 'שלו%', and containing
+      no other wildcards is a prefix search.
+    """
+    return (search.endswith('%') and search.count('%') == 1
+            and '_' not in search and len(search) > 1)
+
+
+#_____________________________________
+#          audio_key_query
+#_____________________________________
+def audio_key_query(search, prefix=True):
+    """
+       Returns the SQL statement and parameters that find every
+      HEBREW_AUDIO row whose Hebrew or English search key starts
+      with, or if prefix is False equals, the search key of the
+      search text.
+       A prefix search is the range low <= key < high of
+      hebrew_text.prefix_range over the HEBREW_KEY and ENGLISH_KEY
+      indexes, so niqqud, final letters and case are ignored.
+    """
+    key = hebrew_text.search_key(search.rstrip('%'))
+    if prefix:
+        low, high = hebrew_text.prefix_range(key)
+        condition = '{0} >= :low AND {0} < :high'
+        params = {'low': low, 'high': high}
+    else:
+        condition = '{0} = :key'
+        params = {'key': key}
+    return ('SELECT english, audio_id'
+            ' FROM hebrew_audio'
+            ' WHERE ' + condition.format('hebrew_key') +
+            ' UNION'
+            ' SELECT english, audio_id'
+            ' FROM hebrew_audio'
+            ' WHERE ' + condition.format('english_key') +
+            '  ORDER BY english;', params)
+
+
+#_____________________________________
+#          audio_search_query
+#_____________________________________
+def audio_search_query(search):
+    """
+       Returns the SQL statement and parameters that find every
+      HEBREW_AUDIO row whose English, Hebrew or Hebrew without niqqud
+      contains the search text. A search ending in '%' finds the rows
+      that start with the search text instead.
+       The full-text index is used whenever the search is long
+      enough for the trigram tokenizer and the results are ranked
+      by bm25 so that the closest matches come first. Shorter
+      searches fall back to LIKE scans of the HEBREW_AUDIO table.
+       The statement and parameters are saved together as the
+      active audio query and re-run whenever the Audio list is
+      refreshed. The text searched is returned along with the
+      ENGLISH and AUDIO_ID so that a live search can narrow the
+      results as more text is typed.
+    """
+    if is_prefix_search(search):
+        return audio_key_query(search)
+
+    if fts_available and len(search) >= FTS_MIN_SEARCH:
+        #  Quoting the search text as an FTS5 string keeps any
+        # punctuation in it from being read as query syntax.
+        match = '"' + search.replace('"', '""') + '"'
+        return ('SELECT ha.english, ha.audio_id, ha.hebrew, ha.hebrew_no_niqqud'
+                f' FROM {AUDIO_FTS} fts'
+                '  JOIN hebrew_audio ha ON ha.audio_id = fts.rowid'
+                f' WHERE {AUDIO_FTS} MATCH ?'
+                '  ORDER BY fts.rank, ha.english;', (match,))
+
+    return ('SELECT english, audio_id, hebrew, hebrew_no_niqqud'
+            ' FROM hebrew_audio'
+            ' WHERE english LIKE :pattern'
+            ' OR hebrew LIKE :pattern'
+            ' OR hebrew_no_niqqud LIKE :pattern'
+            '  ORDER BY english;', {'pattern': f'%{search}%'})
+
+
+#_____________________________________
+#         webpage_search_query
+#_____________________________________
+def webpage_search_query(search):
+    """
+       Returns the SQL statement and parameters that find the topics
+      in the WEBPAGE table matching the search text. The default is
+      '%search text%'. A search ending in '%' is a prefix search on
+      the topics' search keys and any other '%' in the text is passed
+      on to LIKE as is.
+    """
+    if is_prefix_search(search):
+        key = hebrew_text.search_key(search.rstrip('%'))
+        where_clause = ' WHERE topic_key >= ? AND topic_key < ?'
+        params = hebrew_text.prefix_range(key)
+    elif search.find('%') > -1:
+        where_clause = ' WHERE topic LIKE ?'
+        params = (search,)
+    else:
+        where_clause = ' WHERE topic LIKE ?'
+        params = (f'%{search}%',)
+    return ('SELECT topic, url_id'
+            '  FROM webpage'
+            f' {where_clause}'
+            '  ORDER BY topic;', params)
+
+
+#_____________________________________
+#      create_audio_detail_view
+#_____________________________________
+def create_audio_detail_view(connection):
+    """
+       Creates the AUDIO_DETAIL view which returns everything the
+      Audio frame displays for an AUDIO_ID in one row: its English,
+      Hebrew and audio file, the name of its lesson and its associated
+      webpages as a JSON array of [topic, url_id] pairs sorted by topic.
+    """
+    connection.executescript("""
+        CREATE VIEW IF NOT EXISTS audio_detail AS
+          SELECT ha.audio_id, ha.english, ha.hebrew, ha.audio_file,
+                 ha.lesson_id, l.name AS lesson,
+                 (SELECT json_group_array(json_array(topic, url_id))
+                    FROM (SELECT w.topic, w.url_id
+                            FROM audio_url_link aul
+                            JOIN webpage w ON w.url_id = aul.url_id
+                            WHERE aul.audio_id = ha.audio_id
+                            ORDER BY w.topic)) AS webpages
+            FROM hebrew_audio ha
+            LEFT JOIN lesson l ON l.lesson_id = ha.lesson_id;
+        """)
+
+
+#_____________________________________
+#      create_sheet_build_state
+#_____________________________________
+def create_sheet_build_state(connection):
+    """
+       Creates the STUDY_SHEET_BUILD table which records, for each
+      study sheet written by hebrew_sheets.build_all_sheets, the hash
+      of its input rows and template and the size and modification
+      time of the file written, so an unchanged sheet isn't rebuilt.
+    """
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS study_sheet_build (
+            path TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            language TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            file_mtime INTEGER NOT NULL,
+            built TEXT NOT NULL
+        );
+        """)
+
+
+#_____________________________________
+#        create_media_index
+#_____________________________________
+def create_media_index(connection):
+    """
+       Creates the MEDIA_FILE table which records, for each audio file
+      in the media folder indexed by hebrew_media.index_media, its size
+      and modification time, what its headers say about its audio and
+      a checksum of its contents, or the error that stopped it from
+      being read. A file whose size and modification time haven't
+      changed isn't read again.
+       File names are compared without regard to case, as Windows
+      does, so they match the AUDIO_FILE column however it's spelt.
+    """
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS media_file (
+            file_name TEXT PRIMARY KEY COLLATE NOCASE,
+            file_size INTEGER NOT NULL,
+            file_mtime INTEGER NOT NULL,
+            format TEXT,
+            duration REAL,
+            sample_rate INTEGER,
+            channels INTEGER,
+            bitrate INTEGER,
+            checksum TEXT,
+            error TEXT,
+            indexed TEXT NOT NULL
+        );
+        """)
+
+#====================================================================
+#                         AudioDetailCache
+#====================================================================
+class AudioDetailCache():
+    """
+       Remembers the details returned by hebrew_repository.audio_detail
+      keyed by AUDIO_ID and category so that scrolling back and forth
+      through the Audio list doesn't go back to the database.
+       Anything that changes an audio's details has to invalidate it.
+      Every invalidation starts a new generation and details fetched
+      in an earlier generation are not stored, since they may have been
+      read before the change was written.
+       Only used from the Tk main loop so it needs no lock.
+    """
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.details = collections.OrderedDict()
+
+    #_____________________________________
+    #               get
+    #_____________________________________
+    def get(self, audio_id, category_table=''):
+        """
+           Returns the cached details or None.
+        """
+        key = (int(audio_id), category_table)
+        detail = self.details.get(key)
+        if detail is not None:
+            self.details.move_to_end(key)
+        return detail
+
+    #_____________________________________
+    #               put
+    #_____________________________________
+    def put(self, audio_id, category_table, detail, generation):
+        """
+           Caches the details if nothing has been invalidated since
+          they were requested in the given generation.
+        """
+        if generation != self.generation or detail is None:
+            return
+        self.details[(int(audio_id), category_table)] = detail
+        if len(self.details) > self.max_entries:
+            self.details.popitem(last=False)
+
+    #_____________________________________
+    #            invalidate
+    #_____________________________________
+    def invalidate(self, audio_id=None):
+        """
+           Drops the details of the audio, or of every audio if no
+          AUDIO_ID is given.
+        """
+        self.generation += 1
+        if audio_id is None:
+            self.details.clear()
+        else:
+            audio_id = int(audio_id)
+            for key in [key for key in self.details if key[0] == audio_id]:
+                del self.details[key]
@@ -0,0 +1,380 @@
+"""
+   Media library index for the Hebrew Studies app.
+
+   The app only knows an audio file by the AUDIO_FILE name in the
+  HEBREW_AUDIO table, so a file that's missing from the media folder
+  or can't be decoded used to go unnoticed until it was played. The
+  MEDIA_FILE table indexes every MP3 and WAV file in the folder with
+  its size, duration, sample rate, channels, bitrate and a checksum,
+  or the error that stopped it from being read, and the audio files
+  with problems can be listed before any of them is played.
+   The duration and bitrate of an MP3 are worked out by walking its
+  MPEG audio frame headers, so variable bitrate files are timed
+  correctly, and those of a WAV from its RIFF header. Nothing is
+  decoded, so pygame isn't needed.
+   Indexing is incremental. A file whose size and modification time
+  are the ones recorded isn't read again and the files that have gone
+  are dropped. When there are enough files to read they're read by a
+  pool of processes, each given a batch of files.
+
+   Usage:
+       python hebrew_media.py
+       python hebrew_media.py --workers 4 --force
+
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import os
+import struct
+import time
+
+import hebrew_db
+import hebrew_repository
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEBREW_DB = os.path.join(HERE, 'hebrew_studies.db')
+HEBREW_MEDIA = os.path.join(HERE, 'Media')
+
+# The extensions of the files indexed
+MEDIA_EXTENSIONS = ('.mp3', '.wav')
+
+#  Fewer files than this are read in the calling process since
+# starting a pool of processes would take longer than reading them.
+PARALLEL_FILES = 64
+
+#  Bitrates in kbit/s by MPEG version and layer, indexed by the
+# header's 4 bit bitrate index. Index 0 is 'free' and 15 is invalid.
+MPEG_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+#  Sample rates in Hz by the header's 2 bit version id, i.e. 0 for
+# MPEG 2.5, 2 for MPEG 2 and 3 for MPEG 1, and sample rate index.
+MPEG_SAMPLE_RATES = {0: (11025, 12000, 8000),
+                     2: (22050, 24000, 16000),
+                     3: (44100, 48000, 32000)}
+
+
+#_____________________________________
+#          mpeg_frame_header
+#_____________________________________
+def mpeg_frame_header(data, offset):
+    """
+       Returns (frame length, samples, sample rate, channels, bitrate)
+      of the MPEG audio frame whose header starts at the offset, or
+      None if there's no valid frame header there.
+    """
+    if offset + 4 > len(data):
+        return None
+    header, = struct.unpack_from('>I', data, offset)
+    if header & 0xFFE00000 != 0xFFE00000:
+        return None
+    version_id = (header >> 19) & 3
+    layer = 4 - ((header >> 17) & 3)
+    bitrate_index = (header >> 12) & 15
+    sample_rate_index = (header >> 10) & 3
+    if version_id == 1 or layer == 4 or bitrate_index in (0, 15) or \
+       sample_rate_index == 3:
+        return None
+    version = 1 if version_id == 3 else 2
+    bitrate = MPEG_BITRATES[version, layer][bitrate_index] * 1000
+    sample_rate = MPEG_SAMPLE_RATES[version_id][sample_rate_index]
+    padding = (header >> 9) & 1
+    channels = 1 if (header >> 6) & 3 == 3 else 2
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or version == 1 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return length, samples, sample_rate, channels, bitrate
+
+
+#_____________________________________
+#          id3v2_length
+#_____________________________________
+def id3v2_length(data, offset=0):
+    """
+       Returns the length of the ID3v2 tag, including its header and
+      footer, at the offset, or 0 if there isn't one.
+    """
+    if data[offset:offset + 3] != b'ID3' or len(data) < offset + 10:
+        return 0
+    size = 0
+    for byte in data[offset + 6:offset + 10]:
+        size = size << 7 | (byte & 0x7F)
+    footer = 10 if data[offset + 5] & 0x10 else 0
+    return 10 + size + footer
+
+
+#_____________________________________
+#          is_info_frame
+#_____________________________________
+def is_info_frame(data, offset, version_mono):
+    """
+       True if the frame at the offset is a Xing or Info frame, the
+      silent frame encoders put first to describe the file, which
+      players skip. version_mono is (MPEG 1, mono) of the frame.
+    """
+    side_info = {(True, False): 32, (True, True): 17,
+                 (False, False): 17, (False, True): 9}[version_mono]
+    tag = data[offset + 4 + side_info:offset + 8 + side_info]
+    return tag in (b'Xing', b'Info')
+
+
+#_____________________________________
+#             mp3_info
+#_____________________________________
+def mp3_info(data):
+    """
+       Returns the duration, sample rate, channels and average bitrate
+      of an MP3 from its frame headers. The frames are walked from
+      the first one, found after any ID3v2 tags, to the first place
+      that isn't a frame header, e.g. an ID3v1 tag at the end.
+       Raises ValueError if there are no frames or the last frame is
+      cut short.
+    """
+    offset = 0
+    while True:
+        tag = id3v2_length(data, offset)
+        if not tag:
+            break
+        offset += tag
+
+    #  Look for two frames in a row so a stray 0xFF in the data
+    # isn't taken for the first frame.
+    start = data.find(b'\xff', offset)
+    while start >= 0:
+        frame = mpeg_frame_header(data, start)
+        if frame and mpeg_frame_header(data, start + frame[0]) is not None:
+            break
+        start = data.find(b'\xff', start + 1)
+    if start < 0:
+        raise ValueError('No MPEG audio frames found')
+
+    offset = start
+    frames = samples = audio_bytes = 0
+    sample_rate = channels = None
+    first = True
+    while True:
+        frame = mpeg_frame_header(data, offset)
+        if frame is None:
+            break
+        length, frame_samples, sample_rate, channels, bitrate = frame
+        if offset + length > len(data):
+            raise ValueError(f'Frame {frames + 1} at byte {offset} is cut short')
+        if not (first and is_info_frame(data, offset,
+                                        (frame_samples == 1152 and
+                                         sample_rate >= 32000, channels == 1))):
+            frames += 1
+            samples += frame_samples
+            audio_bytes += length
+        first = False
+        offset += length
+    if not frames:
+        raise ValueError('No MPEG audio frames found')
+    duration = samples / sample_rate
+    return {'format': 'mp3', 'duration': duration, 'sample_rate': sample_rate,
+            'channels': channels,
+            'bitrate': round(audio_bytes * 8 / duration)}
+
+
+#_____________________________________
+#             wav_info
+#_____________________________________
+def wav_info(data):
+    """
+       Returns the duration, sample rate, channels and bitrate of a WAV
+      from its RIFF 'fmt ' and 'data' chunks.
+       Raises ValueError if it isn't a RIFF WAVE file, either chunk
+      is missing or the data is cut short.
+    """
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError('Not a RIFF WAVE file')
+    offset = 12
+    fmt = data_size = None
+    while offset + 8 <= len(data):
+        chunk, size = struct.unpack_from('<4sI', data, offset)
+        if chunk == b'fmt ' and size >= 16:
+            fmt = struct.unpack_from('<HHIIHH', data, offset + 8)
+        elif chunk == b'data':
+            data_size = size
+            if offset + 8 + size > len(data):
+                raise ValueError(f'The data chunk is cut short, {size} bytes'
+                                 f' expected, {len(data) - offset - 8} found')
+        offset += 8 + size + (size & 1)
+    if fmt is None:
+        raise ValueError("No 'fmt ' chunk")
+    if data_size is None:
+        raise ValueError("No 'data' chunk")
+    unused, channels, sample_rate, byte_rate, unused, unused = fmt
+    if not byte_rate:
+        raise ValueError('The byte rate is 0')
+    return {'format': 'wav', 'duration': data_size / byte_rate,
+            'sample_rate': sample_rate, 'channels': channels,
+            'bitrate': byte_rate * 8}
+
+
+#_____________________________________
+#            read_file
+#_____________________________________
+def read_file(path):
+    """
+       Reads an audio file and returns its MEDIA_FILE row as a
+      dictionary. A file that can't be read or parsed is recorded
+      with its error and whatever could be found out.
+    """
+    entry = {'file_name': os.path.basename(path), 'format': None,
+             'duration': None, 'sample_rate': None, 'channels': None,
+             'bitrate': None, 'checksum': None, 'error': None,
+             'indexed': time.strftime('%Y-%m-%d %H:%M:%S')}
+    try:
+        with open(path, 'rb') as media_file:
+            stat = os.fstat(media_file.fileno())
+            data = media_file.read()
+    except OSError as err:
+        entry.update(file_size=0, file_mtime=0,
+                     error=f'{type(err).__name__}: {err.strerror or err}')
+        return entry
+    entry.update(file_size=stat.st_size, file_mtime=stat.st_mtime_ns,
+                 checksum=hashlib.sha256(data).hexdigest())
+    try:
+        if path.lower().endswith('.wav'):
+            entry.update(wav_info(data))
+        else:
+            entry.update(mp3_info(data))
+    except (ValueError, struct.error) as err:
+        entry['error'] = str(err)
+    return entry
+
+
+#_____________________________________
+#            read_files
+#_____________________________________
+def read_files(paths):
+    """
+       Reads a batch of audio files and returns their MEDIA_FILE rows.
+      Runs in a worker process so it only takes and returns things
+      that can be pickled.
+    """
+    return [read_file(path) for path in paths]
+
+
+#_____________________________________
+#           media_files
+#_____________________________________
+def media_files(media):
+    """
+       Returns the (size, modification time) of every audio file in
+      the media folder keyed by its file name.
+    """
+    files = {}
+    with os.scandir(media) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(MEDIA_EXTENSIONS) and entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+#_____________________________________
+#            index_media
+#_____________________________________
+def index_media(connection, media=HEBREW_MEDIA, workers=None, force=False):
+    """
+       Brings the MEDIA_FILE table up to date with the media folder
+      and returns a summary of what was done along with the audio
+      files of HEBREW_AUDIO that are missing or couldn't be read.
+       Only the files that are new or whose size or modification time
+      has changed, or all of them if force is True, are read. When
+      there are at least PARALLEL_FILES of them they're dealt out round
+      robin in one batch per worker to a pool of processes.
+    """
+    start = time.perf_counter()
+    hebrew_db.create_media_index(connection)
+    files = media_files(media)
+    indexed = {row['file_name'].casefold(): (row['file_name'],
+                                             row['file_size'], row['file_mtime'])
+               for row in hebrew_repository.fetch_all(connection, 'media', 'state')}
+    stale = [name for name, state in files.items()
+             if force or indexed.get(name.casefold(), (None,))[1:] != state]
+    present = {name.casefold() for name in files}
+    gone = [file_name for key, (file_name, unused, unused) in indexed.items()
+            if key not in present]
+
+    paths = [os.path.join(media, name) for name in stale]
+    workers = min(workers or os.cpu_count() or 1, len(paths)) or 1
+    if len(paths) < PARALLEL_FILES:
+        workers = 1
+    if workers == 1:
+        entries = read_files(paths)
+    else:
+        entries = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in pool.map(read_files, [paths[i::workers]
+                                               for i in range(workers)]):
+                entries.extend(batch)
+
+    if entries or gone:
+        with hebrew_db.transaction(connection):
+            connection.executemany(hebrew_repository.sql('media', 'delete'),
+                                   [(file_name,) for file_name in gone])
+            connection.executemany(hebrew_repository.sql('media', 'save'),
+                                   entries)
+    problems = [(row['audio_file'], row['error']) for row in
+                hebrew_repository.fetch_all(connection, 'media', 'problems')]
+    return {'files': len(files),
+            'read': len(entries),
+            'unchanged': len(files) - len(stale),
+            'removed': len(gone),
+            'failed': sum(1 for entry in entries if entry['error']),
+            'workers': workers if entries else 0,
+            'seconds': round(time.perf_counter() - start, 6),
+            'problems': problems}
+
+
+#_____________________________________
+#               main
+#_____________________________________
+def main(argv=None):
+    """
+       Indexes the media folder from the command line and lists the
+      audio files that are missing or couldn't be read.
+    """
+    parser = argparse.ArgumentParser(
+        description='Index the audio files in the media folder.')
+    parser.add_argument('--db', default=HEBREW_DB,
+                        help='the Hebrew Studies database')
+    parser.add_argument('--media', default=HEBREW_MEDIA,
+                        help='the folder holding the audio files')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes, defaults to the CPU count')
+    parser.add_argument('--force', action='store_true',
+                        help='read every file whether it changed or not')
+    args = parser.parse_args(argv)
+
+    connection = hebrew_db.open_database(args.db)
+    try:
+        summary = index_media(connection, args.media, workers=args.workers,
+                              force=args.force)
+    finally:
+        connection.close()
+    for audio_file, error in summary['problems']:
+        print(f'{audio_file}: {error}')
+    print(f"Read {summary['read']} of {summary['files']} audio files"
+          f" with {summary['workers']} workers, {summary['unchanged']}"
+          f" unchanged, {summary['removed']} removed, {summary['failed']}"
+          f" unreadable, in {summary['seconds'] * 1000:.1f} ms."
+          f" {len(summary['problems'])} audio files with problems.")
+    return 1 if summary['problems'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,391 @@
+"""
+   Named SQL statements for the Hebrew Studies app.
+
+   Every statement the app runs against one of its entities, i.e.
+  an audio, webpage, lesson, category, study sheet or link between
+  an audio and a webpage, is defined once here with SQLite parameters
+  in place of its values. Since the text of each statement never
+  changes the connection's statement cache prepares it once and
+  reuses it, and quotes in a topic or Hebrew phrase can't break the
+  SQL.
+
+   Usage:
+       fetch_one(connection, 'webpage', 'url', (url_id,))
+       db_worker.query(sql('lesson', 'names'), on_done=...)
+
+"""
+
+import json
+
+import hebrew_db
+import hebrew_text
+
+QUERIES = {
+    'audio': {
+        'all': ('SELECT english, audio_id'
+                ' FROM hebrew_audio'
+                ' ORDER BY english;'),
+        'by_lesson': ('SELECT ha.english, ha.audio_id'
+                      ' FROM hebrew_audio ha'
+                      '  JOIN lesson l ON l.lesson_id = ha.lesson_id'
+                      ' WHERE l.name = ?'
+                      ' ORDER BY ha.english;'),
+        'by_ids': ('SELECT ha.english, ha.audio_id'
+                   ' FROM json_each(?) ids'
+                   '  JOIN hebrew_audio ha ON ha.audio_id = ids.value'
+                   ' ORDER BY ids.key;'),
+        'texts': ('SELECT audio_id, english, hebrew'
+                  ' FROM hebrew_audio;'),
+        'files': ('SELECT audio_id, audio_file'
+                  ' FROM hebrew_audio'
+                  ' WHERE audio_id IN (SELECT value FROM json_each(?));'),
+        'detail': ('SELECT ad.*,'
+                   '  CASE WHEN :category = \'\' THEN NULL'
+                   '   ELSE EXISTS (SELECT 1 FROM category_member cm'
+                   '                 JOIN category c'
+                   '                   ON c.category_id = cm.category_id'
+                   '                 WHERE c.name = :category'
+                   '                   AND cm.audio_id = ad.audio_id)'
+                   '  END AS in_category'
+                   ' FROM audio_detail ad'
+                   ' WHERE ad.audio_id = :audio_id;'),
+        # The parameters of insert and update go through audio_keys
+        'insert': ('INSERT INTO hebrew_audio(english, hebrew, audio_file,'
+                   '  lesson_id, hebrew_no_niqqud, hebrew_key, english_key)'
+                   ' VALUES (:english, :hebrew, :audio_file,'
+                   '         (SELECT lesson_id FROM lesson'
+                   '           WHERE name = :lesson),'
+                   '         :hebrew_no_niqqud, :hebrew_key, :english_key);'),
+        'update': ('UPDATE hebrew_audio'
+                   ' SET english = :english, hebrew = :hebrew,'
+                   '     audio_file = :audio_file,'
+                   '     hebrew_no_niqqud = :hebrew_no_niqqud,'
+                   '     hebrew_key = :hebrew_key, english_key = :english_key'
+                   ' WHERE audio_id = :audio_id;'),
+        'delete': ('DELETE FROM hebrew_audio'
+                   ' WHERE audio_id = ?;'),
+        'set_lesson': ('UPDATE hebrew_audio'
+                       ' SET lesson_id = (SELECT lesson_id FROM lesson'
+                       '                   WHERE name = :lesson)'
+                       ' WHERE audio_id = :audio_id;'),
+        'clear_lesson': ('UPDATE hebrew_audio'
+                         ' SET lesson_id = NULL'
+                         ' WHERE audio_id = ?;'),
+        'sheet_by_lesson': ('SELECT english, hebrew, audio_file'
+                            ' FROM hebrew_audio'
+                            ' WHERE lesson_id ='
+                            '  (SELECT lesson_id FROM lesson'
+                            '    WHERE name = ?)'
+                            ' ORDER BY {order};'),
+        'sheet_by_category': ('SELECT english, hebrew, audio_file'
+                              ' FROM hebrew_audio'
+                              ' WHERE audio_id IN'
+                              '  (SELECT cm.audio_id'
+                              '    FROM category_member cm'
+                              '     JOIN category c'
+                              '       ON c.category_id = cm.category_id'
+                              '    WHERE c.name = ?)'
+                              ' ORDER BY {order};'),
+    },
+    'webpage': {
+        'topics': ('SELECT topic, url_id'
+                   ' FROM webpage'
+                   ' ORDER BY topic;'),
+        'url': ('SELECT url'
+                ' FROM webpage'
+                ' WHERE url_id = ?;'),
+        # The parameters of insert and update go through webpage_keys
+        'insert': ('INSERT INTO webpage(topic, url, topic_key)'
+                   ' VALUES (:topic, :url, :topic_key);'),
+        'update': ('UPDATE webpage'
+                   ' SET topic = :topic, url = :url, topic_key = :topic_key'
+                   ' WHERE url_id = :url_id;'),
+        'delete': ('DELETE FROM webpage'
+                   ' WHERE url_id = ?;'),
+    },
+    'lesson': {
+        'names': ('SELECT name'
+                  ' FROM lesson'
+                  ' ORDER BY name;'),
+        'insert': ('INSERT OR IGNORE INTO lesson(name)'
+                   ' VALUES (?);'),
+    },
+    'category': {
+        'names': ('SELECT name'
+                  ' FROM category'
+                  ' ORDER BY name;'),
+        'members': ('SELECT ha.english, ha.audio_id'
+                    ' FROM category c'
+                    '  JOIN category_member cm'
+                    '    ON cm.category_id = c.category_id'
+                    '  JOIN hebrew_audio ha ON ha.audio_id = cm.audio_id'
+                    ' WHERE c.name = ?'
+                    ' ORDER BY ha.english;'),
+        'insert': ('INSERT OR IGNORE INTO category(name)'
+                   ' VALUES (?);'),
+        'add_member': ('INSERT INTO category_member(category_id, audio_id)'
+                       ' SELECT category_id, :audio_id'
+                       '  FROM category'
+                       '  WHERE name = :category;'),
+        'add_member_if_missing': ('INSERT OR IGNORE'
+                                  ' INTO category_member(category_id, audio_id)'
+                                  ' SELECT category_id, :audio_id'
+                                  '  FROM category'
+                                  '  WHERE name = :category;'),
+        'remove_member': ('DELETE FROM category_member'
+                          ' WHERE audio_id = :audio_id'
+                          '   AND category_id ='
+                          '    (SELECT category_id FROM category'
+                          '      WHERE name = :category);'),
+    },
+    'sheet': {
+        # The rows of each subject joined into one string in AUDIO_ID
+        # order with ASCII unit and record separators, to be hashed.
+        'lesson_rows': ('SELECT subject, group_concat(item, char(30)) AS items'
+                        ' FROM (SELECT l.name AS subject,'
+                        '        ha.audio_id || char(31) || ifnull(ha.english, \'\')'
+                        '         || char(31) || ifnull(ha.hebrew, \'\')'
+                        '         || char(31) || ifnull(ha.audio_file, \'\') AS item'
+                        '       FROM lesson l'
+                        '        JOIN hebrew_audio ha'
+                        '          ON ha.lesson_id = l.lesson_id'
+                        '       ORDER BY l.name, ha.audio_id)'
+                        ' GROUP BY subject;'),
+        'category_rows': ('SELECT subject, group_concat(item, char(30)) AS items'
+                          ' FROM (SELECT c.name AS subject,'
+                          '        ha.audio_id || char(31) || ifnull(ha.english, \'\')'
+                          '         || char(31) || ifnull(ha.hebrew, \'\')'
+                          '         || char(31) || ifnull(ha.audio_file, \'\') AS item'
+                          '       FROM category c'
+                          '        JOIN category_member cm'
+                          '          ON cm.category_id = c.category_id'
+                          '        JOIN hebrew_audio ha'
+                          '          ON ha.audio_id = cm.audio_id'
+                          '       ORDER BY c.name, ha.audio_id)'
+                          ' GROUP BY subject;'),
+        'build_state': ('SELECT path, input_hash, file_size, file_mtime'
+                        ' FROM study_sheet_build;'),
+        'save_build': ('INSERT OR REPLACE INTO study_sheet_build(path, kind,'
+                       '  subject, language, input_hash, file_size,'
+                       '  file_mtime, built)'
+                       ' VALUES (:path, :kind, :subject, :language,'
+                       '         :input_hash, :file_size, :file_mtime,'
+                       '         :built);'),
+    },
+    'media': {
+        'state': ('SELECT file_name, file_size, file_mtime'
+                  ' FROM media_file;'),
+        'save': ('INSERT OR REPLACE INTO media_file(file_name, file_size,'
+                 '  file_mtime, format, duration, sample_rate, channels,'
+                 '  bitrate, checksum, error, indexed)'
+                 ' VALUES (:file_name, :file_size, :file_mtime, :format,'
+                 '         :duration, :sample_rate, :channels, :bitrate,'
+                 '         :checksum, :error, :indexed);'),
+        'delete': ('DELETE FROM media_file'
+                   ' WHERE file_name = ?;'),
+        # The audio files of HEBREW_AUDIO that aren't in the media
+        # folder or couldn't be read, with the reason.
+        'problems': ('SELECT ha.audio_file,'
+                     '  ifnull(mf.error, \'Not in the media folder\') AS error'
+                     ' FROM (SELECT DISTINCT audio_file FROM hebrew_audio'
+                     '        WHERE audio_file LIKE \'%.mp3\''
+                     '           OR audio_file LIKE \'%.wav\') ha'
+                     '  LEFT JOIN media_file mf ON mf.file_name = ha.audio_file'
+                     ' WHERE mf.file_name IS NULL OR mf.error IS NOT NULL'
+                     ' ORDER BY ha.audio_file;'),
+    },
+    'link': {
+        'insert': ('INSERT INTO audio_url_link(audio_id, url_id)'
+                   ' VALUES (:audio_id, :url_id);'),
+        'insert_if_missing': ('INSERT OR IGNORE'
+                              ' INTO audio_url_link(audio_id, url_id)'
+                              ' VALUES (:audio_id, :url_id);'),
+        'delete': ('DELETE FROM audio_url_link'
+                   ' WHERE audio_id = :audio_id'
+                   '   AND url_id = :url_id;'),
+    },
+}
+
+# The columns a study sheet can be sorted on
+SHEET_ORDERS = ('English', 'Hebrew', 'English, Hebrew')
+
+
+#_____________________________________
+#               sql
+#_____________________________________
+def sql(entity, name):
+    """
+       Returns the text of the named statement.
+    """
+    return QUERIES[entity][name]
+
+
+#_____________________________________
+#            fetch_all
+#_____________________________________
+def fetch_all(connection, entity, name, params=()):
+    """
+       Runs the named query and returns all the rows.
+    """
+    return connection.execute(QUERIES[entity][name], params).fetchall()
+
+
+#_____________________________________
+#            fetch_one
+#_____________________________________
+def fetch_one(connection, entity, name, params=()):
+    """
+       Runs the named query and returns the first row or None.
+    """
+    return connection.execute(QUERIES[entity][name], params).fetchone()
+
+
+#_____________________________________
+#             execute
+#_____________________________________
+def execute(connection, entity, name, params=()):
+    """
+       Runs the named statement and returns the number of rows it
+      changed. The caller commits, usually by running it inside a
+      hebrew_db.transaction.
+    """
+    return connection.execute(QUERIES[entity][name], params).rowcount
+
+
+#_____________________________________
+#            audio_keys
+#_____________________________________
+def audio_keys(params):
+    """
+       Returns the parameters of an audio insert or update with the
+      HEBREW_NO_NIQQUD, HEBREW_KEY and ENGLISH_KEY columns worked out
+      from the english and hebrew parameters.
+    """
+    return dict(params,
+                hebrew_no_niqqud=hebrew_text.remove_niqqud(params['hebrew']),
+                hebrew_key=hebrew_text.search_key(params['hebrew']),
+                english_key=hebrew_text.search_key(params['english']))
+
+
+#_____________________________________
+#           webpage_keys
+#_____________________________________
+def webpage_keys(params):
+    """
+       Returns the parameters of a webpage insert or update with the
+      TOPIC_KEY column worked out from the topic parameter.
+    """
+    return dict(params, topic_key=hebrew_text.search_key(params['topic']))
+
+
+#_____________________________________
+#           sheet_query
+#_____________________________________
+def sheet_query(language, lesson=None, category=None):
+    """
+       Returns the statement and parameters that retrieve the words
+      of a lesson or category study sheet sorted by the language,
+      i.e. 'English', 'Hebrew' or 'English, Hebrew'.
+    """
+    if language not in SHEET_ORDERS:
+        raise ValueError(f'Unknown study sheet language {language!r}')
+    if lesson:
+        return sql('audio', 'sheet_by_lesson').format(order=language), (lesson,)
+    return sql('audio', 'sheet_by_category').format(order=language), (category,)
+
+
+#_____________________________________
+#           audio_detail
+#_____________________________________
+def audio_detail(connection, audio_id, category=''):
+    """
+       Returns the AUDIO_DETAIL row of the audio as a dictionary, or
+      None if there's no such AUDIO_ID. Its WEBPAGES are decoded into
+      a list of (topic, url_id) tuples and, if a category is named,
+      IN_CATEGORY is True when the audio is a member of it.
+    """
+    row = fetch_one(connection, 'audio', 'detail',
+                    {'audio_id': audio_id, 'category': category or ''})
+    if row is None:
+        return None
+    detail = dict(row)
+    detail['webpages'] = [tuple(webpage) for webpage
+                          in json.loads(row['webpages'] or '[]')]
+    if detail['in_category'] is not None:
+        detail['in_category'] = bool(detail['in_category'])
+    return detail
+
+
+#_____________________________________
+#          audio_files
+#_____________________________________
+def audio_files(connection, audio_ids):
+    """
+       Returns a dictionary of the audio file of each AUDIO_ID.
+      The IDs are passed as a single JSON array so the statement
+      is the same however many there are.
+    """
+    return {row['audio_id']: row['audio_file'] for row in
+            fetch_all(connection, 'audio', 'files',
+                      (json.dumps([int(audio_id) for audio_id in audio_ids]),))}
+
+
+#_____________________________________
+#        add_category_member
+#_____________________________________
+def add_category_member(connection, category, audio_id):
+    """
+       Adds the audio to the category, creating the category if it's
+      new. Returns True if the category was created.
+    """
+    with hebrew_db.transaction(connection):
+        created = execute(connection, 'category', 'insert', (category,))
+        execute(connection, 'category', 'add_member',
+                {'category': category, 'audio_id': audio_id})
+    return created > 0
+
+
+#_____________________________________
+#        add_category_members
+#_____________________________________
+def add_category_members(connection, category, audio_ids):
+    """
+       Bulk version of add_category_member. Adds all the audio to the
+      category in a single transaction, skipping any already in it,
+      and returns the number added.
+    """
+    with hebrew_db.transaction(connection):
+        execute(connection, 'category', 'insert', (category,))
+        added = connection.executemany(sql('category', 'add_member_if_missing'),
+                                       ({'category': category, 'audio_id': audio_id}
+                                        for audio_id in audio_ids)).rowcount
+    return added
+
+
+#_____________________________________
+#          link_webpages
+#_____________________________________
+def link_webpages(connection, audio_id, url_ids):
+    """
+       Links all the webpages to the audio in a single transaction,
+      skipping any already linked, and returns the number linked.
+    """
+    with hebrew_db.transaction(connection):
+        linked = connection.executemany(sql('link', 'insert_if_missing'),
+                                        ({'audio_id': audio_id, 'url_id': url_id}
+                                         for url_id in url_ids)).rowcount
+    return linked
+
+
+#_____________________________________
+#       remove_category_member
+#_____________________________________
+def remove_category_member(connection, category, audio_id):
+    """
+       Removes the audio from the category and returns the number
+      of rows deleted.
+    """
+    with hebrew_db.transaction(connection):
+        removed = execute(connection, 'category', 'remove_member',
+                          {'category': category, 'audio_id': audio_id})
+    return removed
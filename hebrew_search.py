@@ -0,0 +1,874 @@
+"""
+   In-memory search indexes for the Hebrew Studies app.
+
+   The webpage topics are few enough, a few thousand, to be held in
+  memory, so searching them doesn't need a query per search. The
+  TopicIndex is loaded from the WEBPAGE table once and then kept up to
+  date as topics are added, edited and deleted. A search returns the
+  matching topics in topic order in a fraction of a millisecond, fast
+  enough to filter the Topics combobox as the search text is typed.
+   The audio are searched in the database, but the AudioMatches of
+  one search are kept so that typing more of the text narrows them
+  in memory. When a search finds nothing the FuzzyIndex finds the
+  audio spelled most like it, whatever ו and י, final letters or
+  letters that sound alike it was typed with.
+   The CompletionTrie holds every word of the English and Hebrew of
+  the audio so the words starting with whatever is being typed in an
+  entry box can be offered without a query.
+
+   Usage:
+       index = db_worker.call(TopicIndex.query)
+       index.search('shalom')          topics containing 'shalom'
+       index.search('של%')             topics starting with 'של'
+       FuzzyIndex.query(connection).search('שלחן')
+       CompletionTrie.query(connection).complete('של')
+
+"""
+
+import array
+import bisect
+import collections
+import heapq
+import math
+import re
+
+import hebrew_db
+import hebrew_repository
+import hebrew_text
+import hebrew_widgets
+
+# Length of the substrings of the search keys that are indexed
+GRAM_LENGTH = 3
+
+#  Length of the substrings of the word skeletons indexed for fuzzy
+# search, the number of candidates checked for each search, the
+# number of results returned and the letters allowed per edit.
+FUZZY_GRAM_LENGTH = 2
+FUZZY_CANDIDATES = 500
+FUZZY_RESULTS = 20
+FUZZY_LETTERS = 5
+
+#  The cost of adding or dropping a mater lectionis and of
+# substituting letters that sound alike or are often confused.
+MATRES_COST = 0.25
+SIMILAR_COST = 0.5
+MATRES = 'וי'
+SIMILAR_LETTERS = ('טת', 'כק', 'סש', 'אע', 'חכ', 'בו', 'וי')
+
+#  The letters learners confuse, folded into one letter of each group
+# in a word's skeleton.
+SIMILAR_GROUPS = ('טת', 'כקח', 'סש', 'אע')
+
+_SKELETON_TABLE = {ord(letter): None for letter in MATRES}
+_SKELETON_TABLE.update({ord(letter): group[0]
+                        for group in SIMILAR_GROUPS for letter in group[1:]})
+_INDEL_COST = {letter: MATRES_COST for letter in MATRES}
+_SUBSTITUTION_COST = {(a, b): SIMILAR_COST
+                      for pair in SIMILAR_LETTERS
+                      for a, b in (pair, pair[::-1])}
+_WORD_RE = re.compile(r'\w+')
+
+#  Number of completions kept for every prefix of the headwords and
+# the fewest letters a headword needs to be offered as a completion.
+COMPLETIONS = 8
+COMPLETION_LETTERS = 2
+
+
+#_____________________________________
+#              grams
+#_____________________________________
+def grams(key):
+    """
+       Returns the set of GRAM_LENGTH character substrings of a
+      search key.
+    """
+    return {key[i:i + GRAM_LENGTH] for i in range(len(key) - GRAM_LENGTH + 1)}
+
+
+#_____________________________________
+#          is_plain_search
+#_____________________________________
+def is_plain_search(search):
+    """
+       A search without any '%' or '_' wildcards is plain text.
+    """
+    return '%' not in search and '_' not in search
+
+
+#_____________________________________
+#           like_pattern
+#_____________________________________
+def like_pattern(search):
+    """
+       Compiles a search containing SQL LIKE wildcards, '%' for any
+      text and '_' for any character, into a regular expression that
+      matches the search keys the pattern matches. A leading or
+      trailing '%' leaves that end unanchored rather than matching
+      '.*', which is much faster.
+    """
+    key = hebrew_text.search_key(search)
+    parts = re.split('([%_])', key.strip('%'))
+    regex = ''.join('.*' if part == '%' else '.' if part == '_' else re.escape(part)
+                    for part in parts)
+    if not key.startswith('%'):
+        regex = r'\A' + regex
+    if not key.endswith('%'):
+        regex = regex + r'\Z'
+    return re.compile(regex, re.DOTALL)
+
+
+#====================================================================
+#                            TopicIndex
+#====================================================================
+class TopicIndex():
+    """
+       The (topic, url_id) pairs of the WEBPAGE table in topic order,
+      each with the search key of its topic, and an index from every
+      GRAM_LENGTH character substring of the search keys to the
+      URL_IDs of the topics containing it.
+       Searches compare search keys, so niqqud, final letters and
+      case are ignored just as they are by the SQL prefix search.
+    """
+    def __init__(self, rows=()):
+        #  (topic, url_id, key) in topic order and
+        # (key, topic, url_id) in search key order
+        self.entries = []
+        self.by_key = []
+        self.topics = {}
+        self.keys = {}
+        self.grams = {}
+        for topic, url_id in rows:
+            self.index(topic, url_id)
+            self.entries.append((topic, url_id, self.keys[url_id]))
+            self.by_key.append((self.keys[url_id], topic, url_id))
+        self.entries.sort()
+        self.by_key.sort()
+
+    #_____________________________________
+    #               query
+    #_____________________________________
+    @classmethod
+    def query(cls, connection):
+        """
+           Returns the index of every topic in the WEBPAGE table.
+          Meant to be run on the database worker.
+        """
+        return cls((row['topic'], row['url_id']) for row in
+                   hebrew_repository.fetch_all(connection, 'webpage', 'topics'))
+
+    #_____________________________________
+    #             __len__
+    #_____________________________________
+    def __len__(self):
+        return len(self.entries)
+
+    #_____________________________________
+    #              rows
+    #_____________________________________
+    def rows(self):
+        """
+           Returns every (topic, url_id) pair in topic order.
+        """
+        return [(topic, url_id) for topic, url_id, key in self.entries]
+
+    #_____________________________________
+    #              index
+    #_____________________________________
+    def index(self, topic, url_id):
+        """
+           Adds the topic's search key and its substrings to the
+          index.
+        """
+        key = hebrew_text.search_key(topic or '')
+        self.topics[url_id] = topic
+        self.keys[url_id] = key
+        for gram in grams(key):
+            self.grams.setdefault(gram, set()).add(url_id)
+
+    #_____________________________________
+    #               add
+    #_____________________________________
+    def add(self, topic, url_id):
+        """
+           Adds a new webpage to the index.
+        """
+        url_id = int(url_id)
+        self.index(topic, url_id)
+        bisect.insort(self.entries, (topic, url_id, self.keys[url_id]))
+        bisect.insort(self.by_key, (self.keys[url_id], topic, url_id))
+
+    #_____________________________________
+    #              remove
+    #_____________________________________
+    def remove(self, url_id):
+        """
+           Removes a deleted webpage from the index.
+        """
+        url_id = int(url_id)
+        topic = self.topics.pop(url_id, None)
+        key = self.keys.pop(url_id, None)
+        if key is None:
+            return
+        for gram in grams(key):
+            ids = self.grams[gram]
+            ids.discard(url_id)
+            if not ids:
+                del self.grams[gram]
+        for entries, entry in ((self.entries, (topic, url_id, key)),
+                               (self.by_key, (key, topic, url_id))):
+            index = bisect.bisect_left(entries, entry)
+            if index < len(entries) and entries[index] == entry:
+                del entries[index]
+
+    #_____________________________________
+    #              update
+    #_____________________________________
+    def update(self, topic, url_id):
+        """
+           Replaces the topic of an edited webpage.
+        """
+        self.remove(url_id)
+        self.add(topic, url_id)
+
+    #_____________________________________
+    #             candidates
+    #_____________________________________
+    def candidates(self, key):
+        """
+           Returns the URL_IDs of the topics containing every substring
+          of the key, a superset of those containing the key itself.
+          The smallest sets are intersected first.
+        """
+        sets = []
+        for gram in grams(key):
+            ids = self.grams.get(gram)
+            if not ids:
+                return set()
+            sets.append(ids)
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    #_____________________________________
+    #              search
+    #_____________________________________
+    def search(self, search):
+        """
+           Returns the (topic, url_id) pairs, in topic order, of the
+          topics matching the search text, by the same rules as
+          hebrew_db.webpage_search_query:
+             - 'text%' finds the topics starting with the text
+             - text with any other '%' or '_' is a LIKE pattern
+             - otherwise the topics containing the text
+        """
+        if hebrew_db.is_prefix_search(search):
+            #  The topics whose keys start with the search key are
+            # together in search key order.
+            low, high = hebrew_text.prefix_range(hebrew_text.search_key(search.rstrip('%')))
+            start = bisect.bisect_left(self.by_key, (low,))
+            end = bisect.bisect_left(self.by_key, (high,), start)
+            return sorted((topic, url_id) for key, topic, url_id
+                          in self.by_key[start:end])
+
+        if not is_plain_search(search):
+            #  Only the topics containing the longest run of text
+            # between the wildcards can match the pattern. Like the SQL,
+            # a search with '_' but no '%' is looked for anywhere.
+            if '%' not in search:
+                search = f'%{search}%'
+            pattern = like_pattern(search)
+            text = max(re.split('[%_]', hebrew_text.search_key(search)), key=len)
+            if len(text) < GRAM_LENGTH:
+                return [(topic, url_id) for topic, url_id, topic_key in self.entries
+                        if pattern.search(topic_key)]
+            found = [url_id for url_id in self.candidates(text)
+                     if pattern.search(self.keys[url_id])]
+            return sorted((self.topics[url_id], url_id) for url_id in found)
+
+        key = hebrew_text.search_key(search)
+        if len(key) < GRAM_LENGTH:
+            #  Too short to be in the index, so check every topic.
+            return [(topic, url_id) for topic, url_id, topic_key in self.entries
+                    if key in topic_key]
+        found = [url_id for url_id in self.candidates(key)
+                 if key in self.keys[url_id]]
+        return sorted((self.topics[url_id], url_id) for url_id in found)
+
+
+#====================================================================
+#                            AudioMatches
+#====================================================================
+class AudioMatches():
+    """
+       The results of a search of the HEBREW_AUDIO table as the
+      AudioRecords listed in the Audio combobox. For a plain text
+      search, i.e. one without '%' or '_', the case folded English,
+      Hebrew and Hebrew without niqqud each record was matched on is
+      kept too, so a search for longer text containing it can be
+      answered by narrowing these results rather than the database.
+    """
+    __slots__ = ('search', 'records', 'texts')
+
+    def __init__(self, search, records, texts=None):
+        self.search = search
+        self.records = records
+        self.texts = texts
+
+    #_____________________________________
+    #               query
+    #_____________________________________
+    @classmethod
+    def query(cls, connection, search):
+        """
+           Runs hebrew_db.audio_search_query for the search text and
+          returns its matches. Meant to be run on the database worker.
+        """
+        sql_stmt, params = hebrew_db.audio_search_query(search)
+        rows = connection.execute(sql_stmt, params).fetchall()
+        records = hebrew_widgets.AudioRecords((row['audio_id'] for row in rows),
+                                              (row['english'] for row in rows))
+        texts = None
+        if is_plain_search(search):
+            texts = ['\x1f'.join((row['english'] or '', row['hebrew'] or '',
+                                  row['hebrew_no_niqqud'] or '')).casefold()
+                     for row in rows]
+        return cls(search, records, texts)
+
+    #_____________________________________
+    #             narrows
+    #_____________________________________
+    def narrows(self, search):
+        """
+           True if every match of the search is one of these matches,
+          i.e. both are plain text searches and the search contains
+          this search's text.
+        """
+        return (self.texts is not None and is_plain_search(search) and
+                self.search.casefold() in search.casefold())
+
+    #_____________________________________
+    #              narrow
+    #_____________________________________
+    def narrow(self, search):
+        """
+           Returns the matches of a search that narrows this one,
+          found in memory. They stay in the order of these matches.
+        """
+        text = search.casefold()
+        found = [i for i, matched in enumerate(self.texts) if text in matched]
+        records = hebrew_widgets.AudioRecords((self.records.ids[i] for i in found),
+                                              (self.records.english[i] for i in found))
+        return AudioMatches(search, records, [self.texts[i] for i in found])
+
+
+#_____________________________________
+#             skeleton
+#_____________________________________
+def skeleton(word):
+    """
+       Returns a word's search key without the matres lectionis ו and
+      י, so a word spelled in full, כתיב מלא, and the same word spelled
+      without them, כתיב חסר, have the same skeleton, e.g. שולחן and
+      שלחן are both שלחנ. The letters of each of the SIMILAR_GROUPS are
+      folded together too, so תלפון and טלפון have the same skeleton.
+      A word that's nothing but ו and י is its own skeleton.
+    """
+    return word.translate(_SKELETON_TABLE) or word
+
+
+#_____________________________________
+#            key_words
+#_____________________________________
+def key_words(text):
+    """
+       Returns the words of the search key of the text, without any
+      punctuation.
+    """
+    return _WORD_RE.findall(hebrew_text.search_key(text or ''))
+
+
+#_____________________________________
+#           word_grams
+#_____________________________________
+def word_grams(words):
+    """
+       Returns the set of FUZZY_GRAM_LENGTH character substrings of the
+      skeletons of the words, each padded with a space at either end so
+      the first and last letters count as much as the rest.
+    """
+    found = set()
+    for word in words:
+        padded = f' {skeleton(word)} '
+        found.update(padded[i:i + FUZZY_GRAM_LENGTH]
+                     for i in range(len(padded) - FUZZY_GRAM_LENGTH + 1))
+    return found
+
+
+#_____________________________________
+#          spelling_distance
+#_____________________________________
+def spelling_distance(a, b, limit):
+    """
+       Returns the weighted edit distance between two search keys, or
+      infinity once it's certain to be more than the limit.
+       Adding or dropping a mater lectionis, ו or י, costs
+      MATRES_COST, substituting one of the letters learners confuse,
+      e.g. ט and ת or כ and ק, costs SIMILAR_COST and any other edit
+      costs 1. Final letters are already the same as regular letters
+      in a search key.
+    """
+    if abs(len(a) - len(b)) * MATRES_COST > limit:
+        return math.inf
+    indel_b = [_INDEL_COST.get(char, 1.0) for char in b]
+    previous = [0.0]
+    for cost in indel_b:
+        previous.append(previous[-1] + cost)
+    columns = range(len(b))
+    for char_a in a:
+        indel_a = _INDEL_COST.get(char_a, 1.0)
+        left = previous[0] + indel_a
+        current = [left]
+        smallest = left
+        for j in columns:
+            char_b = b[j]
+            if char_a == char_b:
+                cost = previous[j]
+            else:
+                cost = previous[j] + _SUBSTITUTION_COST.get((char_a, char_b), 1.0)
+            delete = previous[j + 1] + indel_a
+            if delete < cost:
+                cost = delete
+            insert = left + indel_b[j]
+            if insert < cost:
+                cost = insert
+            current.append(cost)
+            left = cost
+            if cost < smallest:
+                smallest = cost
+        if smallest > limit:
+            return math.inf
+        previous = current
+    return previous[-1] if previous[-1] <= limit else math.inf
+
+
+#_____________________________________
+#         default_distance
+#_____________________________________
+def default_distance(search):
+    """
+       The largest spelling distance a fuzzy match of the search may
+      have, one edit for every FUZZY_LETTERS letters or part of them.
+    """
+    return float(1 + len(search) // FUZZY_LETTERS)
+
+
+#====================================================================
+#                            FuzzyIndex
+#====================================================================
+class FuzzyIndex():
+    """
+       A fuzzy search of the English and Hebrew of the HEBREW_AUDIO
+      table for when a search finds nothing because of its spelling.
+       Each distinct word is indexed by the FUZZY_GRAM_LENGTH
+      substrings of its skeleton, so the words sharing the most of
+      them with a word of the search are its candidates whatever ו
+      and י they're spelled with. The candidates within the limit of
+      the search's spelling_distance are looked up in the entries
+      and each entry is scored by the run of its English or Hebrew
+      words closest to the search. The best scores are returned.
+    """
+    def __init__(self, rows=()):
+        self.ids = array.array('q')
+        self.english = []
+        #  The English and Hebrew of each entry as word numbers
+        self.fields = []
+        #  The distinct words, their numbers, the entries each word
+        # is in and the words containing each substring
+        self.vocabulary = []
+        self.numbers = {}
+        self.entries = []
+        self.postings = {}
+        for audio_id, english, hebrew in rows:
+            self.add(audio_id, english, hebrew)
+
+    #_____________________________________
+    #               query
+    #_____________________________________
+    @classmethod
+    def query(cls, connection):
+        """
+           Returns the index of every audio in the HEBREW_AUDIO table.
+          Meant to be run on the database worker.
+        """
+        return cls((row['audio_id'], row['english'], row['hebrew'])
+                   for row in hebrew_repository.fetch_all(connection, 'audio', 'texts'))
+
+    #_____________________________________
+    #             __len__
+    #_____________________________________
+    def __len__(self):
+        return len(self.ids)
+
+    #_____________________________________
+    #              number
+    #_____________________________________
+    def number(self, word):
+        """
+           Returns the number of a word, indexing it if it's new.
+        """
+        number = self.numbers.get(word)
+        if number is None:
+            number = self.numbers[word] = len(self.vocabulary)
+            self.vocabulary.append(word)
+            self.entries.append(array.array('i'))
+            for gram in word_grams((word,)):
+                postings = self.postings.get(gram)
+                if postings is None:
+                    postings = self.postings[gram] = array.array('i')
+                postings.append(number)
+        return number
+
+    #_____________________________________
+    #               add
+    #_____________________________________
+    def add(self, audio_id, english, hebrew):
+        """
+           Adds an entry to the index.
+        """
+        entry = len(self.ids)
+        fields = (tuple(self.number(word) for word in key_words(english)),
+                  tuple(self.number(word) for word in key_words(hebrew)))
+        self.ids.append(int(audio_id))
+        self.english.append(english)
+        self.fields.append(fields)
+        for number in set(fields[0] + fields[1]):
+            self.entries[number].append(entry)
+
+    #_____________________________________
+    #           similar_words
+    #_____________________________________
+    def similar_words(self, word, limit):
+        """
+           Returns a dictionary of the spelling_distance of every word
+          within the limit of the word. Only the FUZZY_CANDIDATES words
+          sharing the most substrings with it, and at least all but
+          two for each whole edit the limit allows, are compared.
+        """
+        grams = word_grams((word,))
+        least = max(1, len(grams) - FUZZY_GRAM_LENGTH * math.ceil(limit))
+        shared = collections.Counter()
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings is not None:
+                shared.update(postings)
+        similar = {}
+        for number, count in shared.most_common(FUZZY_CANDIDATES):
+            if count < least:
+                break
+            distance = spelling_distance(word, self.vocabulary[number], limit)
+            if distance <= limit:
+                similar[number] = distance
+        return similar
+
+    #_____________________________________
+    #          closest_entries
+    #_____________________________________
+    def closest_entries(self, similar, count):
+        """
+           Returns the (distance, audio_id, english) tuples of the count
+          entries containing the closest of the similar words. The
+          words are taken closest first, so the first distance found
+          for an entry is its best, until there are count entries and
+          the next word is further than all of them.
+        """
+        best = {}
+        furthest = math.inf
+        for number, distance in sorted(similar.items(), key=lambda item: item[1]):
+            if distance > furthest:
+                break
+            for entry in self.entries[number]:
+                best.setdefault(entry, distance)
+            if len(best) >= count:
+                furthest = distance
+        return [(distance, audio_id, english) for distance, english, audio_id
+                in heapq.nsmallest(count, ((distance, self.english[entry], self.ids[entry])
+                                           for entry, distance in best.items()))]
+
+    #_____________________________________
+    #              search
+    #_____________________________________
+    def search(self, search, count=FUZZY_RESULTS, limit=None):
+        """
+           Returns up to count (distance, audio_id, english) tuples of
+          the entries closest to the search text, closest first. An
+          entry's distance is the sum of the spelling_distance of each
+          word of the search from the corresponding word of a run of
+          as many words in its English or Hebrew. Only entries within
+          the limit, by default default_distance, are returned.
+        """
+        words = key_words(search)
+        if not words:
+            return []
+        if limit is None:
+            limit = default_distance(' '.join(words))
+        similar = [self.similar_words(word, min(limit, default_distance(word)))
+                   for word in words]
+        if not all(similar):
+            return []
+
+        if len(words) == 1:
+            return self.closest_entries(similar[0], count)
+
+        #  Every match contains a word similar to the search's word
+        # with the fewest similar words.
+        rarest = min(similar, key=lambda words: sum(len(self.entries[number])
+                                                    for number in words))
+        candidates = set()
+        for number in rarest:
+            candidates.update(self.entries[number])
+
+        size = len(words)
+        scored = []
+        for entry in candidates:
+            best = math.inf
+            for field in self.fields[entry]:
+                for start in range(len(field) - size + 1):
+                    distance = 0.0
+                    for offset, distances in enumerate(similar):
+                        distance += distances.get(field[start + offset], math.inf)
+                        if distance > limit:
+                            break
+                    best = min(best, distance)
+            if best <= limit:
+                scored.append((best, self.english[entry], self.ids[entry]))
+        return [(distance, audio_id, english) for distance, english, audio_id
+                in heapq.nsmallest(count, scored)]
+
+
+#====================================================================
+#                            CompletionTrie
+#====================================================================
+class _TrieNode():
+    """
+       A node of the CompletionTrie: the nodes of the next letters,
+      the number of the headword ending here, if any, and the numbers
+      of the best COMPLETIONS headwords starting with its prefix.
+    """
+    __slots__ = ('children', 'word', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.word = -1
+        self.top = ()
+
+
+class CompletionTrie():
+    """
+       A prefix trie of the words, i.e. headwords, of the English and
+      Hebrew of the HEBREW_AUDIO table, keyed by their search keys so
+      niqqud, final letters and case don't matter.
+       Every node keeps the best COMPLETIONS headwords below it, the
+      words in the most audio first then the shortest, so completing
+      a prefix is a walk down its letters without searching the words
+      below. Adding or removing an audio re-ranks just the nodes on
+      the paths of its words, each from the lists of its children.
+    """
+    def __init__(self, rows=()):
+        self.root = _TrieNode()
+        #  The headwords as they're displayed, their search keys,
+        # the number of audio each is in, their rank_keys and the words
+        # of each audio
+        self.words = []
+        self.keys = []
+        self.numbers = {}
+        self.counts = array.array('i')
+        self.ranks = []
+        self.audio = {}
+        for audio_id, english, hebrew in rows:
+            self.index(audio_id, english, hebrew)
+        self.rank_all(self.root)
+
+    #_____________________________________
+    #               query
+    #_____________________________________
+    @classmethod
+    def query(cls, connection):
+        """
+           Returns the trie of every audio in the HEBREW_AUDIO table.
+          Meant to be run on the database worker.
+        """
+        return cls((row['audio_id'], row['english'], row['hebrew'])
+                   for row in hebrew_repository.fetch_all(connection, 'audio', 'texts'))
+
+    #_____________________________________
+    #             __len__
+    #_____________________________________
+    def __len__(self):
+        return len(self.words)
+
+    #_____________________________________
+    #             headwords
+    #_____________________________________
+    @staticmethod
+    def headwords(text):
+        """
+           Returns the (key, word) pairs of the words of the text, with
+          any niqqud removed, of at least COMPLETION_LETTERS letters.
+        """
+        found = []
+        for word in _WORD_RE.findall(hebrew_text.remove_niqqud(text or '')):
+            key = hebrew_text.search_key(word)
+            if len(key) >= COMPLETION_LETTERS:
+                found.append((key, word))
+        return found
+
+    #_____________________________________
+    #               index
+    #_____________________________________
+    def index(self, audio_id, english, hebrew):
+        """
+           Counts the distinct words of an audio, adding any new ones
+          to the trie, and returns their numbers. The nodes aren't
+          re-ranked.
+        """
+        numbers = set()
+        for key, word in self.headwords(english) + self.headwords(hebrew):
+            number = self.numbers.get(key)
+            if number is None:
+                number = self.numbers[key] = len(self.words)
+                self.words.append(word)
+                self.keys.append(key)
+                self.counts.append(0)
+                self.ranks.append(None)
+                node = self.root
+                for letter in key:
+                    child = node.children.get(letter)
+                    if child is None:
+                        child = node.children[letter] = _TrieNode()
+                    node = child
+                node.word = number
+            elif word == key:
+                #  Offer English as it's usually written, in lowercase,
+                # rather than capitalized at the start of a sentence.
+                self.words[number] = word
+            numbers.add(number)
+        for number in numbers:
+            self.counts[number] += 1
+            self.ranks[number] = self.rank_key(number)
+        self.audio[audio_id] = numbers
+        return numbers
+
+    #_____________________________________
+    #             rank_key
+    #_____________________________________
+    def rank_key(self, number):
+        """
+           Orders the headwords in the most audio first, then the
+          shortest, then alphabetically.
+        """
+        return -self.counts[number], len(self.keys[number]), self.keys[number]
+
+    #_____________________________________
+    #               rank
+    #_____________________________________
+    def rank(self, node):
+        """
+           Sets the best completions of a node from its own headword
+          and the best completions of its children. Headwords no longer
+          in any audio are dropped.
+        """
+        candidates = [number for child in node.children.values()
+                      for number in child.top]
+        if node.word >= 0 and self.counts[node.word] > 0:
+            candidates.append(node.word)
+        node.top = tuple(heapq.nsmallest(COMPLETIONS, candidates,
+                                         key=self.ranks.__getitem__))
+
+    #_____________________________________
+    #             rank_all
+    #_____________________________________
+    def rank_all(self, node):
+        """
+           Ranks every node below the node, children first.
+        """
+        for child in node.children.values():
+            self.rank_all(child)
+        self.rank(node)
+
+    #_____________________________________
+    #              rerank
+    #_____________________________________
+    def rerank(self, numbers):
+        """
+           Ranks the nodes on the paths of the headwords, deepest first
+          so each node is ranked from its children's new completions.
+          A node whose completions are full and don't include any of
+          the headwords, which all now rank below its last completion,
+          is left as it is.
+        """
+        nodes = {}
+        for number in numbers:
+            node = self.root
+            path = [node]
+            for letter in self.keys[number]:
+                node = node.children[letter]
+                path.append(node)
+            for depth, node in enumerate(path):
+                nodes[id(node)] = (depth, node)
+        best = min((self.ranks[number] for number in numbers), default=None)
+        for depth, node in sorted(nodes.values(), key=lambda item: -item[0]):
+            if (len(node.top) == COMPLETIONS and numbers.isdisjoint(node.top) and
+                    best > self.ranks[node.top[-1]]):
+                continue
+            self.rank(node)
+
+    #_____________________________________
+    #               add
+    #_____________________________________
+    def add(self, audio_id, english, hebrew):
+        """
+           Adds the words of a new or edited audio.
+        """
+        removed = self.discard(audio_id)
+        self.rerank(removed | self.index(audio_id, english, hebrew))
+
+    #_____________________________________
+    #              remove
+    #_____________________________________
+    def remove(self, audio_id):
+        """
+           Removes the words of a deleted audio.
+        """
+        self.rerank(self.discard(audio_id))
+
+    #_____________________________________
+    #              discard
+    #_____________________________________
+    def discard(self, audio_id):
+        """
+           Uncounts the words of an audio, without re-ranking, and
+          returns their numbers.
+        """
+        numbers = self.audio.pop(audio_id, set())
+        for number in numbers:
+            self.counts[number] -= 1
+            self.ranks[number] = self.rank_key(number)
+        return numbers
+
+    #_____________________________________
+    #             complete
+    #_____________________________________
+    def complete(self, prefix, count=COMPLETIONS):
+        """
+           Returns up to count of the best headwords starting with the
+          prefix, leaving out the prefix itself if it's a headword.
+        """
+        key = hebrew_text.search_key(prefix)
+        if not key:
+            return []
+        node = self.root
+        for letter in key:
+            node = node.children.get(letter)
+            if node is None:
+                return []
+        return [self.words[number] for number in node.top
+                if number != node.word][:count]
@@ -0,0 +1,643 @@
+"""
+   HTML study sheets for the Hebrew Studies app.
+
+   A study sheet lists the vocabulary of a lesson or a category in
+  one of three ways, i.e. 'English, Hebrew' side by side, a 'Hebrew'
+  test or an 'English' test. AudioMgr builds one sheet at a time and
+  opens it in the browser. Run as a script this module rebuilds every
+  lesson and category sheet in all three languages without the GUI,
+  spreading the sheets over a pool of processes, and writes a manifest
+  of what was built and how long each sheet took.
+
+   Sheets are streamed to their files a chunk of rows at a time so
+  the memory used stays the same however big the lesson or category.
+
+   The batch is incremental. The hash of each sheet's input rows and
+  template is kept in the STUDY_SHEET_BUILD table and only the sheets
+  whose hash has changed, or whose file has been changed or deleted
+  since, are rebuilt. --force rebuilds them all.
+
+   Usage:
+       python hebrew_sheets.py --no-niqqud
+       python hebrew_sheets.py --niqqud --workers 4 --manifest sheets.json
+       python hebrew_sheets.py --no-niqqud --force
+
+"""
+
+import argparse
+import concurrent.futures
+import functools
+import hashlib
+import io
+import json
+import os
+import time
+
+import hebrew_db
+import hebrew_repository
+import hebrew_text
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEBREW_DB = os.path.join(HERE, 'hebrew_studies.db')
+HEBREW_MEDIA = os.path.join(HERE, 'Media')
+
+# Name of the manifest written to the media folder by build_all_sheets
+MANIFEST = 'study_sheets_manifest.json'
+
+# The languages a study sheet can be written in
+LANGUAGES = ('English, Hebrew', 'Hebrew', 'English')
+
+#  Number of rows fetched from the database, rendered and written
+# at a time when a study sheet is streamed to its file
+CHUNK_ROWS = 1000
+
+# The first row of the test sheets
+HIDE_ANSWERS_ROW = ('<tr>\n'
+                    '   <td></td>\n'
+                    '   <td></td>\n'
+                    '   <td></td>\n'
+                    '   <td></td>\n'
+                    '   <td>&nbsp &nbsp</td>\n'
+                    '   <td> <button class="hide_answers_button" onclick="hide_answers()">Hide Answers</button></td>\n'
+                    '</tr>\n')
+
+# The end of every study sheet
+SHEET_FOOTER = ('</tbody> \n'
+                '</table> \n'
+                '<script src="hebrew.js" ></script> \n'
+                '<script> \n'
+                'let elements = document.getElementsByClassName("hebrew_input"); \n'
+                'for (var i = 0; i < elements.length; i++) {  \n'
+                '    elements[i].addEventListener("keyup", convertTextToHebrew, false); \n'
+                '} \n'
+                '</script> \n'
+                '</body> \n'
+                '</html> \n')
+
+
+#  The HTML of a study sheet row in each language. Each row is
+# rendered by a single f-string, instead of rebuilding the same
+# fragments, e.g. the Pealim and Answer buttons, for every row. The
+# renderers all take the same positional arguments.
+#  'English, Hebrew' rows show the English and its Hebrew. 'Hebrew'
+# and 'English' rows are tests with an answer input, the word being
+# tested, an Answer button that toggles the display of the answer and
+# the answer itself.
+
+#_____________________________________
+#      render_english_hebrew_row
+#_____________________________________
+def render_english_hebrew_row(num, english, hebrew, test_text, answer_text,
+                              row_class, cursor_icon, audio):
+    """
+       Returns the HTML of a row of an 'English, Hebrew' sheet.
+    """
+    return ('<tr> \n'
+            f'   <td class="english_text">&nbsp &nbsp {english}</td> \n'
+            f'   <td class="hebrew_text {cursor_icon}" onclick="play(\'audio_{num}\')">&nbsp {hebrew}</td> \n'
+            f'{audio}'
+            '   <td>&nbsp &nbsp</td>\n'
+            f'   <td><a href="https://www.pealim.com/search/?q={hebrew}" target="_blank"> \n'
+            '       <img src="pealim.png" alt="Pealim Logo" style="width:24px;height:24px;"></a></td> \n'
+            '</tr> \n')
+
+
+#_____________________________________
+#         render_hebrew_row
+#_____________________________________
+def render_hebrew_row(num, english, hebrew, test_text, answer_text,
+                      row_class, cursor_icon, audio):
+    """
+       Returns the HTML of a row of a 'Hebrew' test sheet.
+    """
+    return ('<tr> \n'
+            '   <td><input type="text" class="english_input"  name="comment" value=" "></td> \n'
+            f'   <td class="hebrew_text {row_class} {cursor_icon}" onclick="play(\'audio_{num}\')">'
+            f'&nbsp &nbsp {test_text}</td> \n'
+            '   <td class="answer_button">'
+            f'<button onclick="toggle_answer_display(\'text_{num}\')">Answer</button></td> \n'
+            f'   <td><a href="https://www.pealim.com/search/?q={hebrew}" target="_blank"> \n'
+            '       <img src="pealim.png" alt="Pealim Logo" style="width:24px;height:24px;"></a></td> \n'
+            '   <td></td>\n'
+            f'   <td id="text_{num}" class="answer_text english_text {row_class}">{answer_text}</td> \n'
+            f'{audio}'
+            '</tr> \n')
+
+
+#_____________________________________
+#         render_english_row
+#_____________________________________
+def render_english_row(num, english, hebrew, test_text, answer_text,
+                       row_class, cursor_icon, audio):
+    """
+       Returns the HTML of a row of an 'English' test sheet.
+    """
+    return ('<tr> \n'
+            '   <td><input type="text" class="hebrew_input"  name="comment" value=" "></td> \n'
+            f'   <td class="english_text {row_class}">&nbsp &nbsp {test_text}</td> \n'
+            '   <td class="answer_button">'
+            f'<button onclick="toggle_answer_display(\'text_{num}\')">Answer</button></td> \n'
+            f'   <td><a href="https://www.pealim.com/search/?q={hebrew}" target="_blank"> \n'
+            '       <img src="pealim.png" alt="Pealim Logo" style="width:24px;height:24px;"></a></td> \n'
+            '   <td></td>\n'
+            f'   <td id="text_{num}" class="answer_text hebrew_text {cursor_icon} {row_class}" '
+            f' onclick="play(\'audio_{num}\')">{answer_text}</td> \n'
+            f'{audio}'
+            '</tr> \n')
+
+
+#_____________________________________
+#           render_audio
+#_____________________________________
+def render_audio(num, audio_file):
+    """
+       Returns the HTML of the audio element of a row.
+    """
+    return f'   <audio id="audio_{num}" src="{audio_file}"></audio> \n'
+
+
+# The row renderer of each language
+ROW_RENDERERS = {'English, Hebrew': render_english_hebrew_row,
+                 'Hebrew': render_hebrew_row,
+                 'English': render_english_row}
+
+
+#_____________________________________
+#            sheet_path
+#_____________________________________
+def sheet_path(media, language, lesson=None, category=None):
+    """
+       Returns the path of the subject's study sheet. The 'English,
+      Hebrew' vocabulary sheet keeps its original name and the test
+      sheets have the language added so all three can sit side by side.
+    """
+    subject = (lesson or category).replace(' ', '_')
+    if language == 'English, Hebrew':
+        return os.path.join(media, f'{subject}_study_sheet.html')
+    return os.path.join(media, f'{subject}_{language}_study_sheet.html')
+
+
+#_____________________________________
+#           sheet_header
+#_____________________________________
+def sheet_header(language, lesson=None, category=None):
+    """
+       Returns the common elements of the HTML file that's written
+      at the top of the study sheet.
+    """
+    if lesson:
+        # Stick Lesson between Hs-yesod and lesson number
+        # to form the study sheet's title
+        study_title = lesson.replace(' ', ' Lesson ')
+        #  Named section found in the present and past
+        # tense verb HTML pages
+        lesson_link = lesson.replace('Ha-yesod', '#Lesson')
+    else:
+        study_title = category
+        lesson_link = ''
+
+    return ('<!DOCTYPE html>\n'
+            '<html lang="en">\n'
+            '<head>\n'
+            '   <meta charset = "UTF-8">\n'
+            f'   <title>{study_title}</title> \n'
+            '       <link rel="stylesheet" type="text/css" href="hebrew.css"> \n'
+            '   </style> \n'
+            '</head> \n'
+            '<body> \n'
+            f'   <h2 class="lesson_header"> {study_title} </h2> \n'
+            '<a href="Ha-yesod_verb_list.html" target="_blank">Ha-Yesod Verb List</a> <br>\n'
+            f'<a href="Ha-yesod-verbs_present.html{lesson_link}" target="_blank">Ha-Yesod Verbs Present Tense</a> <br>\n'
+            f'<a href="Ha-yesod-verbs_past.html{lesson_link}" target="_blank">Ha-Yesod Verbs Past Tense</a> <br>\n'
+            '<a href="grammar_verbs.html" target="_blank">Verb Conjugation</a> <br><br>\n'
+            '<a href="https://www.pealim.com" target="_blank">\n'
+            '   <img src="pealim.png" alt="Pealim Logo" style="width:24px;height:24px;"></a>\n'
+            ' <a style="color:#2c6cac;"> Displays the pealim.com webpage for the Hebrew word (if found). </a><br>\n'
+            f'<h4> {language} Vocabulary:</h4> \n'
+            '<table > \n'
+            '<colgroup> \n'
+            '<col  style="text-align: left;"> \n'
+            '<col  style="text-align: right;" > \n'
+            '</colgroup> \n'
+            '<tbody> \n')
+
+
+#_____________________________________
+#            fetch_rows
+#_____________________________________
+def fetch_rows(cursor, size=CHUNK_ROWS):
+    """
+       Yields the rows of the cursor, fetching size of them at a
+      time, so only one batch is ever held in memory.
+    """
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+#_____________________________________
+#         iter_study_sheet
+#_____________________________________
+def iter_study_sheet(rows, language, niqqud=True, lesson=None,
+                     category=None, chunk_rows=CHUNK_ROWS):
+    """
+       Generates the HTML of the study sheet of the rows, each with an
+      ENGLISH, HEBREW and AUDIO_FILE column, in chunks of chunk_rows
+      rows, or in one chunk if chunk_rows is None, and returns the
+      number of rows. Each row is rendered by the language's
+      ROW_RENDERERS function and the rows of a chunk are joined once.
+       niqqud is only used by 'Hebrew' sheets. If it's False the
+      Hebrew is written the way it's usually written, i.e. without
+      the niqqud.
+    """
+    render_row = ROW_RENDERERS[language]
+    remove_niqqud = language == 'Hebrew' and not niqqud
+    html = [sheet_header(language, lesson, category)]
+    if language != 'English, Hebrew':
+        html.append(HIDE_ANSWERS_ROW)
+
+    row_num = 0
+    for row in rows:
+        row_num += 1
+        english = row['english']
+        hebrew = row['hebrew']
+        audio_file = row['audio_file']
+        if audio_file == 'No Audio':
+            cursor_icon = 'no-audio-cursor'
+            audio = ''
+        else:
+            cursor_icon = 'play-audio-cursor'
+            audio = render_audio(row_num, audio_file)
+        # Color the background of every other row's
+        # translation text light blue
+        row_class = 'row_odd' if row_num & 1 else 'row_even'
+
+        if language == 'English, Hebrew':
+            test_text = answer_text = ''
+        elif language == 'Hebrew':
+            test_text = hebrew.strip()
+            if remove_niqqud:
+                test_text = hebrew_text.remove_niqqud(test_text)
+            answer_text = english
+        else:
+            test_text = english.strip()
+            answer_text = hebrew
+
+        html.append(render_row(row_num, english, hebrew, test_text,
+                               answer_text, row_class, cursor_icon, audio))
+        if chunk_rows and row_num % chunk_rows == 0:
+            yield ''.join(html)
+            html = []
+    html.append(SHEET_FOOTER)
+    yield ''.join(html)
+    return row_num
+
+
+#_____________________________________
+#           write_chunks
+#_____________________________________
+def write_chunks(write, chunks):
+    """
+       Passes each chunk generated by iter_study_sheet to write and
+      returns the number of rows the generator rendered.
+    """
+    while True:
+        try:
+            write(next(chunks))
+        except StopIteration as done:
+            return done.value
+
+
+#_____________________________________
+#        render_study_sheet
+#_____________________________________
+def render_study_sheet(rows, language, niqqud=True, lesson=None,
+                       category=None):
+    """
+       Returns the HTML of the study sheet of the rows in one string
+      and the number of rows.
+    """
+    html = []
+    row_count = write_chunks(html.append,
+                             iter_study_sheet(rows, language, niqqud, lesson,
+                                              category, chunk_rows=None))
+    return ''.join(html), row_count
+
+
+#_____________________________________
+#        write_study_sheet
+#_____________________________________
+def write_study_sheet(study_file, rows, language, niqqud=True,
+                      lesson=None, category=None):
+    """
+       Writes the study sheet of the rows, which are already in
+      memory, to the open study_file in a single write and returns
+      the number of rows written.
+    """
+    html, row_count = render_study_sheet(rows, language, niqqud,
+                                         lesson, category)
+    study_file.write(html)
+    return row_count
+
+
+#_____________________________________
+#        stream_study_sheet
+#_____________________________________
+def stream_study_sheet(study_file, cursor, language, niqqud=True,
+                       lesson=None, category=None, chunk_rows=CHUNK_ROWS):
+    """
+       Writes the study sheet of the rows of the cursor to the open
+      study_file chunk_rows at a time, fetching, rendering and writing
+      each chunk before the next, and returns the number of rows
+      written. Memory use doesn't grow with the number of rows.
+    """
+    return write_chunks(study_file.write,
+                        iter_study_sheet(fetch_rows(cursor, chunk_rows),
+                                         language, niqqud, lesson, category,
+                                         chunk_rows))
+
+
+#_____________________________________
+#        create_study_sheet
+#_____________________________________
+def create_study_sheet(connection, media, language, lesson=None,
+                       category=None, niqqud=True):
+    """
+       Queries the vocabulary of the lesson or category and streams
+      its study sheet to the media folder. Returns the path of the
+      sheet and the number of rows written.
+    """
+    sql_stmt, params = hebrew_repository.sheet_query(language, lesson=lesson,
+                                                     category=category)
+    cursor = connection.execute(sql_stmt, params)
+    study_sheet = sheet_path(media, language, lesson, category)
+    try:
+        with io.open(study_sheet, 'w', encoding='utf8') as study_file:
+            row_count = stream_study_sheet(study_file, cursor, language,
+                                           niqqud, lesson, category)
+    finally:
+        cursor.close()
+    return study_sheet, row_count
+
+
+#_____________________________________
+#            sheet_jobs
+#_____________________________________
+def sheet_jobs(connection, languages=LANGUAGES):
+    """
+       Returns a (kind, subject, language) tuple for the study sheet
+      of every lesson and category in each of the languages.
+    """
+    lessons = [row['name'] for row in
+               hebrew_repository.fetch_all(connection, 'lesson', 'names')]
+    categories = [row['name'] for row in
+                  hebrew_repository.fetch_all(connection, 'category', 'names')]
+    return ([('lesson', lesson, language)
+             for lesson in lessons for language in languages] +
+            [('category', category, language)
+             for category in categories for language in languages])
+
+
+#_____________________________________
+#          template_hash
+#_____________________________________
+@functools.lru_cache(maxsize=None)
+def template_hash():
+    """
+       Returns a hash of the source of the modules that lay out the
+      study sheets so changing the HTML, or how the niqqud is removed,
+      rebuilds every sheet.
+    """
+    template = hashlib.sha256()
+    for module in (__file__, hebrew_text.__file__):
+        with open(module, 'rb') as source:
+            template.update(source.read())
+    return template.hexdigest()
+
+
+#_____________________________________
+#          subject_hashes
+#_____________________________________
+def subject_hashes(connection):
+    """
+       Returns a dictionary of the hash of the HEBREW_AUDIO rows of
+      each lesson and category keyed by (kind, subject). SQLite joins
+      the rows of each subject into one string, in AUDIO_ID order so
+      the hash doesn't depend on how a sheet is sorted, and all of
+      them are hashed in two queries.
+    """
+    return {(kind, row['subject']):
+            hashlib.sha256(row['items'].encode('utf8')).hexdigest()
+            for kind in ('lesson', 'category')
+            for row in hebrew_repository.fetch_all(connection, 'sheet',
+                                                   f'{kind}_rows')}
+
+
+#_____________________________________
+#           sheet_hash
+#_____________________________________
+def sheet_hash(rows_hash, language, niqqud):
+    """
+       Returns the hash of everything a study sheet is built from, i.e.
+      its rows, the template, its language and, for the 'Hebrew' test
+      sheets, whether it keeps the niqqud.
+    """
+    niqqud = niqqud if language == 'Hebrew' else None
+    return hashlib.sha256(f'{template_hash()}|{language}|{niqqud}|{rows_hash}'
+                          .encode('utf8')).hexdigest()
+
+
+#_____________________________________
+#           stale_jobs
+#_____________________________________
+def stale_jobs(connection, media, jobs, niqqud, force=False):
+    """
+       Returns the jobs whose study sheets have to be rebuilt, each
+      with its input hash, and the number that are up to date. A sheet
+      is rebuilt if its input hash differs from the one recorded when
+      it was last built, or its file is missing or has been written
+      since, e.g. by the GUI. If force is True they're all rebuilt.
+    """
+    hashes = subject_hashes(connection)
+    empty = hashlib.sha256().hexdigest()
+    state = {row['path']: row for row in
+             hebrew_repository.fetch_all(connection, 'sheet', 'build_state')}
+    stale = []
+    for kind, subject, language in jobs:
+        input_hash = sheet_hash(hashes.get((kind, subject), empty),
+                                language, niqqud)
+        path = sheet_path(media, language, **{kind: subject})
+        built = state.get(path)
+        if not force and built is not None and built['input_hash'] == input_hash:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat and (stat.st_size, stat.st_mtime_ns) == \
+               (built['file_size'], built['file_mtime']):
+                continue
+        stale.append(((kind, subject, language), input_hash))
+    return stale, len(jobs) - len(stale)
+
+
+#_____________________________________
+#          record_builds
+#_____________________________________
+def record_builds(connection, entries):
+    """
+       Records the input hash, size and modification time of each
+      study sheet built, in a single transaction.
+    """
+    builds = []
+    for entry in entries:
+        if 'error' in entry:
+            continue
+        stat = os.stat(entry['path'])
+        builds.append({'path': entry['path'], 'kind': entry['kind'],
+                       'subject': entry['subject'],
+                       'language': entry['language'],
+                       'input_hash': entry['input_hash'],
+                       'file_size': stat.st_size,
+                       'file_mtime': stat.st_mtime_ns,
+                       'built': time.strftime('%Y-%m-%d %H:%M:%S')})
+    with hebrew_db.transaction(connection):
+        connection.executemany(hebrew_repository.sql('sheet', 'save_build'),
+                               builds)
+
+
+#_____________________________________
+#           build_sheets
+#_____________________________________
+def build_sheets(db_path, media, jobs, niqqud):
+    """
+       Builds the study sheets of the jobs on one connection and
+      returns a manifest entry for each. Runs in a worker process so
+      it only takes and returns things that can be pickled.
+       A sheet that fails is recorded with its error rather than
+      stopping the rest.
+    """
+    entries = []
+    connection = hebrew_db.open_database(db_path)
+    try:
+        for (kind, subject, language), input_hash in jobs:
+            entry = {'kind': kind, 'subject': subject, 'language': language,
+                     'input_hash': input_hash}
+            start = time.perf_counter()
+            try:
+                path, row_count = create_study_sheet(connection, media, language,
+                                                     niqqud=niqqud,
+                                                     **{kind: subject})
+                entry.update(path=path, rows=row_count)
+            except Exception as err:
+                entry['error'] = f'{type(err).__name__}: {err}'
+            entry['seconds'] = round(time.perf_counter() - start, 6)
+            entries.append(entry)
+    finally:
+        connection.close()
+    return entries
+
+
+#_____________________________________
+#         build_all_sheets
+#_____________________________________
+def build_all_sheets(db_path=HEBREW_DB, media=HEBREW_MEDIA, niqqud=True,
+                     workers=None, manifest=None, languages=LANGUAGES,
+                     force=False):
+    """
+       Rebuilds the study sheet of every lesson and category in each
+      of the languages that has changed since it was last built, or
+      all of them if force is True, on a pool of worker processes and
+      writes a JSON manifest of the sheets built, their row counts and
+      timings. Returns the manifest.
+       The jobs are dealt out round robin in one batch per worker so
+      each process opens the database once and the big lessons are
+      spread across the pool. Nothing is started if nothing changed.
+    """
+    start = time.perf_counter()
+    connection = hebrew_db.open_database(db_path)
+    try:
+        #  The workers only read the database so any migrations the
+        # sheet queries depend on are run once up front.
+        hebrew_db.migrate_categories(connection)
+        hebrew_db.create_sheet_build_state(connection)
+        jobs = sheet_jobs(connection, languages)
+        stale, unchanged = stale_jobs(connection, media, jobs, niqqud, force)
+
+        workers = min(workers or os.cpu_count() or 1, len(stale)) or 1
+        batches = [stale[i::workers] for i in range(workers)]
+        entries = []
+        if stale:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(build_sheets, db_path, media, batch, niqqud)
+                           for batch in batches]
+                for future in concurrent.futures.as_completed(futures):
+                    entries.extend(future.result())
+            record_builds(connection, entries)
+    finally:
+        connection.close()
+
+    order = {job: i for i, job in enumerate(jobs)}
+    entries.sort(key=lambda entry: order[entry['kind'], entry['subject'],
+                                         entry['language']])
+    summary = {'built': time.strftime('%Y-%m-%d %H:%M:%S'),
+               'database': db_path,
+               'niqqud': niqqud,
+               'workers': workers if stale else 0,
+               'sheets': len(entries),
+               'unchanged': unchanged,
+               'failed': sum(1 for entry in entries if 'error' in entry),
+               'rows': sum(entry.get('rows', 0) for entry in entries),
+               'seconds': round(time.perf_counter() - start, 6),
+               'entries': entries}
+    manifest = manifest or os.path.join(media, MANIFEST)
+    with io.open(manifest, 'w', encoding='utf8') as manifest_file:
+        json.dump(summary, manifest_file, ensure_ascii=False, indent=2)
+    return summary
+
+
+#_____________________________________
+#               main
+#_____________________________________
+def main(argv=None):
+    """
+       Builds all the study sheets from the command line. Whether
+      the Hebrew test sheets keep their niqqud has to be given
+      since there's no one to ask.
+    """
+    parser = argparse.ArgumentParser(
+        description='Rebuild every lesson and category study sheet.')
+    niqqud = parser.add_mutually_exclusive_group(required=True)
+    niqqud.add_argument('--niqqud', dest='niqqud', action='store_true',
+                        help='keep the niqqud on the Hebrew test sheets')
+    niqqud.add_argument('--no-niqqud', dest='niqqud', action='store_false',
+                        help='remove the niqqud from the Hebrew test sheets')
+    parser.add_argument('--db', default=HEBREW_DB,
+                        help='the Hebrew Studies database')
+    parser.add_argument('--media', default=HEBREW_MEDIA,
+                        help='the folder the sheets are written to')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes, defaults to the CPU count')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild every sheet whether it changed or not')
+    parser.add_argument('--manifest', default=None,
+                        help=f'manifest file, defaults to MEDIA/{MANIFEST}')
+    args = parser.parse_args(argv)
+
+    summary = build_all_sheets(args.db, args.media, niqqud=args.niqqud,
+                               workers=args.workers, manifest=args.manifest,
+                               force=args.force)
+    for entry in summary['entries']:
+        if 'error' in entry:
+            print(f"FAILED {entry['kind']} {entry['subject']}"
+                  f" ({entry['language']}): {entry['error']}")
+    print(f"Built {summary['sheets'] - summary['failed']} of"
+          f" {summary['sheets']} study sheets ({summary['rows']} rows)"
+          f" with {summary['workers']} workers, {summary['unchanged']}"
+          f" unchanged, in {summary['seconds'] * 1000:.1f} ms")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -11,18 +11,36 @@ from tkinter import messagebox
 from tkinter import filedialog
 from tkinter import PhotoImage
 import tkinter.ttk as ttk
-import tkinter.tix as tix
-import sqlite3
-import webbrowser
-import urllib
+import json
 import os
 import sys
-import io
 import re
+import time
 import inspect
-import pygame
-
-DEBUG = True
+import hebrew_audio
+import hebrew_db
+import hebrew_media
+import hebrew_repository
+import hebrew_search
+import hebrew_sheets
+import hebrew_text
+import hebrew_trace
+import hebrew_widgets
+import hebrew_workers
+
+#  Set HEBREW_STUDIES_DEBUG=1 in the environment to print the program
+# flow and SQL. It turns on hebrew_trace as well, which has to be done
+# before the traced functions below are defined, and <Control-F12>
+# prints the timings hebrew_trace has recorded.
+DEBUG = os.environ.get('HEBREW_STUDIES_DEBUG', '') not in ('', '0')
+if DEBUG:
+    hebrew_trace.enable()
+
+#  Set HEBREW_STUDIES_STARTUP=1 to print the time the window was
+# first painted and the time everything queried at start up had
+# been displayed, or =exit to quit as well once it has, as the
+# startup benchmark does.
+STARTUP = os.environ.get('HEBREW_STUDIES_STARTUP', '')
 IDLE = ''
 
 # Set screen constants
@@ -30,6 +48,11 @@ WIN_HEIGHT = 650
 WIN_WIDTH = 780
 SQL_WIN_HEIGHT=320
 SQL_WIN_WIDTH=700
+SLOW_SQL_WIN_HEIGHT=470
+SLOW_SQL_WIN_WIDTH=760
+SLOW_SQL_REFRESH_MS=2000
+RESULT_WIN_HEIGHT=600
+RESULT_WIN_WIDTH=1050
 BG_HLIST = '#cce6ff'
 FG_HLIST = 'black'
 BG_COLOR = '#009099'
@@ -38,6 +61,10 @@ FG_RECORDS = '#ccffff'
 FG_A_MEMBER = '#99ff99'
 FG_NOT_A_MEMBER = '#800040'
 
+#  Milliseconds to wait after a key is typed in a search box
+# before searching, so a burst of typing makes one search.
+SEARCH_DELAY = 30
+
 # Widget identifiers
 AUDIO_MGR_AUDIO_CBO = 'AudioMgr Audio combobox'
 AUDIO_MGR_CATEGORY_CBO = 'AudioMgr Category combobox'
@@ -56,14 +83,6 @@ HEBREW_DB = '.\\hebrew_studies.db'
 HEBREW_MEDIA = '.\\Media\\'
 
 
-# Connect to the SQLite3 Hebrew database
-SQLITE_DB = sqlite3.connect(HEBREW_DB)
-#  Set queries to return values as row objects rather
-# than the default tuples.
-SQLITE_DB.row_factory = sqlite3.Row
-SQL = SQLITE_DB.cursor()
-
-
 #  The following module globals are assigned
 # their referents in the main function.
 text_editor_menu = ''
@@ -72,6 +91,8 @@ color = ''
 url_mgr = ''
 web_mgr = ''
 audio_mgr = ''
+db_worker = ''
+audio_player = ''
 
 #_____________________________________
 #               main
@@ -95,10 +116,12 @@ def main():
     global url_mgr
     global web_mgr
     global audio_mgr
+    global db_worker
+    global audio_player
     global IDLE
 
     # Configure the screen
-    main_win = tix.Tk()
+    main_win = tk.Tk()
     main_win.geometry(("%dx%d" % (WIN_WIDTH, WIN_HEIGHT)))
     main_win.title('Hebrew Studies')
     main_win.option_add('*Font', 'Helvetica 12')
@@ -115,9 +138,7 @@ def main():
     text_editor_menu.add_command(label="Clear")
 
     #------- tool_tip
-    balloon_options = 'font -adobe-helvetica-italic-r-narrow--12-120' + \
-                      ' background  #ffff99'
-    tool_tip = tix.Balloon(main_win, options=balloon_options)
+    tool_tip = hebrew_widgets.ToolTip(main_win)
 
     #  When using the IDLE IDE to write and debug Python code,
     # run the following to display output messages in different
@@ -137,12 +158,61 @@ def main():
     else:
         IDLE = False
 
+    #  Print each traced function as it runs and let the timings
+    # recorded so far be printed at any time.
+    if DEBUG:
+        hebrew_trace.on_enter = display_function
+        hebrew_trace.on_exit = display_function_completion
+    if hebrew_trace.ENABLED:
+        main_win.bind_all('<Control-F12>', lambda event: hebrew_trace.dump())
+
+    #  All the database queries run on a background thread with its
+    # own connection to the database so that the window never freezes
+    # waiting on SQLite. Their results are passed back to the Tk main
+    # loop by the dispatcher.
+    dispatcher = hebrew_workers.TkDispatcher(main_win)
+    db_worker = hebrew_workers.DbWorker(HEBREW_DB, dispatcher)
+
+    #  The audio files are played on a background thread as well
+    # so the window stays responsive while they play.
+    audio_player = hebrew_audio.AudioPlayer(dispatcher)
+
+    #  Make sure the categories have been moved into the
+    # CATEGORY_MEMBER table and that the search key indexes and
+    # the full-text index used by the search boxes and the
+    # AUDIO_DETAIL view used by the Audio frame exist before
+    # they're needed.
+    #  The worker runs what's submitted to it in order, so they're
+    # submitted rather than waited for. The window is built while
+    # they run and every query the managers submit runs after them.
+    for upgrade in (hebrew_db.migrate_categories,
+                    hebrew_db.create_search_keys,
+                    hebrew_db.create_lookup_indexes,
+                    hebrew_db.create_audio_fts,
+                    hebrew_db.create_audio_detail_view):
+        db_worker.submit(upgrade,
+                         on_error=lambda err, upgrade=upgrade:
+                             messagebox.showerror(title='Database Upgrade Failed',
+                                                  message=f'{upgrade.__name__}'
+                                                          f' failed:\n\n{err}'))
+
     # Launch the application
     url_mgr = UrlMgr(main_win)
     web_mgr = WebMgr(main_win)
     audio_mgr = AudioMgr(main_win)
 
+    if STARTUP:
+        report_startup(main_win)
+
+    #  Index the media folder once everything the window shows at
+    # start up has been queried.
+    audio_mgr.index_media()
+
     main_win.mainloop()
+    audio_player.close()
+    db_worker.stop()
+    if hebrew_trace.ENABLED:
+        hebrew_trace.dump()
 
 
 #####################################################################
@@ -153,15 +223,12 @@ def main():
 #_____________________________________
 #            clear_text
 #_____________________________________
+@hebrew_trace.traced
 def clear_text(widget):
     """
         Deletes all the text displayed in the widget
        that envoked the pop_up text editor.
     """
-    current_function = sys._getframe().f_code.co_name
-    display_function(current_function)
-
-
     widget.delete(0, 'end')
     if DEBUG:
         print(f'Widget = {widget.whoami}')
@@ -175,20 +242,6 @@ def clear_text(widget):
         audio_mgr.category_lbl.configure(fg=FG_NOT_A_MEMBER)
 
 
-def contains_niqqud(string):
-    """
-      Detectc the presence of niqqud in the Hebrew text
-    """
-    
-    niqqud = ['\u05B0','\u05B1','\u05B2','\u05B3','\u05B4',
-              '\u05B5','\u05B6','\u05B7','\u05B8','\u05B9',
-              '\u05BA','\u05BB','\u05BC','\u05BD','\u05C1',
-              '\u05C2','\u05C4','\u05C5']
-    for i, char in enumerate(string):
-        if char in niqqud:
-            return True
-    return False
-
 #_____________________________________
 #         contains_text
 #_____________________________________
@@ -238,12 +291,12 @@ def create_hyperlink(event=None):
 def display_function(name):
     """
        Displays what function is running. Used
-      for tracing program flow.
+      for tracing program flow. Set as the
+      hebrew_trace.on_enter hook when DEBUG is on.
     """
     global IDLE
     
-    if DEBUG: 
-        msg = f'>>>>> Running {name} '  
+    msg = f'>>>>> Running {name} '  
     if IDLE:
         color.write(f'{msg}\n', "hit")
     else:
@@ -255,12 +308,12 @@ def display_function(name):
 def display_function_completion(name):
     """
        Displays when function has finished. 
-      Used for tracing program flow.
+      Used for tracing program flow. Set as the
+      hebrew_trace.on_exit hook when DEBUG is on.
     """
     global IDLE
     
-    if DEBUG: 
-        msg = f'<<<<< Exiting {name} '  
+    msg = f'<<<<< Exiting {name} '  
     if IDLE:
         color.write(f'{msg}\n', "sel")
     else:
@@ -269,11 +322,13 @@ def display_function_completion(name):
 #_____________________________________
 #            display_sql
 #_____________________________________
-def display_sql(function, sql_stmt):
+def display_sql(function, sql_stmt, params=None):
     """
-       Displays the pending SQL statement and the 
-      function executing it.
+       Displays the pending SQL statement, its parameters
+      if it has any and the function executing it.
     """
+    if params:
+        sql_stmt = f'{sql_stmt}\n  parameters: {params}'
 
     msg = f'{function} '.upper() +\
           'executing the following SQL statement:\n'
@@ -327,19 +382,25 @@ def display_text_editor_menu(event):
     text_editor_menu.tk.call("tk_popup", text_editor_menu, event.x_root, event.y_root)
 
 
+#_____________________________________
+#           format_topic
+#_____________________________________
+def format_topic(topic, url_id):
+    """
+     Returns the text of a webpage in the Topics combobox.
+    """
+    return f'{topic}      | {url_id}'
+
 #_____________________________________
 #           search_audio_table
 #_____________________________________
+@hebrew_trace.traced
 def search_audio_table(event=None):
     """
       Queries the database table HEBREW_AUDIO for all the
      records matching the text in the triggering widget and
      populates the Audio list combobox with the results.
     """
-    if DEBUG:
-        current_function = sys._getframe().f_code.co_name
-        display_function(current_function)
-
     # Get the widget that triggered the event
     widget = event.widget
 
@@ -369,51 +430,47 @@ def search_audio_table(event=None):
         if widget.whoami == WEB_MGR_TOPICS_CBO:
             audio_mgr.audio_search.set(search)
         print(f'Searching DB for {search}')
-        query = ('SELECT english, audio_id'
-                 ' FROM hebrew_audio'
-                 f' WHERE english LIKE "%{search}%"'
-                 f' OR hebrew LIKE "%{search}%"'
-                 f' OR hebrew_no_niqqud LIKE "%{search}%"'
-                 '  ORDER BY english;')
+        #  Search the full-text index with the best
+        # matches listed first.
+        query, params = hebrew_db.audio_search_query(search)
         if DEBUG:
-            display_sql(current_function, query)
-        try:
-            SQL.execute(query)
-            audio_mgr.active_audio_query = query
-            audio_list = ['{english}      | {audio_id}'.format(**row)
-                          for row in SQL.fetchall()]
-            if len(audio_list) > 0:
-                audio_mgr.active_audio_query = query
-                audio_mgr.audio_list_cbo['values'] = audio_list
+            display_sql('search_audio_table', query, params)
+
+        def display_results(records):
+            if len(records) > 0:
+                audio_mgr.active_audio_query = (query, params)
+                audio_mgr.audio_list_cbo.set_records(records)
 
                 audio_mgr.audio_list_cbo.current(0)
                 audio_mgr.audio_list_cbo.event_generate("<<ComboboxSelected>>")
             else:
-                title = 'No Records Found'
-                msg = f"Query returned no results matching\n '{search}'"
-                messagebox.showerror(title=title, message=msg)
-        except sqlite3.Error as err:
-            display_sql_error(err, query, current_function)
+                #  List the audio spelled most like the search instead
+                audio_mgr.fuzzy_search(search, on_empty=no_results)
+
+        def no_results():
+            title = 'No Records Found'
+            msg = f"Query returned no results matching\n '{search}'"
+            messagebox.showerror(title=title, message=msg)
+
+        db_worker.submit(hebrew_widgets.AudioRecords.query, query, params,
+                         on_done=display_results,
+                         on_error=lambda err: display_sql_error(err, query,
+                                                                'search_audio_table'))
     else:
         title = 'Nothing to Search'
         msg = f'No text entered in the \n{widget.whoami}.'
         messagebox.showerror(title=title, message=msg)
-        
-    if DEBUG:
-        display_function_completion(current_function)
+
 #_____________________________________
 #       search_webpage_table
 #_____________________________________
+@hebrew_trace.traced
 def search_webpage_table(event=None):
     """
       Queries the database table WEBPAGE for all the values in the
      TOPIC column that match the text entered in the triggering
      widget and populates the Topics combobox with the results.
     """
-    if DEBUG:
-        current_function = sys._getframe().f_code.co_name
-        display_function(current_function)
-
     #  Check for any selected text in the widget that
     # triggered the event and use that text for the
     # search rather than than the full text displayed
@@ -435,47 +492,40 @@ def search_webpage_table(event=None):
     if contains_text(search):
         if widget.whoami == AUDIO_MGR_AUDIO_CBO:
             web_mgr.webpage_search.set(search)
-        if search.find('%') > -1:
-            where_clause = f" WHERE topic LIKE '{search}'"
-        else:    
-            where_clause = f" WHERE topic LIKE '%{search}%'"
-        query = ("SELECT topic, url_id"
-                 "  FROM webpage "
-                 f"  {where_clause}"
-                 "  ORDER BY topic;")
-        if DEBUG:
-            display_sql(current_function, query)
-        
-        try:
-            SQL.execute(query)
-            topics = ['{topic}      | {url_id}'.format(**row)
-                      for row in SQL.fetchall()]
-            if len(topics) > 0:
+
+        def display_results(rows):
+            if len(rows) > 0:
                 #  Populate the WebMgr Topics combobox, display the count
                 # of the total records found and set the Topics combobox
                 # to the first item in the topics list
-                topics_cbo = web_mgr.topics_cbo
-                topics_cbo['values'] = topics
-                topics_cbo.set(topics[0])
-                topics_cbo.event_generate("<<ComboboxSelected>>")
+                web_mgr.set_topics(rows)
+                web_mgr.select_topic(0)
             else:
                 title = 'No Records Found'
                 msg = f"Query returned no results matching\n '{search}'"
                 messagebox.showerror(title=title, message=msg)
                 web_mgr.search_webpage_entry.delete(0, 'end')
-        except sqlite3.Error as err:
-            display_sql_error(err, query)
+
+        #  Search the topics in memory once they've been loaded
+        if web_mgr.webpage_index is not None:
+            display_results(web_mgr.webpage_index.search(search))
+        else:
+            query, params = hebrew_db.webpage_search_query(search)
+            if DEBUG:
+                display_sql('search_webpage_table', query, params)
+            db_worker.query(query, params,
+                            on_done=lambda rows: display_results([(row['topic'], row['url_id'])
+                                                                  for row in rows]),
+                            on_error=lambda err: display_sql_error(err, query))
     else:
         title = 'Nothing to search.'
         msg = f'No text found in \n{widget.whoami}'
         messagebox.showerror(title=title, message=msg)
 
-    if DEBUG:
-        display_function_completion(current_function)
-
 #_____________________________________
 #           search_website
 #_____________________________________
+@hebrew_trace.traced
 def search_website(event=None):
     """
        Searches different websites depending on the letter hit in
@@ -484,10 +534,6 @@ def search_website(event=None):
       Doitinhebrew.com can also be searched for English words and
       phrases to get their Hebrew translations.
     """
-    if DEBUG:
-        current_function = sys._getframe().f_code.co_name
-        display_function(current_function)
-    
     #  Get the widget that triggered the event and its displayed text.
     #  The widget's whoami attribute identifies the widget that triggered
     # the event and determines how to process the text before passing
@@ -549,7 +595,7 @@ def search_website(event=None):
                 string_list = search_string.split('|')
                 
         if audio_mgr.is_hebrew(search_string):
-            search_string = audio_mgr.remove_niqqud(search_string)
+            search_string = hebrew_text.remove_niqqud(search_string)
             
         # Remove punctuation marks   
         for p in ['.', '!', '?']:
@@ -559,7 +605,7 @@ def search_website(event=None):
         #  No search string is passed to the Lexilogos
         # websites. Don't know how.
         if website_id in ('k', 'l'):
-            webbrowser.open_new(webpage)
+            open_webpage(webpage)
         elif search_string:
             search_string = search_string.strip()
             webpage = webpage + search_string
@@ -567,14 +613,62 @@ def search_website(event=None):
                 webpage = webpage + '/he/'
             if DEBUG:
                 print(f"Searching {webpage} \n")
-            webbrowser.open_new(webpage)
+            open_webpage(webpage)
     else:
         title = 'Nothing to search'
         msg = f'No text found in {search_source}'
         messagebox.showerror(title=title, message=msg)
 
-    if DEBUG:
-        display_function_completion(current_function)
+#_____________________________________
+#          report_startup
+#_____________________________________
+def report_startup(main_win):
+    """
+     Prints the wall clock time, as time.time(), of the first paint
+    of the main window and of the moment the app became interactive,
+    i.e. once the results of every query submitted while the window
+    was being built have been displayed.
+    """
+    def painted(event):
+        if event.widget is main_win:
+            main_win.unbind('<Map>')
+            main_win.update_idletasks()
+            print(f'startup first_paint {time.time():.6f}', flush=True)
+
+    def interactive():
+        print(f'startup interactive {time.time():.6f}', flush=True)
+        if STARTUP == 'exit':
+            main_win.destroy()
+
+    #  The worker runs requests in order so this one finishes after
+    # every query submitted before it, and the dispatcher calls
+    # on_done after their callbacks.
+    main_win.bind('<Map>', painted)
+    db_worker.submit(lambda connection: None,
+                     on_done=lambda result: main_win.after_idle(interactive))
+
+#_____________________________________
+#           open_webpage
+#_____________________________________
+def open_webpage(webpage):
+    """
+     Opens the webpage, a URL or an HTML file, in a new browser
+    window. The webbrowser module is only imported the first time
+    a webpage is opened since it isn't needed to start the app.
+    """
+    import webbrowser
+
+    webbrowser.open_new(webpage)
+
+#_____________________________________
+#             topic_of
+#_____________________________________
+def topic_of(value):
+    """
+     Returns the topic of a webpage in the Topics combobox,
+    the key the full list of topics is sorted by.
+    """
+    return value.split('|')[0].strip()
 
 #####################################################################
 #                        Define the Classes
@@ -693,42 +787,47 @@ class UrlMgr():
     #_____________________________________
     #            add_url_to_db
     #_____________________________________
+    @hebrew_trace.traced
     def add_url_to_db(self):
         """
            Gets the displayed website name, topic and URL
           and inserts the data into the database WEBPAGE table.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-        
         #  Make sure the necessary data, i.e. the topic and URL,
         # are entered before proceeding
         topic = self.topic.get()
         url = self.url.get()
         if contains_text(topic) and \
            contains_text(url):
-            try:
-                sql_stmt = ('INSERT INTO webpage(topic, url)'
-                            f' VALUES("{topic}","{url}");')
-                if DEBUG:
-                    display_sql(current_function, sql_stmt)
+            sql_stmt = hebrew_repository.sql('webpage', 'insert')
+            params = hebrew_repository.webpage_keys({'topic': topic, 'url': url})
+            if DEBUG:
+                display_sql('add_url_to_db', sql_stmt, params)
+
+            def insert_webpage(connection):
+                with hebrew_db.transaction(connection):
+                    url_id = connection.execute(sql_stmt, params).lastrowid
+                return url_id
 
-                SQL.execute(sql_stmt)
-                SQLITE_DB.commit()
+            def display_success(url_id):
                 title = 'URL Added to Database'
-                msg = f"Successfully executed following SQL:\n {sql_stmt}"
+                msg = (f"Successfully executed following SQL:\n {sql_stmt}\n"
+                       f" with {params}")
                 messagebox.showinfo(title=title, message=msg)
-            except sqlite3.Error as err:
-                display_sql_error(err, sql_stmt, current_function)
+                #  Put the new webpage in its place if all the
+                # topics are listed.
+                if web_mgr.webpage_index is not None:
+                    web_mgr.webpage_index.add(topic, url_id)
+                web_mgr.insert_topic(topic, url_id)
+
+            db_worker.submit(insert_webpage, on_done=display_success,
+                             on_error=lambda err: display_sql_error(err, sql_stmt,
+                                                                    'add_url_to_db'))
         else:
             title = 'Insufficient Data'
             msg = 'The URL and Topic fields must contain data.'
             messagebox.showerror(title=title, message=msg)
 
-        if DEBUG:
-            display_function_completion(current_function)
-
     #_____________________________________
     #            decode_url_percent
     #_____________________________________
@@ -738,6 +837,8 @@ class UrlMgr():
           so that they appear as Hebrew characters.
         """
 
+        import urllib.parse
+
         decoded_url = urllib.parse.unquote(self.url.get())
         self.url.set(decoded_url)
 
@@ -745,22 +846,16 @@ class UrlMgr():
     #-------------------------------------
     #            get_websites
     #-------------------------------------
-    def get_websites(self):
+    @hebrew_trace.traced
+    def get_websites(self, on_done):
         """
            Retrieves the names of the websites from the database table
-          WEBSITES and populates the Websites combo box.
+          WEBSITES and passes them to the on_done function.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
-        
-        try:
-            query = 'SELECT name FROM website ORDER BY name;'
-            SQL.execute(query)
-            return [row['name'] for row in SQL.fetchall()]
-        except sqlite3.Error as err:
-            display_sql_error(err, query)
+        query = 'SELECT name FROM website ORDER BY name;'
+        db_worker.query(query,
+                        on_done=lambda rows: on_done([row['name'] for row in rows]),
+                        on_error=lambda err: display_sql_error(err, query))
 
 
 #====================================================================
@@ -803,12 +898,19 @@ class WebMgr():
                                          fg=FG_RECORDS, bg=BG_COLOR)
 
         #------- topics combobox
-        self.topics = self.get_topics()
+        #  The topics are retrieved from the database once all the
+        # widgets have been created.
         self.selected_topic = tk.StringVar()
         self.topic_index = tk.IntVar()
-        self.topics_cbo = ttk.Combobox(self.web_frame, width=70,
-                                       textvariable=self.selected_topic,
-                                       values=self.topics)
+        #  All the topics, loaded by get_topics, which are searched
+        # in memory rather than querying the WEBPAGE table.
+        self.webpage_index = None
+        #  The topics listed are the records of a VirtualCombobox, like
+        # the Audio list, so only the topics in view are handed to Tk.
+        # When they're all the topics they're in order by topic_of,
+        # the only list a new or edited topic can be put in its place in.
+        self.topics_cbo = hebrew_widgets.VirtualCombobox(self.web_frame, width=70,
+                                                         textvariable=self.selected_topic)
         self.topics_cbo.whoami = WEB_MGR_TOPICS_CBO
 
         #  Whenever a topic is selected retrieve
@@ -822,12 +924,6 @@ class WebMgr():
                              search_audio_table)
         self.topics_cbo.bind("<Control d>", search_website)
 
-        #  Whenever the topics combo box is populated set
-        # the displayed topic to the first item in the list
-        # and generate a combo selected event
-        self.topics_cbo.current(0)
-        self.topics_cbo.event_generate("<<ComboboxSelected>>")
-
         tip = '  Select item to display URL\n' +\
               '  Mouse <Right-click> to search for relevant audio\n' +\
               'files displayed below in the Audio frame.\n' + \
@@ -851,14 +947,23 @@ class WebMgr():
         self.search_webpage_entry.whoami = WEB_MGR_SEARCH
 
         self.search_webpage_entry.bind('<Return>', search_webpage_table)
+        #  The Topics combobox lists the matching topics as the
+        # search text is typed.
+        self.filtered_search = ''
+        self.search_webpage_entry.bind('<KeyRelease>',
+                                       hebrew_workers.Debouncer(self.search_webpage_entry,
+                                                                SEARCH_DELAY,
+                                                                self.filter_topics))
 
         #  If  <Control d> is entered, search the Doitinhebrew
         # website for the displayed Hebrew text
         self.search_webpage_entry.bind("<Control d>", search_website)
 
 
-        tip = (' Hit <ENTER> to query database topics for search text.\n '
-               "Default is %search text%, entering '%' overides the default.\n"    
+        tip = (' Topics matching the search text are listed as it is typed.\n'
+               ' Hit <ENTER> to query database topics for search text.\n '
+               "Default is %search text%, entering '%' overides the default.\n"
+               " Ending the text with '%' finds topics that start with it.\n"    
                ' <Control-d> to search Doitinhebrew.com for the\n'
                'Hebrew translation of the English search text.')
         tool_tip.bind_widget(self.search_webpage_entry, balloonmsg=tip)
@@ -888,6 +993,7 @@ class WebMgr():
                               "Save changes to displayed webpage",
                               "Delete displayed webpage",
                               "Link webpage to displayed Hebrew audio",
+                              "Link all listed webpages to displayed Hebrew audio",
                               "Remove webpage link to displayed Hebrew audio",
                               command=self.execute_webpage_option)
         self.execute_webpage_option_optmnu.configure(fg=FG_COLOR, bg=BG_COLOR,
@@ -936,6 +1042,9 @@ class WebMgr():
                  fg=FG_COLOR, bg=BG_COLOR).place(relx=.825, y=4)
         self.execute_webpage_option_optmnu.place(relx=.81, y=28)
 
+        #  Populate the Topics combobox and display the
+        # first topic's URL
+        self.get_topics()
 
     #_____________________________________
     #           display_webpage
@@ -947,7 +1056,7 @@ class WebMgr():
         """
         webpage = self.db_url.get()
         if webpage:
-            webbrowser.open_new(webpage)
+            open_webpage(webpage)
         else:
             msg = "No URL entry"
             messagebox.showinfo('No Web Page', msg)
@@ -956,6 +1065,7 @@ class WebMgr():
     #_____________________________________
     #        execute_webpage_option
     #_____________________________________
+    @hebrew_trace.traced
     def execute_webpage_option(self, option):
         """
            Does one of the following:
@@ -968,160 +1078,274 @@ class WebMgr():
            Unlinks the displayed webpage from the audio
           displayed in Audio frame.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-        
         self.webpage_options.set("Options")
         current_topic = self.topics_cbo.get()
         url = self.db_url.get()
         selection = current_topic.split('|')
         topic = selection[0].strip()
         url_id = selection[1].strip()
-        reset_index = True
-        try:
-            if option.startswith('Save'):
-                sql_stmt = (" UPDATE webpage"
-                            f" SET topic = '{topic}',"
-                            f"  url = '{url}' "
-                            f" WHERE url_id = {url_id};")
-                SQL.execute(sql_stmt)
-                SQLITE_DB.commit()
+        audio_id = audio_mgr.audio_list_cbo.selected_id()
+        sql_stmt = ''
+        if option.startswith('Save'):
+            sql_stmt = hebrew_repository.sql('webpage', 'update')
+            params = hebrew_repository.webpage_keys({'topic': topic, 'url': url,
+                                                     'url_id': url_id})
+            title = 'Database Successfully Updated'
+            msg = f'SQL = {sql_stmt}\n with {params}'
+            reset_index = True
+        elif option.startswith('Delete'):
+            msg = f"Delete '{topic} | URL_ID {url_id}'?"
+            if messagebox.askyesno('Verify', msg, icon='warning'):
+                sql_stmt = hebrew_repository.sql('webpage', 'delete')
+                params = (url_id,)
+                title = f"'{topic} | {url_id}' Successfully Deleted"
+                msg = f'SQL = {sql_stmt}\n with {params}'
+                reset_index = True
+        elif audio_id is None:
+            title = 'No Audio Selected'
+            msg = 'Nothing selected in the Audio combo box.'
+            messagebox.showerror(title=title, message=msg)
+        elif option.startswith('Link all'):
+            #  Link every topic in the Topics dropdown list to
+            # the audio in a single transaction.
+            url_ids = list(self.topics_cbo.records.ids)
+
+            def display_links(row_count):
                 title = 'Database Successfully Updated'
-                msg = f'SQL = {sql_stmt}'
+                msg = (f'Linked {row_count} of {len(url_ids)} webpages'
+                       f' to AUDIO_ID {audio_id}')
                 messagebox.showinfo(title=title, message=msg)
-            elif option.startswith('Delete'):
-                msg = f"Delete '{topic} | URL_ID {url_id}'?"
-                if messagebox.askyesno('Verify', msg, icon='warning'):
-                    sql_stmt = ('DELETE FROM webpage'
-                                f'  WHERE url_id = {url_id};')
-                    SQL.execute(sql_stmt)
-                    SQLITE_DB.commit()
-                    title = f"'{topic} | {url_id}' Successfully Deleted"
-                    msg = f'SQL = {sql_stmt}'
-                    messagebox.showinfo(title=title, message=msg)
-            elif option.startswith('Link'):
-                current_audio = audio_mgr.audio_list_cbo.get().split('|')
-                audio_id = current_audio[1].strip()
-                sql_stmt = ("INSERT INTO audio_url_link(audio_id, url_id) "
-                            f" VALUES('{audio_id}','{url_id}');")
-                SQL.execute(sql_stmt)
-                SQLITE_DB.commit()
-                reset_index = False
-            elif option.startswith('Remove'):
-                current_audio = audio_mgr.audio_list_cbo.get().split('|')
-                audio_id = current_audio[1].strip()
-                sql_stmt = (" DELETE FROM audio_url_link"
-                            f" WHERE audio_id = '{audio_id}'"
-                            f"  AND url_id = '{url_id}';")
-                SQL.execute(sql_stmt)
-                SQLITE_DB.commit()
-                reset_index = False
+
+            audio_mgr.audio_details.invalidate(audio_id)
+            db_worker.submit(hebrew_repository.link_webpages, audio_id, url_ids,
+                             on_done=display_links,
+                             on_error=lambda err: display_sql_error(err,
+                                                                    hebrew_repository.sql('link',
+                                                                                          'insert_if_missing')))
+        elif option.startswith('Link'):
+            sql_stmt = hebrew_repository.sql('link', 'insert')
+            params = {'audio_id': audio_id, 'url_id': url_id}
+            reset_index = False
+        elif option.startswith('Remove'):
+            sql_stmt = hebrew_repository.sql('link', 'delete')
+            params = {'audio_id': audio_id, 'url_id': url_id}
+            reset_index = False
+
+        #  Rather than reloading the topics apply the change to the
+        # topics listed and display the saved topic, or the one below
+        # the deleted topic.
+        def display_changes(row_count):
             if reset_index:
-                current_index = self.topic_index.get()
+                messagebox.showinfo(title=title, message=msg)
+                if self.webpage_index is not None:
+                    if option.startswith('Save'):
+                        self.webpage_index.update(topic, url_id)
+                    else:
+                        self.webpage_index.remove(url_id)
+                current_index = self.find_topic(url_id, topic)
                 if DEBUG:
                     print(f'>>> Current index={current_index}')
-                self.refresh_topics()
-                self.topics_cbo.current(current_index)
-                self.topics_cbo.event_generate("<<ComboboxSelected>>")
-        except sqlite3.Error as err:
-            display_sql_error(err, sql_stmt)
+                if current_index < 0:
+                    return
+                if option.startswith('Save'):
+                    self.select_topic(self.update_topic(current_index, topic, url_id))
+                else:
+                    self.delete_topic(current_index)
+                    if len(self.topics_cbo.records) > 0:
+                        self.select_topic(current_index)
+                    else:
+                        self.refresh_topics()
 
-        if DEBUG:
-            display_function_completion(current_function)
+        if sql_stmt:
+            #  Editing or deleting a webpage can change the webpages
+            # of any audio, linking changes just the displayed audio.
+            if reset_index:
+                audio_mgr.audio_details.invalidate()
+            else:
+                audio_mgr.audio_details.invalidate(audio_id)
+            db_worker.execute(sql_stmt, params, on_done=display_changes,
+                              on_error=lambda err: display_sql_error(err, sql_stmt))
 
     #_____________________________________
     #            get_topics
     #_____________________________________
-    def get_topics(self):
+    @hebrew_trace.traced
+    def get_topics(self, on_done=None):
         """
            Retrieves the values from the TOPIC and URL_ID columns
-          of the WEBPAGE table to populate the Topics combo box.
-        """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
-        
-        try:
-            query = ('SELECT topic, url_id '
-                     ' FROM webpage '
-                     ' ORDER BY topic;')
-            SQL.execute(query)
-            if DEBUG:
-                display_function_completion(current_function)
-            return ['{topic}      | {url_id}'.format(**row)
-                    for row in SQL.fetchall()]
-        except sqlite3.Error as err:
-            display_sql_error(err, query)
+          of the WEBPAGE table into the in-memory topic index and
+          populates the Topics combo box.
+           Once the combo box is populated on_done is called or,
+          if there isn't one, the first topic is displayed.
+        """
+        query = hebrew_repository.sql('webpage', 'topics')
+
+        def display_topics(webpage_index):
+            self.webpage_index = webpage_index
+            self.set_topics(webpage_index.rows(), ordered=True)
+            if on_done:
+                on_done()
+            else:
+                self.select_topic(0)
 
+        db_worker.submit(hebrew_search.TopicIndex.query, on_done=display_topics,
+                         on_error=lambda err: display_sql_error(err, query))
 
     #_____________________________________
     #            get_url
     #_____________________________________
+    @hebrew_trace.traced
     def get_url(self, event=None):
         """
           Retrieves the values of the URL and WEBSITE columns
          from the WEBPAGE table for the specified url_id in the
          Topics combobox and displays it in the URL entry box.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
-        
         widget = event.widget
         selection = widget.get().split('|')
         url_id = selection[1].strip()
         self.topic_index.set(widget.current())
-        query = ('SELECT url'
-                 ' FROM webpage'
-                 f' WHERE url_id = {url_id};')
+        query = hebrew_repository.sql('webpage', 'url')
 
         if DEBUG:
-            display_sql(current_function, query)
-    
-        try:
-            SQL.execute(query)
-            row = SQL.fetchone()
-            self.db_url.set(row['url'])
-            #self.db_website.set(row['website_id'])
+            display_sql('get_url', query, (url_id,))
+
+        current_topic = widget.get()
+
+        def display_url(rows):
+            #  Ignore the URL if another topic has been
+            # selected while it was being retrieved.
+            if widget.get() != current_topic or not rows:
+                return
+            self.db_url.set(rows[0]['url'])
             if DEBUG:
-                print(f'{current_function} query returned : url={self.db_url.get()}')
+                print(f'get_url query returned : url={self.db_url.get()}')
             current = self.topics_cbo.current() + 1
-            self.total_topics.set(f'#{current} of  {len(self.topics_cbo["values"])}')
-        except sqlite3.Error as err:
-            display_sql_error(err, query)
-            
-        if DEBUG:
-            display_function_completion(current_function)
+            self.total_topics.set(f'#{current} of  {len(self.topics_cbo.records)}')
+
+        db_worker.query(query, (url_id,), on_done=display_url,
+                        on_error=lambda err: display_sql_error(err, query))
+
     #_____________________________________
     #           refresh_topics
     #_____________________________________
-    def refresh_topics(self):
+    @hebrew_trace.traced
+    def refresh_topics(self, on_done=None):
         """
           Queries the database for all the values in the TOPIC column
          of the WEBPAGE table and populates the Topics combobox with
          the results.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)        
-        
         #  Clear out the current entries in the Webpage widgets before
         # refreshing the data
         self.db_url_entry.delete(0, 'end')
         self.topics_cbo.set('')
         self.search_webpage_entry.delete(0, 'end')
+        self.filtered_search = ''
 
         # Refresh and set topics to the first item in the list
-        self.topics_cbo['values'] = self.get_topics()
-        self.topics_cbo.current(0)
-        #self.total_topics.set(f'Total {len(self.topics_cbo["values"])}')
-        self.topics_cbo.event_generate("<<ComboboxSelected>>")
+        self.get_topics(on_done)
 
-        if DEBUG:
-            display_function_completion(current_function)
+    #_____________________________________
+    #           filter_topics
+    #_____________________________________
+    def filter_topics(self, event=None):
+        """
+          Lists the topics matching the search text in the Topics
+         combobox, or all of them if there's no search text, each time
+         the text changes. The topics are searched in memory so this
+         keeps up with typing.
+        """
+        search = self.webpage_search.get().strip()
+        if search == self.filtered_search or self.webpage_index is None:
+            return
+        self.filtered_search = search
+        if contains_text(search):
+            rows = self.webpage_index.search(search)
+            ordered = False
+        else:
+            rows = self.webpage_index.rows()
+            ordered = True
+        if rows:
+            self.set_topics(rows, ordered)
+            self.select_topic(0)
+
+    #_____________________________________
+    #           select_topic
+    #_____________________________________
+    def select_topic(self, index):
+        """
+          Displays the topic at the index in the Topics combobox
+         and retrieves its URL.
+        """
+        count = len(self.topics_cbo.records)
+        if count > 0:
+            self.topics_cbo.current(min(index, count - 1))
+            self.topics_cbo.event_generate("<<ComboboxSelected>>")
+
+    #_____________________________________
+    #            set_topics
+    #_____________________________________
+    def set_topics(self, rows, ordered=False):
+        """
+          Lists the (topic, url_id) rows in the Topics combobox.
+         ordered is True if they're all the topics sorted by topic.
+        """
+        rows = list(rows)
+        records = hebrew_widgets.AudioRecords((url_id for topic, url_id in rows),
+                                              (format_topic(topic, url_id)
+                                               for topic, url_id in rows),
+                                              topic_of if ordered else None)
+        self.topics_cbo.set_records(records)
+
+    #_____________________________________
+    #            find_topic
+    #_____________________________________
+    def find_topic(self, url_id, topic=''):
+        """
+          Returns the index of the URL_ID in the Topics combobox,
+         usually the displayed topic, or -1 if it isn't listed. In
+         the full list of topics it's found with a binary search on
+         its topic.
+        """
+        records = self.topics_cbo.records
+        index = self.topics_cbo.current()
+        if 0 <= index < len(records) and records.ids[index] == int(url_id):
+            return index
+        return records.find(url_id, format_topic(topic, url_id))
+
+    #_____________________________________
+    #            insert_topic
+    #_____________________________________
+    def insert_topic(self, topic, url_id):
+        """
+          Adds a new webpage to the topics listed if they're all the
+         topics, in its place found with a binary search on the topic,
+         and returns its index, or -1 if it isn't listed.
+        """
+        if self.topics_cbo.records.key is None:
+            return -1
+        return self.topics_cbo.insert_record(url_id, format_topic(topic, url_id))
+
+    #_____________________________________
+    #            update_topic
+    #_____________________________________
+    def update_topic(self, index, topic, url_id):
+        """
+          Changes the topic of the webpage at the index, moving it to
+         its new place in the full list of topics, and returns its new
+         index.
+        """
+        return self.topics_cbo.update_record(index, format_topic(topic, url_id))
+
+    #_____________________________________
+    #            delete_topic
+    #_____________________________________
+    def delete_topic(self, index):
+        """
+          Removes the webpage at the index from the topics listed.
+        """
+        self.topics_cbo.delete_record(index)
 
 
 #====================================================================
@@ -1134,14 +1358,10 @@ class AudioMgr():
        and searches for database entries.
     """
     def __init__(self, main):
-        #  Intialize the Pygame mixer to
-        # play the Hebrew audio files.
-        pygame.mixer.init()
-
         #  Track the query that generated
         # the current audio list displayed
         # in the audio list combobox
-        self.active_audio_query = tk.StringVar()
+        self.active_audio_query = None
 
         #  Dictionary of searchable websites and the control key character
         # that invokes them. Adding to this dictionary will automatically
@@ -1188,6 +1408,19 @@ class AudioMgr():
         self.hebrew_text.whoami = AUDIO_MGR_HEBREW_TEXT
         
         self.hebrew.trace('w', self.transliterate)
+
+        #  Completions of the Hebrew and English words being typed
+        # are offered from the words of every audio, held in a trie
+        # built at start up and kept up to date as audio are added,
+        # saved and deleted.
+        self.completions = None
+
+        #  The audio files that are missing from the media folder or
+        # couldn't be read, keyed by their case folded names, as found
+        # by indexing the folder.
+        self.media_problems = {}
+        self.hebrew_completions = hebrew_widgets.CompletionList(self.hebrew_text,
+                                                                self.complete)
         
         #  Bind control key combinations to search for the
         # displayed Hebrew text on the following websites:
@@ -1251,6 +1484,9 @@ class AudioMgr():
         self.new_english_entry = tk.Entry(self.audio_frame, width=25,
                                           textvariable=self.new_english)
         self.new_english_entry.whoami = 'AudioMgr New English Entry'
+        self.english_completions = hebrew_widgets.CompletionList(self.new_english_entry,
+                                                                 self.complete)
+        self.new_english.trace('w', self.english_completions.refresh)
 
         #  Whenever the new_english entry box is clicked clear out any text
         # that might be in the Hebrew entry box and the audio file entry box.
@@ -1263,11 +1499,9 @@ class AudioMgr():
                                          'then Hebrew and Audio File'))
 
         #------- Lessons combobox
-        self.lessons = self.get_lessons()
         self.lesson = tk.StringVar()
         self.lessons_cbo = ttk.Combobox(self.audio_frame, width=30,
-                                        textvariable=self.lesson,
-                                        values=self.lessons)
+                                        textvariable=self.lesson)
         self.lessons_cbo.whoami = AUDIO_MGR_LESSONS_CBO
 
         #  Whenever a lesson is selected retrieve
@@ -1302,11 +1536,9 @@ class AudioMgr():
         self.lesson_audio_optmnu["menu"].config(fg=FG_COLOR, bg=BG_COLOR)
 
         #------- category combobox
-        self.categories = self.get_categories()
         self.category = tk.StringVar()
         self.category_cbo = ttk.Combobox(self.audio_frame, width=30,
-                                         textvariable=self.category,
-                                         values=self.categories)
+                                         textvariable=self.category)
         self.category_cbo.whoami = AUDIO_MGR_CATEGORY_CBO
 
         self.category_cbo.bind('<<ComboboxSelected>>', self.get_category_members)
@@ -1331,12 +1563,17 @@ class AudioMgr():
         #<h2 id="audiocbo">		Audio list combobox</h2>
       
         #------- Audio list combobox
-        self.audio_list = self.get_audio_list()
         self.selected_audio = tk.StringVar()
         self.audio_index = tk.IntVar()
-        self.audio_list_cbo = ttk.Combobox(self.audio_frame, width=30,
-                                           textvariable=self.selected_audio,
-                                           values=self.audio_list)
+        #  The AUDIO_ID whose details were last requested from the
+        # database worker
+        self.audio_request = None
+        #  The details displayed for each audio, see get_hebrew
+        self.audio_details = hebrew_db.AudioDetailCache()
+        #  The dropdown list only displays the English of each audio.
+        # Its AUDIO_ID is kept in the widget's records.
+        self.audio_list_cbo = hebrew_widgets.VirtualCombobox(self.audio_frame, width=30,
+                                                             textvariable=self.selected_audio)
         self.audio_list_cbo.whoami = 'AudioMgr Audio combobox'
 
         #  Whenever an item in the audio list combobox is selected,
@@ -1346,13 +1583,6 @@ class AudioMgr():
         # populate the Topics combobox in the Webpages frame.
         self.audio_list_cbo.bind('<<ComboboxSelected>>', self.get_hebrew)
 
-        #  Set the displayed text in the audio list combobox
-        # to the first item in the audio list and trigger
-        # a ComboboxSelected event which will populate the
-        # Hebrew and audio file entry boxes.
-        self.audio_list_cbo.current(0)
-        self.audio_list_cbo.event_generate("<<ComboboxSelected>>")
-
         #  Bind the widget to control key combinationa that will
         # search the Doitinhebrew website for the Hebrew translation
         # of the displayed English text and the database WEBPAGE
@@ -1392,9 +1622,27 @@ class AudioMgr():
 
         self.search_audio_entry.bind('<Return>', search_audio_table)
 
+        #  The audio matching the search text are listed as it's typed.
+        # A search still running when more text is typed is cancelled
+        # and its results, if they arrive, are ignored.
+        self.live_search = ''
+        self.search_generation = 0
+        self.search_future = None
+        self.audio_matches = None
+        #  The fuzzy search index, built when it's first needed and
+        # again after any audio is added, edited or deleted.
+        self.fuzzy_index = None
+        self.audio_version = 0
+        self.search_audio_entry.bind('<KeyRelease>',
+                                     hebrew_workers.Debouncer(self.search_audio_entry,
+                                                              SEARCH_DELAY,
+                                                              self.search_as_typed))
+
         self.search_audio_entry.bind("<Control d>", search_website)
 
-        tip = ('Hit <ENTER> to query database for text.\n '
+        tip = ('Matching entries are listed as the text is typed.\n'
+               'Hit <ENTER> to query database for text.\n '
+               "Ending the text with '%' finds entries that start with it.\n "
                '<Control-d> to search Doitinhebrew.com.')
         tool_tip.bind_widget(self.search_audio_entry, balloonmsg=tip)
 
@@ -1426,6 +1674,7 @@ class AudioMgr():
         self.category_options.set("Options")
         self.category_audio_optmnu = tk.OptionMenu(self.audio_frame, self.category_options,
                                                    "Add displayed audio to Category",
+                                                   "Add all listed audio to Category",
                                                    "Remove displayed audio from Category",
                                                    "Category vocabulary list",
                                                    "Category study sheet in Hebrew",
@@ -1466,7 +1715,7 @@ class AudioMgr():
         self.audio_options_optmnu.place(relx=.8475, y=86)
 
         # Audio list combo box
-        tk.Label(self.audio_frame, text='Audio  |   Audio ID',
+        tk.Label(self.audio_frame, text='Audio',
                  fg=FG_COLOR, bg=BG_COLOR).place(x=15, y=10)
         self.total_words_lbl.place(relx=.225, y=10)
         self.audio_list_cbo.place(x=15, y=35, relwidth=.3)
@@ -1508,10 +1757,20 @@ class AudioMgr():
         # SQL button
         self.connect_to_db_btn.place(relx=.4625, y=135)
 
+        #  Populate the Lesson, Category and Audio list comboboxes.
+        #  Once the audio list is retrieved the first item in the list
+        # is displayed which populates the Hebrew and audio file entry
+        # boxes.
+        self.get_lessons()
+        self.get_categories()
+        self.refresh_audio()
+        self.get_completions()
+
 
     #_____________________________________
     #       add_audio_to_db
     #_____________________________________
+    @hebrew_trace.traced
     def add_audio_to_db(self):
         """
          Grabs the values in the new English, Hebrew and audio file
@@ -1519,100 +1778,94 @@ class AudioMgr():
          Also adds the audio to the whatever lesson ,if any, is
         displayed in the Lesson combobox.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-        
         #  Retrieve the contents of all the widgets whose data are
         # necessary to populate the HEBREW_AUDIO table and insure
         # that they actually contain text.
         english_text = self.new_english.get()
         hebrew_text = self.hebrew.get()
-        hebrew_no_niqqud = self.remove_niqqud(hebrew_text)
         audio_file_name = self.audio_file.get()
         lesson_name = self.lesson.get()
 
         if contains_text(hebrew_text) and contains_text(english_text) \
                                       and contains_text(audio_file_name):
-            try:
-                #  If the Lesson widget doesn't contain text then simply
-                # insert the necessary data into the HEBREW_AUDIO table
-                # otherwise process the Lesson name in order to add its
-                # lesson ID to the INSERT statement.
-
-                if not contains_text(lesson_name):
-                    sql_stmt = \
-                      ('INSERT INTO hebrew_audio(english, hebrew, hebrew_no_niqqud, audio_file)'
-                       f' VALUES("{english_text}", "{hebrew_text}", "{hebrew_no_niqqud}", "{audio_file_name}");')
-                else:
-                    #  If the lesson name isn't in the LESSON table
-                    # it must be a new lesson so add it. In any event,
-                    # get the lesson's lesson ID.
-                    sql_stmt = ("SELECT lesson_id"
-                                " FROM lesson"
-                                f" WHERE name ='{lesson_name}';")
-                    SQL.execute(sql_stmt)
-                    row = SQL.fetchone()
-                    if row is None:
-                        sql_stmt = ("INSERT INTO lesson(name)"
-                                    f"  VALUES('{lesson_name}');")
-                        SQL.execute(sql_stmt)
-                        SQLITE_DB.commit()
-                        sql_stmt = ("SELECT lesson_id"
-                                    " FROM lesson"
-                                    f" WHERE name ='{lesson_name}';")
-                        SQL.execute(sql_stmt)
-                        row = SQL.fetchone()
-                        #  Since a new lesson was created add it
-                        # to the Lesson dropdown list.
-                        self.lessons_cbo['values'] = self.get_lessons()
-                    lesson_id = row['lesson_id']
-                    sql_stmt = \
-                      ('INSERT INTO hebrew_audio(english, hebrew, hebrew_no_niqqud, audio_file, lesson_id)'
-                       f' VALUES("{english_text}", "{hebrew_text}", "{hebrew_no_niqqud}", "{audio_file_name}",'
-                       f'{lesson_id} );')
-                    
+            #  If the Lesson widget doesn't contain text then simply
+            # insert the necessary data into the HEBREW_AUDIO table
+            # otherwise process the Lesson name in order to add its
+            # lesson ID to the INSERT statement.
+            #  audio_keys fills in the HEBREW_NO_NIQQUD and search key
+            # columns.
+            #  The statements are run together on the database worker
+            # thread.
+            sql_stmt = hebrew_repository.sql('audio', 'insert')
+            params = hebrew_repository.audio_keys(
+                {'english': english_text, 'hebrew': hebrew_text,
+                 'audio_file': audio_file_name,
+                 'lesson': lesson_name if contains_text(lesson_name) else None})
+
+            def insert_audio(connection):
+                #  If the lesson name isn't in the LESSON table
+                # it must be a new lesson so add it. The lesson and
+                # the audio are committed together.
+                new_lesson = False
+                with hebrew_db.transaction(connection):
+                    if params['lesson']:
+                        new_lesson = hebrew_repository.execute(connection, 'lesson', 'insert',
+                                                               (lesson_name,)) > 0
+                    audio_id = connection.execute(sql_stmt, params).lastrowid
+                return new_lesson, audio_id
+
+            def display_new_audio(result):
+                new_lesson, audio_id = result
                 if DEBUG:
-                    display_sql(current_function, sql_stmt)
-                 
-                SQL.execute(sql_stmt)
-                SQLITE_DB.commit()
+                    display_sql('add_audio_to_db', sql_stmt, params)
+                #  Since a new lesson was created add it
+                # to the Lesson dropdown list.
+                if new_lesson:
+                    self.get_lessons()
                 title = 'Audio Data Added to Database'
-                msg = f"Successfully executed the following SQL:\n {sql_stmt}"
+                msg = (f"Successfully executed the following SQL:\n {sql_stmt}\n"
+                       f" with {params}")
                 messagebox.showinfo(title=title, message=msg)
-                #  Refresh the audio list so that the newly
-                # added audio will appear in the list.
-                if DEBUG:
-                    msg = (f'Following query passed to refresh_audio function:\n '
-                           '{self.active_audio_query}')
-                    print('###############################################')
-                    if IDLE:
-                        color.write(f'{msg}\n', "KEYWORD")
-                    else:
-                        print(msg)
-                    print('###############################################')
-                self.refresh_audio(self.active_audio_query)
+                if self.completions is not None:
+                    self.completions.add(audio_id, english_text, hebrew_text)
+                #  If the new audio belongs in the displayed audio list
+                # insert it in its place and display it. A search can only
+                # be checked by running it again.
+                if self.lists_new_audio(lesson_name):
+                    self.select_audio(self.audio_list_cbo.insert_record(audio_id,
+                                                                        english_text))
+                elif self.audio_list_cbo.records.key is None:
+                    if DEBUG:
+                        msg = (f'Following query passed to refresh_audio function:\n '
+                               f'{self.active_audio_query}')
+                        print('###############################################')
+                        if IDLE:
+                            color.write(f'{msg}\n', "KEYWORD")
+                        else:
+                            print(msg)
+                        print('###############################################')
+                    self.refresh_audio(self.active_audio_query,
+                                       on_done=lambda: select_new_audio(audio_id))
+
+            def select_new_audio(audio_id):
                 #  Set the current audio to the new audio.
-                for i, audio in enumerate(self.audio_list_cbo['values']):
-                    audio_item = audio.split('|')
-                    audio_text = audio_item[0].strip()
-                    if audio_text == english_text:
-                        self.audio_list_cbo.current(i)
-                self.audio_list_cbo.event_generate("<<ComboboxSelected>>")
-            except sqlite3.Error as err:
-                display_sql_error(err, sql_stmt)
+                index = self.audio_list_cbo.records.index(audio_id)
+                if index >= 0:
+                    self.select_audio(index)
+
+            self.audio_changed()
+            db_worker.submit(insert_audio, on_done=display_new_audio,
+                             on_error=lambda err: display_sql_error(err, sql_stmt))
         else:
             title = 'Insufficient Data'
             msg = ('The English for New Audio, Hebrew and '
                    'Audio File fields must contain data.')
             messagebox.showerror(title=title, message=msg)
-            
-        if DEBUG:
-            display_function_completion(current_function)
 
     #_____________________________________
     #       clear_current_audio
     #_____________________________________
+    @hebrew_trace.traced
     def clear_current_audio(self, event=None):
         """
            Clears out any text that might be in the Hebrew and
@@ -1621,38 +1874,14 @@ class AudioMgr():
           preparation for creating a new entry to insert into
           the database HEBREW_AUDIO table.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
         self.hebrew_text.delete(0, 'end')
         self.audio_file_entry.delete(0, 'end')
         self.audio_list_cbo.set('')
 
-        if DEBUG:
-            display_function_completion(current_function)
-
-    #_____________________________________
-    #       contains_niqqud
-    #_____________________________________
-    def contains_niqqud(self, string):
-        """
-          Detectc the presence of niqqud in the Hebrew text
-        """
-        
-        niqqud = ['\u05B0','\u05B1','\u05B2','\u05B3','\u05B4',
-                  '\u05B5','\u05B6','\u05B7','\u05B8','\u05B9',
-                  '\u05BA','\u05BB','\u05BC','\u05BD','\u05C1',
-                  '\u05C2','\u05C4','\u05C5']
-        for i, char in enumerate(string):
-            if char in niqqud:
-                return True
-        return False
-
-
     #_____________________________________
     #      create_html_study_sheet 
     #_____________________________________
+    @hebrew_trace.traced
     def create_html_study_sheet(self, **study_subjects):
         """
            Creates an html file that displays a list of the
@@ -1677,259 +1906,66 @@ class AudioMgr():
           When clicked it will display the pealim.com webpage for that Hebrew
           word if found.   
         """
-        if DEBUG:
-                current_function = sys._getframe().f_code.co_name
-                display_function(current_function)
-                
         #  Search the dictionary "study_subjects" passed to the
         # function to determine the language and the source of
-        # the vocabularyvocabulary
-        if 'language' in study_subjects:
-            language = study_subjects['language']
-        else:
-            language = 'English, Hebrew'
-            
-        if 'lesson' in study_subjects:
-            lesson = study_subjects['lesson']
-            # Stick Lesson between Hs-yesod and lesson number
-            # to form the study sheet's title
-            study_title = lesson.replace(' ', ' Lesson ')
-            #  Named section found in the present and past
-            # tense verb HTML pages
-            lesson_link = lesson.replace('Ha-yesod', '#Lesson')
-        else:
-            lesson = None
-            lesson_link = ''
-               
-        if 'category' in study_subjects:
-            category = study_subjects['category']
-            study_title = category
-        else:
-            category = None
-            
-        #  Compose the common elements of the HTML file that's
-        # written at the top of the file
-        print(f'Study title = {study_title}')
-        test_template = \
-        ('<!DOCTYPE html>\n'
-         '<html lang="en">\n'
-         '<head>\n'
-         '   <meta charset = "UTF-8">\n'
-         f'   <title>{study_title}</title> \n'
-         '       <link rel="stylesheet" type="text/css" href="hebrew.css"> \n'
-         '   </style> \n'
-         '</head> \n'
-         '<body> \n'
-         f'   <h2 class="lesson_header"> {study_title} </h2> \n'
-         '<a href="Ha-yesod_verb_list.html" target="_blank">Ha-Yesod Verb List</a> <br>\n'
-         f'<a href="Ha-yesod-verbs_present.html{lesson_link}" target="_blank">Ha-Yesod Verbs Present Tense</a> <br>\n'
-         f'<a href="Ha-yesod-verbs_past.html{lesson_link}" target="_blank">Ha-Yesod Verbs Past Tense</a> <br>\n'
-         '<a href="grammar_verbs.html" target="_blank">Verb Conjugation</a> <br><br>\n'
-         '<a href="https://www.pealim.com" target="_blank">\n'
-         '   <img src="pealim.png" alt="Pealim Logo" style="width:24px;height:24px;"></a>\n'
-         ' <a style="color:#2c6cac;"> Displays the pealim.com webpage for the Hebrew word (if found). </a><br>\n'
-         f'<h4> {language} Vocabulary:</h4> \n'
-         '<table > \n'
-         '<colgroup> \n'
-         '<col  style="text-align: left;"> \n'
-         '<col  style="text-align: right;" > \n'
-         '</colgroup> \n'
-         '<tbody> \n')
+        # the vocabulary
+        language = study_subjects.get('language', 'English, Hebrew')
+        lesson = study_subjects.get('lesson')
+        category = study_subjects.get('category')
 
         # Construct the name of the file based on the vocabulary source
-        if lesson:
-            study_sheet = f"{HEBREW_MEDIA}{lesson.replace(' ', '_')}_study_sheet.html"
-            print(f'Creating lesson test {study_sheet}')
-        elif category:
-            category = category.replace(' ', '_')
-            study_sheet = f"{HEBREW_MEDIA}{category}_study_sheet.html"
-
-         
+        study_sheet = hebrew_sheets.sheet_path(HEBREW_MEDIA, language,
+                                               lesson=lesson, category=category)
+        print(f'Creating study sheet {study_sheet}')
+
         #  Permit displaying the niqqud or not if the
         # language being displayed is just Hebrew. This
         # is to allow testing the way Hebrew is usually
         # written, i.e. without the niqqud.
+        niqqud = True
         if language == 'Hebrew':
             msg = f"Retain niqqud?"
             if messagebox.askyesno('Verify', msg, icon='warning'):
                 niqqud = True
             else:
                 niqqud = False
-                
-        #  Compose the proper SQL query for lesson or category
-        # and write the formatted results to the HTML file.
-        try:
-            with io.open(study_sheet ,'w', encoding='utf8') as study_file:
-                study_file.write(test_template)
-                if language != 'English, Hebrew':
-                    study_file.write(('<tr>\n'
-                                      '   <td></td>\n'
-                                      '   <td></td>\n'
-                                      '   <td></td>\n'
-                                      '   <td></td>\n'
-                                      '   <td>&nbsp &nbsp</td>\n'
-                                      '   <td> <button class="hide_answers_button" onclick="hide_answers()">Hide Answers</button></td>\n'
-                                      '</tr>\n'))
-          
-                if lesson:
-                    sql_stmt = (f'SELECT english, hebrew, audio_file FROM hebrew_audio \n'
-                                '  WHERE lesson_id = \n'
-                                '   (SELECT lesson_id FROM lesson \n'
-                                f'    WHERE name = "{lesson}")  \n'  
-                                f' ORDER BY {language};')
-                elif category:
-                    sql_stmt = (f'SELECT english, hebrew, audio_file FROM hebrew_audio \n'
-                                '  WHERE audio_id IN \n'
-                                f'   (SELECT audio_id FROM {category}) \n'  
-                                f' ORDER BY {language};')
-                    
-                print(sql_stmt)
-                SQL.execute(sql_stmt)
-
-                row_num = 0
-                for row in SQL.fetchall():
-                    pealim_search = row['hebrew'] 
-                    pealim_button = (f'   <td><a href="https://www.pealim.com/search/?q={pealim_search}" target="_blank"> \n'
-                                     '       <img src="pealim.png" alt="Pealim Logo" style="width:24px;height:24px;"></a></td> \n')
-                    if language == 'English, Hebrew':
-                        row_num += 1
-                        # Write a row consisting of an English column and a Hebrew column
-                        study_file.write('<tr> \n')
-                        # English column of the row
-                        study_file.write(f'   <td class="english_text">&nbsp &nbsp {row["english"]}</td> \n')
-                        
-                        audio_id = f'audio_{row_num}'
-                        if row['audio_file'] == 'No Audio':
-                            audio_found = False
-                            cursor_icon = 'no-audio-cursor'
-                        else:
-                            audio_found = True
-                            cursor_icon = 'play-audio-cursor'
-                        # Hebrew column of the row
-                        study_file.write(f'   <td class="hebrew_text {cursor_icon}" onclick="play(\'{audio_id}\')">&nbsp {row["hebrew"]}</td> \n')
-                        if audio_found:
-                            study_file.write(f'   <audio id="{audio_id}" src="{row["audio_file"]}"></audio> \n')
-                        # Pealim button column
-                        study_file.write(f'   <td>&nbsp &nbsp</td>\n{pealim_button}')
-                        study_file.write('</tr> \n')
-                    else:
-                        if language == 'Hebrew':
-                            test_text = row['hebrew'].strip()  
-                            if not niqqud:
-                                text = self.remove_niqqud(text)
-                            input_class = 'english_input'
-                            translation = 'hebrew_text'
-                            answer_text = row['english']
-                        else:
-                            test_text = row['english'].strip()  
-                            input_class = 'hebrew_input'
-                            translation = 'english_text'
-                            answer_text = row['hebrew']
-                         
-                        # Color the background of every other row's
-                        # translation text light blue
-                        row_num += 1
-                        if row_num & 1 == 1:
-                            row_class = 'row_odd'
-                        else:
-                            row_class = 'row_even'
-                        # Define the answer text and audio file variables for the row                     
-                        answer_text_id = f'text_{row_num}'                 
-                        audio_id = f'audio_{row_num}'
-                        audio_file = row['audio_file']
-                        if audio_file == 'No Audio':
-                            audio_found = False
-                            cursor_icon = 'no-audio-cursor'
-                        else:
-                            audio_found = True
-                            cursor_icon = 'play-audio-cursor'
-                        #  Write a row with columns for the answer input, the word being tested,
-                        # a "display answer" button and the answer to be displayed when the button
-                        # is pressed. Actually, the "display answer" button toggles the display
-                        #  of the answer on and off.
-                        study_file.write('<tr> \n')
-                        # Answer input column
-                        study_file.write((f'   <td><input type="text" class="{input_class}" '
-                                          ' name="comment" value=" "></td> \n'))
-
-                        answer_button = (f'   <td class="answer_button">'
-                                         f'<button onclick="toggle_answer_display(\'{answer_text_id}\')">Answer</button></td> \n')
-
-                        
-                        if language == 'Hebrew':
-                            # Test word column
-                            study_file.write((f'   <td class="{translation} {row_class} {cursor_icon}" onclick="play(\'{audio_id}\')">'
-                                              f'&nbsp &nbsp {test_text}</td> \n'))
-                            
-                            # Answer button column
-                            study_file.write(f'{answer_button}')
-                            
-                            # Pealim button column
-                            study_file.write(f'{pealim_button}   <td></td>\n')
-                            
-                            # Answer text column
-                            study_file.write((f'   <td id="{answer_text_id}" class="answer_text english_text {row_class}">{answer_text}</td> \n'))
-                        else:
-                            # Test word column
-                            study_file.write((f'   <td class="{translation} {row_class}">'
-                                              f'&nbsp &nbsp {test_text}</td> \n'))
-                            
-                           # Answer button column
-                            study_file.write(f'{answer_button}')
-
-                            # Pealim button column
-                            study_file.write(f'{pealim_button}   <td></td>\n')
-                            
-                            # Answer text column
-                            study_file.write((f'   <td id="{answer_text_id}" class="answer_text hebrew_text {cursor_icon} {row_class}" '
-                                              f' onclick="play(\'{audio_id}\')">{answer_text}</td> \n'))
-
-                            
-                        if audio_found:
-                            study_file.write(f'   <audio id="{audio_id}" src="{audio_file}"></audio> \n')                                                  
-                        study_file.write('</tr> \n')
-                        
-                study_file.write("</tbody> \n")
-                study_file.write("</table> \n")
-                if language != 'english, hebrew':                  
-                    study_file.write(f'<script src="hebrew.js" ></script> \n')
-                    study_file.write(('<script> \n'	
-                                     'let elements = document.getElementsByClassName("hebrew_input"); \n'		
-                                     'for (var i = 0; i < elements.length; i++) {  \n'
-                                     '    elements[i].addEventListener("keyup", convertTextToHebrew, false); \n'
-                                     '} \n'
-                                     '</script> \n'))
-                study_file.write("</body> \n")
-                study_file.write("</html> \n")
-
-            webbrowser.open_new(study_sheet)
-                    
-        except sqlite3.Error as err:
-            display_sql_error(err, sql_stmt)
 
+        #  Compose the proper SQL query for lesson or category.
+        sql_stmt, params = hebrew_repository.sheet_query(language, lesson=lesson,
+                                                         category=category)
         if DEBUG:
-            display_function_completion(current_function)
+            display_sql('create_html_study_sheet', sql_stmt, params)
+
+        #  The database worker streams the results of the query to
+        # the HTML file a chunk at a time so even the biggest
+        # category is never held in memory all at once.
+        def display_study_sheet(result):
+            study_sheet, row_count = result
+            print(f'Wrote {row_count} rows to {study_sheet}')
+            open_webpage(study_sheet)
+
+        db_worker.submit(hebrew_sheets.create_study_sheet, HEBREW_MEDIA, language,
+                         lesson=lesson, category=category, niqqud=niqqud,
+                         on_done=display_study_sheet,
+                         on_error=lambda err: display_sql_error(err, sql_stmt))
 
 
     #_____________________________________
     #       display_lesson_webpage
     #_____________________________________
+    @hebrew_trace.traced
     def display_lesson_webpage(self, event=None):
         """
           Envokes the web browser to display the webpage
          of the lesson displayed in the Lesson combobox.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
         webpage = self.lesson.get()
         if webpage:
             webpage = HEBREW_MEDIA + webpage.replace(' ', '_') +'.html'
             if os.path.exists(webpage):
                 if DEBUG:
                     print(f'webpage={webpage}')
-                webbrowser.open_new(webpage)
+                open_webpage(webpage)
             else:
                 msg = f'Lesson answer webpage NOT found:\n {webpage}.'
                 messagebox.showinfo('No Lesson Webpage', msg)
@@ -1937,22 +1973,16 @@ class AudioMgr():
             msg = "No URL entry"
             messagebox.showinfo('No Lesson Webpage', msg)
 
-        if DEBUG:
-            display_function_completion(current_function)
-
 
     #_____________________________________
     #        display_webpage_menu
     #_____________________________________
+    @hebrew_trace.traced
     def display_webpage_menu(self, event):
         """
          Displays the webpage pop-up menu at the widget
         that invoked it and launches the selected webpage.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-        
         widget = event.widget
         widget.focus_set()
 
@@ -2010,12 +2040,10 @@ class AudioMgr():
 
         self.website_menu.tk.call("tk_popup", self.website_menu, event.x_root, event.y_root)
 
-        if DEBUG:
-            display_function_completion(current_function)
-
     #_______________________________________________________________________________    
     #                       display_sql_window  
     #_______________________________________________________________________________      
+    @hebrew_trace.traced
     def display_sql_window(self):
         """
           Displays a tkinter Toplevel widget allowing entering
@@ -2023,10 +2051,6 @@ class AudioMgr():
          table definitions.
         """
         
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-            
         sql_win = tk.Toplevel()   
         sql_text = tk.Text(sql_win, height=7, width=50)    
         sql_win.geometry(("%dx%d" % (SQL_WIN_WIDTH, SQL_WIN_HEIGHT)))
@@ -2051,8 +2075,10 @@ class AudioMgr():
                                 fg=FG_COLOR,bg=BG_COLOR, 
                                 command = lambda: self.run_sql(tables))
 
-        if DEBUG:
-            display_function_completion(current_function)
+        #--- slow statements button
+        slow_sql_btn = tk.Button(sql_win,text = "Slow SQL",
+                                 fg=FG_COLOR,bg=BG_COLOR,
+                                 command = self.display_slow_statements)
 
 
     
@@ -2069,13 +2095,102 @@ class AudioMgr():
         tables_btn.place(x = 620, y = 270)
 
         database_btn.place(x = 570, y = 270)
+
+        slow_sql_btn.place(x = 460, y = 270)
         
         sql_win.mainloop()
 
 
+    #_____________________________________
+    #      display_slow_statements
+    #_____________________________________
+    def display_slow_statements(self):
+        """
+          Displays the slowest SQL statements the app has run, newest
+         first, with how long each took and how many rows it returned.
+         Selecting one shows its parameters and query plan. The list
+         refreshes itself every SLOW_SQL_REFRESH_MS while it's open.
+        """
+        slow_win = tk.Toplevel()
+        slow_win.geometry(("%dx%d" % (SLOW_SQL_WIN_WIDTH, SLOW_SQL_WIN_HEIGHT)))
+        slow_win.title(f'SQL Statements Slower Than '
+                       f'{hebrew_db.SLOW_STATEMENT_SECONDS * 1000:g} ms')
+        slow_win.configure(background=BG_COLOR)
+        slow_list = tk.Listbox(slow_win, height=12, width=90,
+                               font='Courier 10', exportselection=0)
+        slow_scroll = tk.Scrollbar(slow_win, orient=tk.VERTICAL,
+                                   command=slow_list.yview)
+        slow_list.configure(yscrollcommand=slow_scroll.set)
+        detail_text = tk.Text(slow_win, height=12, width=90,
+                              font='Courier 10', wrap=tk.WORD)
+        totals_var = tk.StringVar()
+        statements = []
+
+        def refresh():
+            selected = slow_list.curselection()
+            statements[:] = hebrew_db.statement_log.slow_statements()
+            slow_list.delete(0, tk.END)
+            for statement in statements:
+                slow_list.insert(tk.END,
+                    f"{time.strftime('%H:%M:%S', time.localtime(statement['time']))}"
+                    f" {statement['seconds'] * 1000:>9.2f} ms"
+                    f" {statement['rows']:>6} rows  "
+                    f"{' '.join(statement['sql'].split())}")
+            if selected and selected[0] < len(statements):
+                slow_list.selection_set(selected[0])
+            totals = hebrew_db.statement_log.statements()
+            totals_var.set(f'{sum(total[1] for total in totals)} statements run,'
+                           f' {sum(total[2] for total in totals) * 1000:.0f} ms'
+                           f' in all, {len(statements)} slow')
+
+        def show_statement(event):
+            selected = slow_list.curselection()
+            if not selected:
+                return
+            statement = statements[selected[0]]
+            detail_text.delete('1.0', tk.END)
+            detail_text.insert(tk.END,
+                f"{statement['sql']}\n\nParameters: {statement['params']!r}\n"
+                f"Time: {statement['seconds'] * 1000:.2f} ms"
+                f"   Rows: {statement['rows']}\n\nQuery plan:\n"
+                + ('\n'.join(statement['plan']) or '  (none)'))
+
+        def clear():
+            hebrew_db.statement_log.clear()
+            detail_text.delete('1.0', tk.END)
+            refresh()
+
+        def auto_refresh():
+            if slow_win.winfo_exists():
+                refresh()
+                slow_win.after(SLOW_SQL_REFRESH_MS, auto_refresh)
+
+        slow_list.bind('<<ListboxSelect>>', show_statement)
+
+        refresh_btn = tk.Button(slow_win, text="Refresh",
+                                fg=FG_COLOR, bg=BG_COLOR, command=refresh)
+        clear_btn = tk.Button(slow_win, text="Clear",
+                              fg=FG_COLOR, bg=BG_COLOR, command=clear)
+
+        #====================================================================
+        #_-_-_-_-_-_-_-_- Arrange the widgets on the screen -_-_-_-_-_-_-_-_
+        #====================================================================
+
+        slow_list.place(x=12, y=10)
+        slow_scroll.place(x=SLOW_SQL_WIN_WIDTH - 24, y=10, height=200)
+        detail_text.place(x=12, y=220)
+        tk.Label(slow_win, textvariable=totals_var,
+                 fg=FG_COLOR, bg=BG_COLOR).place(x=12, y=430)
+        refresh_btn.place(x=SLOW_SQL_WIN_WIDTH - 150, y=425)
+        clear_btn.place(x=SLOW_SQL_WIN_WIDTH - 70, y=425)
+
+        auto_refresh()
+
+
     #_____________________________________
     #       execute_audio_option
     #_____________________________________
+    @hebrew_trace.traced
     def execute_audio_option(self, option):
         """
           Depending on the option selected updates the HEBREW_AUDIO table to
@@ -2083,71 +2198,75 @@ class AudioMgr():
          list combox, the Hebrew and audio_file entry boxes for the displayed
          Audio ID or removes the audio file data from the database.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
         self.audio_options.set("Options")
-        selected_audio = self.selected_audio.get()
-        try:
-            if   '|' not in selected_audio:
-                title = 'No Audio Selected'
-                msg = (' Nothing selected in the '
-                       'Audio | Audio ID combo box.')
-                messagebox.showerror(title=title, message=msg)
-            else:
-                selection = selected_audio.split('|')
-                english = selection[0].strip()
-                audio_id = selection[1].strip()
-                hebrew = self.hebrew_text.get()
-                hebrew_no_niqqud = self.remove_niqqud(hebrew)
-                audio_file = self.audio_file_entry.get()
-                if option.startswith('Save'):
-                    sql_stmt = (" UPDATE hebrew_audio "
-                                f"  SET english = '{english}',  hebrew = '{hebrew}',"
-                                f"    hebrew_no_niqqud = '{hebrew_no_niqqud}', "
-                                f"    audio_file = '{audio_file}'"
-                                f" WHERE audio_id = {audio_id} ;")
-                    SQL.execute(sql_stmt)
-                    SQLITE_DB.commit()
-                    title = f'AUDIO_ID {audio_id} Successfully Updated'
-                    msg = f'Executed SQL:\n {sql_stmt}'
-                    messagebox.showinfo(title=title, message=msg)
-                elif option.startswith('Delete'):
-                    msg = f"Delete '{english}  AUDIO_ID {audio_id}'?"
-                    if messagebox.askyesno('Verify', msg, icon='warning'):
-                        sql_stmt = ('DELETE FROM hebrew_audio '
-                                    f'  WHERE audio_id = {audio_id};')
-                        SQL.execute(sql_stmt)
-                        SQLITE_DB.commit()
-                        title = f'{english} AUDIO_ID {audio_id} Successfully Deleted'
-                        msg = f"Executed SQL:\n {sql_stmt}"
-                        messagebox.showinfo(title=title, message=msg)
-                #  Grab the index of the currently selected item in the Audio list combobox.
-                #  Using the combobox's current() function after text has been edited in
-                # the combobox returns -1 so use the audio_index variable which was created
-                # to solve that problem. Refresh the combobox so that its dropdown list
-                # reflects the database changes and set the combobox back to where it was.
-                # If an item was deleted then the item below it will be displayed.
-                current_index = self.audio_index.get()
+        audio_id = self.audio_list_cbo.selected_id()
+        if audio_id is None:
+            title = 'No Audio Selected'
+            msg = (' Nothing selected in the '
+                   'Audio combo box.')
+            messagebox.showerror(title=title, message=msg)
+        else:
+            #  The English may have been edited in the combobox
+            english = self.selected_audio.get().strip()
+            hebrew = self.hebrew_text.get()
+            audio_file = self.audio_file_entry.get()
+            sql_stmt = ''
+            if option.startswith('Save'):
+                #  audio_keys fills in the HEBREW_NO_NIQQUD and search key
+                # columns.
+                sql_stmt = hebrew_repository.sql('audio', 'update')
+                params = hebrew_repository.audio_keys(
+                    {'english': english, 'hebrew': hebrew,
+                     'audio_file': audio_file, 'audio_id': audio_id})
+                title = f'AUDIO_ID {audio_id} Successfully Updated'
+                msg = f'Executed SQL:\n {sql_stmt}\n with {params}'
+            elif option.startswith('Delete'):
+                msg = f"Delete '{english}  AUDIO_ID {audio_id}'?"
+                if messagebox.askyesno('Verify', msg, icon='warning'):
+                    sql_stmt = hebrew_repository.sql('audio', 'delete')
+                    params = (audio_id,)
+                    title = f'{english} AUDIO_ID {audio_id} Successfully Deleted'
+                    msg = f"Executed SQL:\n {sql_stmt}\n with {params}"
+            #  Rather than querying the database again, apply the change to
+            # the Audio list combobox's records and set the combobox back to
+            # the saved audio, which moves to its new place in the list if
+            # its English changed. If an item was deleted then the item below
+            # it will be displayed.
+            def display_changes(row_count):
+                messagebox.showinfo(title=title, message=msg)
+                if self.completions is not None:
+                    if option.startswith('Save'):
+                        self.completions.add(audio_id, english, hebrew)
+                    else:
+                        self.completions.remove(audio_id)
+                index = self.find_audio(audio_id)
                 if DEBUG:
                     print('========================================================')
-                    print('Index of {current_index} in query \n{self.active_audio_query}')
-                self.refresh_audio(self.active_audio_query)
-                self.audio_list_cbo.current(current_index)
-
-                max_words = len(self.audio_list_cbo['values'])
-
-                self.audio_list_cbo.event_generate("<<ComboboxSelected>>")
-        except sqlite3.Error as err:
-            display_sql_error(err, sql_stmt)
+                    print(f'Index of {index} in query \n{self.active_audio_query}')
+                if index < 0:
+                    #  The list was changed while the database was updated
+                    return
+                if option.startswith('Save'):
+                    self.select_audio(self.audio_list_cbo.update_record(index, english))
+                else:
+                    self.audio_list_cbo.delete_record(index)
+                    if len(self.audio_list_cbo.records) > 0:
+                        self.select_audio(index)
+                    else:
+                        #  The active query was a search that returned 1 item
+                        # and it was deleted so list all the audio.
+                        self.refresh_audio()
 
-        if DEBUG:
-            display_function_completion(current_function)
+            if sql_stmt:
+                self.audio_details.invalidate(audio_id)
+                self.audio_changed()
+                db_worker.execute(sql_stmt, params, on_done=display_changes,
+                                  on_error=lambda err: display_sql_error(err, sql_stmt))
 
     #_____________________________________
     #    execute_category_option
     #_____________________________________
+    @hebrew_trace.traced
     def execute_category_option(self, option):
         """
            Adds or removes the displayed Audio ID from the category
@@ -2157,10 +2276,6 @@ class AudioMgr():
            Creates HTML study sheets for the category's
           vocabulary.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
         #  Before proceeding make sure an audio has been selected
         # and the category combobox contains text that was either
         # selected or manually entered to create a new category.
@@ -2169,10 +2284,11 @@ class AudioMgr():
 
         self.category_options.set("Options")
         selected_audio = self.selected_audio.get()
+        audio_id = self.audio_list_cbo.selected_id()
         category_name = self.category.get()
-        if  '|' not in selected_audio:
+        if audio_id is None:
             title = 'No Audio Selected'
-            msg = 'Nothing selected in the English | Audio ID combo box.'
+            msg = 'Nothing selected in the Audio combo box.'
             messagebox.showerror(title=title, message=msg)
         elif category_name == '':
             title = 'No Category Entered'
@@ -2196,64 +2312,66 @@ class AudioMgr():
             msg = f"Category '{category_name}' doesn't include Audio '{selected_audio}'."
             messagebox.showerror(title=title, message=msg)
         else:
-            selection = selected_audio.split('|')
+            english = selected_audio.strip()
             if DEBUG:
-                print(selection)
-            english = selection[0].strip()
-            audio_id = selection[1].strip()
-            category_table = category_name.replace(' ', '_')
-            if option.startswith('Remove'):
-                try:
-                    sql_stmt = (f'DELETE FROM {category_table} '
-                                f'  WHERE audio_id = {audio_id};')
-                    SQL.execute(sql_stmt)
-                    self.category_cbo['values'] = self.get_categories()
+                print(f'{english} AUDIO_ID {audio_id}')
+            self.audio_details.invalidate(audio_id)
+            if option.startswith('Add all'):
+                #  Tag every audio in the Audio dropdown list with the
+                # category in a single transaction.
+                audio_ids = self.audio_list_cbo.records.ids.tolist()
+                for member_id in audio_ids:
+                    self.audio_details.invalidate(member_id)
+
+                def display_additions(row_count):
+                    title = 'Database Successfully Updated'
+                    msg = (f'Added {row_count} of {len(audio_ids)} audio'
+                           f' to category: {category_name}')
+                    messagebox.showinfo(title=title, message=msg)
+                    self.get_categories()
+                    self.category_lbl.configure(fg=FG_A_MEMBER)
+
+                db_worker.submit(hebrew_repository.add_category_members,
+                                 category_name, audio_ids,
+                                 on_done=display_additions,
+                                 on_error=lambda err: display_sql_error(err,
+                                                                        'INSERT INTO category_member'))
+            elif option.startswith('Remove'):
+                def display_removal(row_count):
+                    self.get_categories()
                     self.category_lbl.configure(fg=FG_NOT_A_MEMBER)
                     title = 'Database Successfully Updated'
                     msg = (f"Deleted '{english}' AUDIO_ID {audio_id}"
-                           " from category: {category_table}")
+                           f" from category: {category_name}")
                     messagebox.showinfo(title=title, message=msg)
-                except sqlite3.Error as err:
-                    display_sql_error(err, sql_stmt)
+
+                db_worker.submit(hebrew_repository.remove_category_member,
+                                 category_name, audio_id,
+                                 on_done=display_removal,
+                                 on_error=lambda err: display_sql_error(err,
+                                                                        'DELETE FROM category_member'))
             elif option.startswith('Add'):
-                #  If the category table does not exist create it since
-                # it must be a new category. Add the new category's name
-                # to the databse CATEGORY table which is a list of all
-                # the category tables.
-                try:
-                    try:
-                        sql_stmt = f'INSERT INTO {category_table} VALUES({audio_id});'
-                        SQL.execute(sql_stmt)
-                        SQLITE_DB.commit()
-                    except sqlite3.OperationalError as err:
-                        if err.args[0].find('no such table') > -1:
-                            create_table = (f'CREATE TABLE {category_table} '
-                                            ' (audio_id INTEGER PRIMARY KEY,'
-                                            '  FOREIGN KEY (audio_id)'
-                                            '  REFERENCES hebrew_audio(audio_id));')
-                            if DEBUG:
-                                display_sql(current_function, create_table)
-
-                            SQL.execute(create_table)
-                            SQL.execute(f"INSERT INTO category VALUES('{category_table}');")
-                            SQL.execute(sql_stmt)
-                            SQLITE_DB.commit()
-                except sqlite3.Error as err:
-                    display_sql_error(err, sql_stmt)
-                else:
+                #  If the category isn't in the CATEGORY table it must
+                # be a new category and it's added along with its
+                # first member.
+                def display_addition(created):
                     title = 'Database Successfully Updated'
                     msg = (f"Added '{english}' AUDIO_ID {audio_id}"
-                           f" to category: {category_table}")
+                           f" to category: {category_name}")
                     messagebox.showinfo(title=title, message=msg)
-                    self.category_cbo['values'] = self.get_categories()
+                    self.get_categories()
                     self.category_lbl.configure(fg=FG_A_MEMBER)
 
-        if DEBUG:
-            display_function_completion(current_function)
+                db_worker.submit(hebrew_repository.add_category_member,
+                                 category_name, audio_id,
+                                 on_done=display_addition,
+                                 on_error=lambda err: display_sql_error(err,
+                                                                        'INSERT INTO category_member'))
 
     #_____________________________________
     #    execute_lesson_option
     #_____________________________________
+    @hebrew_trace.traced
     def execute_lesson_option(self, option):
         """
            Adds or removes whatever audio file that is selected in
@@ -2268,10 +2386,6 @@ class AudioMgr():
           it's LESSON_ID column. So actually, the lesson is added to
           the audio and not vice versa.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
         #  Make sure an audio file has been selected.
         #  Any selected audio will have the format
         #       'text | audio id number'
@@ -2282,9 +2396,10 @@ class AudioMgr():
         self.lesson_options.set("Options")
         lesson_name = self.lesson.get()
         selected_audio = self.selected_audio.get()
-        if   '|' not in selected_audio:
+        audio_id = self.audio_list_cbo.selected_id()
+        if audio_id is None:
             title = 'No Audio Selected'
-            msg = 'Nothing selected in the English | Audio ID combo box.'
+            msg = 'Nothing selected in the Audio combo box.'
             messagebox.showerror(title=title, message=msg)
         elif lesson_name == '':
             title = 'No Lesson Entered'
@@ -2311,37 +2426,28 @@ class AudioMgr():
         elif option.startswith('Answers'):
             self.display_lesson_webpage()
         else:
-            selection = selected_audio.split('|')
-            english = selection[0].strip()
-            audio_id = selection[1].strip()
-            try:
-                if option.startswith('Remove'):
-                    sql_stmt = ("UPDATE hebrew_audio"
-                                " SET lesson_id = NULL"
-                                f"  WHERE audio_id = '{audio_id}';")
-                elif option.startswith('Add'):
-                    #  If the lesson isn't in the
-                    # LESSON table, add it.
-                    sql_stmt = ("Select lesson_id"
-                                " FROM lesson"
-                                f" WHERE name = '{lesson_name}';")
-                    SQL.execute(sql_stmt)
-                    if SQL.fetchone() is None:
-                        sql_stmt = ("INSERT INTO lesson(name)"
-                                    f" VALUES('{lesson_name}');")
-                        SQL.execute(sql_stmt)
-                        SQLITE_DB.commit()
-                    sql_stmt = ("UPDATE hebrew_audio"
-                                "  SET lesson_id = "
-                                "   (SELECT lesson_id"
-                                "    FROM lesson"
-                                f"   WHERE name ='{lesson_name}') "
-                                f"WHERE audio_id = {audio_id};")
-                if DEBUG:
-                    display_sql(current_function, sql_stmt)
+            english = selected_audio.strip()
+            sql_stmt = ''
+
+            def update_lesson(connection):
+                nonlocal sql_stmt
+                with hebrew_db.transaction(connection):
+                    if option.startswith('Remove'):
+                        sql_stmt = hebrew_repository.sql('audio', 'clear_lesson')
+                        params = (audio_id,)
+                    elif option.startswith('Add'):
+                        #  If the lesson isn't in the
+                        # LESSON table, add it.
+                        sql_stmt = hebrew_repository.sql('lesson', 'insert')
+                        connection.execute(sql_stmt, (lesson_name,))
+                        sql_stmt = hebrew_repository.sql('audio', 'set_lesson')
+                        params = {'lesson': lesson_name, 'audio_id': audio_id}
+                    if DEBUG:
+                        display_sql('execute_lesson_option', sql_stmt, params)
+
+                    connection.execute(sql_stmt, params)
 
-                SQL.execute(sql_stmt)
-                SQLITE_DB.commit()
+            def display_changes(result):
                 title = 'Database Successfully Updated'
                 if option.startswith('Add'):
                     msg = (f"Added '{english}' AUDIO_ID {audio_id} "
@@ -2355,171 +2461,115 @@ class AudioMgr():
 
                 #  If a new lesson was created, this will add it
                 # to the Lesson dropdown list.
-                self.lessons_cbo['values'] = self.get_lessons()
-            except sqlite3.Error as err:
-                display_sql_error(err, sql_stmt)
+                self.get_lessons()
 
-        if DEBUG:
-            display_function_completion(current_function)
+            self.audio_details.invalidate(audio_id)
+            db_worker.submit(update_lesson, on_done=display_changes,
+                             on_error=lambda err: display_sql_error(err, sql_stmt))
 
     #_____________________________________
-    #       get_associated_webpages
+    #     display_associated_webpages
     #_____________________________________
-    def get_associated_webpages(self, audio_keywords, audio_id):
+    @hebrew_trace.traced
+    def display_associated_webpages(self, audio_keywords, webpages):
         """
-            Retrieves the URL IDs from the AUDIO_URL_LINK table that
-            are associated with the AUDIO_ID of the English keyword
-            or phrase displayed in the Audio combobox
+            Populates the Topics combobox in the Webpages frame with the
+           webpages linked in the AUDIO_URL_LINK table to the English
+           keyword or phrase displayed in the Audio combobox.
+            The webpages are the (topic, url_id) pairs returned in the
+           audio's details by get_hebrew.
         """
         if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
+            print(f"Associated topics = {webpages}")
+        if len(webpages) > 0:
+            web_mgr.set_topics(webpages)
+            web_mgr.db_url_entry.delete(0, 'end')
+            web_mgr.select_topic(0)
 
-        
-        query = ("SELECT topic, url_id "
-                 "FROM webpage"
-                 " WHERE url_id IN"
-                 "      (SELECT url_id"
-                 "       FROM audio_url_link"
-                 f"      WHERE audio_id = '{audio_id}')"
-                 " ORDER BY topic;")
-        if DEBUG:
-            display_sql(current_function, query)
-
-        try:
-            SQL.execute(query)
-            topics = ['{topic}      | {url_id}'.format(**row)
-                      for row in SQL.fetchall()]
-            if DEBUG:
-                print(f"Associated topics = {topics}")
-            if len(topics) > 0:
-                web_mgr.topics_cbo['values'] = topics
-                web_mgr.topics_cbo.set(topics[0])
-                web_mgr.topics_cbo.set('')
-                web_mgr.db_url_entry.delete(0, 'end')
-                web_mgr.topics_cbo.set(topics[0])
-                web_mgr.topics_cbo.event_generate("<<ComboboxSelected>>")
-
-                web_mgr.search_webpage_entry.delete(0, 'end')
-                web_mgr.webpage_search.set(f"{audio_keywords}")
-        except sqlite3.Error as err:
-            display_sql_error(err, query)
-
-        if DEBUG:
-            display_function_completion(current_function)
+            web_mgr.search_webpage_entry.delete(0, 'end')
+            web_mgr.webpage_search.set(f"{audio_keywords}")
 
     #_____________________________________
     #         get_audio_list
     #_____________________________________
-    def get_audio_list(self, active_query=None, event=None):
+    @hebrew_trace.traced
+    def get_audio_list(self, active_query=None, on_done=None):
         """
             Queries the ENGLISH and AUDIO_ID columns of the database
-           table HEBREW_AUDIO to populate the Audio list combo box.
+           table HEBREW_AUDIO and passes the AudioRecords used to
+           populate the Audio list combo box to the on_done function.
+            The active_query is the (SQL statement, parameters) pair
+           that produced the current list and the records are kept in
+           the same order as the current list.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-        
         if active_query:
-            query = active_query
+            query, params = active_query
+            key = self.audio_list_cbo.records.key
         else:
-            query = ('SELECT english, audio_id '
-                     ' FROM hebrew_audio '
-                     ' ORDER BY english;')
-        try:
-            if DEBUG:
-                display_sql(current_function, query)
-
-            SQL.execute(query)
-            self.active_audio_query = query
-            if DEBUG:
-                display_function_completion(current_function)
-            return ['{english}      | {audio_id}'.format(**row)
-                    for row in SQL.fetchall()]
-        except sqlite3.Error as err:
-            display_sql_error(err, query)
-
+            query, params = hebrew_repository.sql('audio', 'all'), ()
+            key = hebrew_widgets.by_english
         if DEBUG:
-            display_function_completion(current_function)
+            display_sql('get_audio_list', query, params)
+
+        self.active_audio_query = (query, params)
+        db_worker.submit(hebrew_widgets.AudioRecords.query, query, params, key,
+                         on_done=on_done,
+                         on_error=lambda err: display_sql_error(err, query))
 
     #_____________________________________
     #           get_categories
     #_____________________________________
+    @hebrew_trace.traced
     def get_categories(self):
         """
            Retrieves the values from the NAME column of the
           CATEGORY table to populate the category combo box.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
+        sql_stmt = hebrew_repository.sql('category', 'names')
 
-        sql_stmt = \
-        """
-        SELECT name
-          FROM category
-          ORDER BY name;
-        """
-        try:
-            SQL.execute(sql_stmt)
-            if DEBUG:
-                display_function_completion(current_function)
-            return [row['name'] for row in SQL.fetchall()]
-        except sqlite3.Error as err:
-            display_sql_error(err, sql_stmt)
+        def display_categories(rows):
+            self.category_cbo['values'] = [row['name'] for row in rows]
 
-        if DEBUG:
-            display_function_completion(current_function)
+        db_worker.query(sql_stmt, on_done=display_categories,
+                        on_error=lambda err: display_sql_error(err, sql_stmt))
 
     #_____________________________________
     #        get_category_members
     #_____________________________________
+    @hebrew_trace.traced
     def get_category_members(self, event=None):
         """
             When a category is selected in the category combobox, retieves a
          list of all the AUDIO_IDs in the associated category table and populates
          the Audio list combo box with the results.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
         # Get the widget that triggered the event and its displayed text.
         widget = event.widget
         category = widget.selection_get()
 
-        #  The category names displayed in the category combox have
-        # corresponding table names in the database,
-        #   However, since table names contain underscores instead of
-        # spaces replace the spaces with underscores in the category
-        # table name.
-        category_table = category.replace(' ', '_')
-        query = ("SELECT english, ha.audio_id"
-                 f" FROM hebrew_audio ha, {category_table} ct"
-                 "   WHERE ha.audio_id = ct.audio_id"
-                 "   ORDER BY english;")
+        query = hebrew_repository.sql('category', 'members')
+        params = (category,)
         if DEBUG:
-            display_sql(current_function, query)
+            display_sql('get_category_members', query, params)
 
         self.search_audio_entry.delete(0, 'end')
-        try:
-            SQL.execute(query)
-            self.active_audio_query = query
-            audio_list = ['{english}      | {audio_id}'.format(**row)
-                          for row in SQL.fetchall()]
-            # The number_keys function is needed only on
-            #the numbers category
-            if category_table == 'numbers':
-                audio_list.sort(key=audio_mgr.number_keys)
-            #print(audio_list)
+
+        # The number_keys function is needed only on
+        #the numbers category
+        if category == 'numbers':
+            key = audio_mgr.number_keys
+        else:
+            key = hebrew_widgets.by_english
+
+        def display_members(records):
             #  If any matching results were found populate the Audio combobox
             # otherwise display an error
-            if len(audio_list) > 0:
-                self.active_audio_query = query
+            if len(records) > 0:
+                self.active_audio_query = (query, params)
                 self.audio_list_cbo.set('')
                 self.hebrew_text.delete(0, 'end')
                 self.audio_file_entry.delete(0, 'end')
-                self.audio_list_cbo['values'] = audio_list
+                self.audio_list_cbo.set_records(records)
 
                 self.audio_list_cbo.current(0)
                 self.audio_list_cbo.event_generate("<<ComboboxSelected>>")
@@ -2527,15 +2577,15 @@ class AudioMgr():
                 title = 'Search Failed'
                 msg = f'No items found matching {category}'
                 messagebox.showerror(title=title, message=msg)
-        except sqlite3.Error as err:
-            display_sql_error(err, query)
 
-        if DEBUG:
-            display_function_completion(current_function)
+        db_worker.submit(hebrew_widgets.AudioRecords.query, query, params, key,
+                         on_done=display_members,
+                         on_error=lambda err: display_sql_error(err, query))
 
     #_____________________________________
     #            get_hebrew
     #_____________________________________
+    @hebrew_trace.traced
     def get_hebrew(self, event=None):
         """
             When a selection is made in the Audio combobox, retrieves
@@ -2543,14 +2593,10 @@ class AudioMgr():
            of the HEBREW_AUDIO table to populate the Hebrew and Audio File
            entry boxes and the Lessons combobox entry field.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-            
         #  Get the widget that triggered the event
         # and its text
         widget = event.widget
-        
+
         if DEBUG:
             print('###################################')
             msg = f'Processing "{widget.get()}" from "{widget.whoami}"'
@@ -2558,191 +2604,160 @@ class AudioMgr():
                 color.write(f"{msg}\n", "KEYWORD")
             else:
                 print(msg)
-                
-        current_audio = widget.get().split('|')
-        audio_keywords = current_audio[0].strip()
-        audio_id = current_audio[1].strip()
+
+        audio_id = widget.selected_id()
+        if audio_id is None:
+            return
+        audio_keywords = widget.records.english[widget.current()].strip()
 
         self.audio_index.set(widget.current())
         if DEBUG:
             print('###################################')
             print(f'Current index = {widget.current()}')
 
-        sql_stmt = ('SELECT hebrew, audio_file, lesson_id '
-                    ' FROM hebrew_audio '
-                    f' WHERE audio_id = {audio_id};')
-        
+        current_word = widget.current() + 1
+        max_words = len(widget.records)
+        self.total_words.set(f'#{current_word} of {max_words}')
+
+        #  Only the results for the most recently selected audio are
+        # displayed. Scrolling quickly through the list can leave
+        # several selections waiting on the database worker.
+        self.audio_request = audio_id
+        category = self.category.get()
         if DEBUG:
-            display_sql(current_function, sql_stmt)
-        try:
-            SQL.execute(sql_stmt)
-            row = SQL.fetchone()
+            print(f'Category = {category}')
+
+        def display_audio(audio):
+            if audio_id != self.audio_request or audio is None:
+                return
             if DEBUG:
                 print(f'Audio ID {audio_id} returned:')
                 for column in ['hebrew', 'audio_file', 'lesson_id']:
-                    print(f'\t{column} = ', row[column])
-            self.hebrew.set(row['hebrew'])
-            self.audio_file.set(row['audio_file'])
+                    print(f'\t{column} = ', audio[column])
+            self.hebrew.set(audio['hebrew'])
+            self.audio_file.set(audio['audio_file'])
 
-            #  Find the name of the lesson in the LESSON table
-            # corresponding to the LESSON_ID if present.
-            if row['lesson_id'] is None:
+            if audio['lesson'] is None:
                 self.lessons_lbl.configure(fg=FG_NOT_A_MEMBER)
             else:
-                sql_stmt = ('SELECT l.name'
-                            ' FROM lesson l, hebrew_audio ha'
-                            ' WHERE l.lesson_id = ha.lesson_id'
-                            f'  AND ha.lesson_id = {row["lesson_id"]};')
-                SQL.execute(sql_stmt)
-                row = SQL.fetchone()
                 self.lessons_lbl.configure(fg=FG_A_MEMBER)
-                self.lesson.set(row['name'])
+                self.lesson.set(audio['lesson'])
             self.new_english.set('')
-            category_table = self.category.get()
-            if DEBUG:
-                print(f'Category table = {category_table}')
-            if len(category_table) > 0:
-                category_table = self.category.get().replace(' ', '_')
-                sql_stmt = (f"SELECT audio_id FROM {category_table}"
-                            f" WHERE audio_id = '{audio_id}';")
-                if DEBUG:
-                    display_sql(current_function, sql_stmt)
-
-                SQL.execute(sql_stmt)
-                row = SQL.fetchone()
-                if row:
-                    if DEBUG:
-                        print(f"Found {row['audio_id']}")
+            if audio['in_category'] is not None:
+                if audio['in_category']:
                     self.category_lbl.configure(fg=FG_A_MEMBER)
                 else:
                     self.category_lbl.configure(fg=FG_NOT_A_MEMBER)
-            current_word = widget.current() + 1
-            max_words = len(widget['values'])
-            self.total_words.set(f'#{current_word} of {max_words}')
             if DEBUG:
                 print('###################################')
-                msg = f'{current_function} calling get_associated_webpages'
+                msg = 'get_hebrew calling display_associated_webpages'
                 if IDLE:
                     color.write(f"{msg}\n", "STRING")
                 else:
-                    print(msg)           
-            self.get_associated_webpages(audio_keywords, audio_id)
+                    print(msg)
+                print(f'get_hebrew query returned : hebrew={self.hebrew.get()} '
+                      f'audio_file={self.audio_file.get()}')
+            self.display_associated_webpages(audio_keywords, audio['webpages'])
+            self.prefetch_audio(widget.current())
+
+        #  Everything displayed for the audio comes from a single query
+        # of the AUDIO_DETAIL view and is cached until it's changed.
+        audio = self.audio_details.get(audio_id, category)
+        if audio is not None:
+            display_audio(audio)
+        else:
+            generation = self.audio_details.generation
 
-        except sqlite3.Error as err:
-            display_sql_error(err, sql_stmt)
+            def cache_audio(audio):
+                self.audio_details.put(audio_id, category, audio,
+                                       generation)
+                display_audio(audio)
 
-        # if hebrew_in_category(audio_id, category.get()):
-        #     pass
+            sql_stmt = hebrew_repository.sql('audio', 'detail')
+            if DEBUG:
+                display_sql('get_hebrew', sql_stmt,
+                            {'audio_id': audio_id, 'category': category})
+            db_worker.submit(hebrew_repository.audio_detail, audio_id, category,
+                             on_done=cache_audio,
+                             on_error=lambda err: display_sql_error(err, sql_stmt))
 
-        if DEBUG:
-            print(f'{current_function} query returned : hebrew={self.hebrew.get()} '
-                  f'audio_file={self.audio_file.get()}')
-            display_function_completion(current_function)
-            
     #_____________________________________
     #             get_lesson
     #_____________________________________
+    @hebrew_trace.traced
     def get_lesson(self, event=None):
         """
             When a lesson is selected in the Lessons combobox, queries the
           LESSON column of the WEBPAGE table that matches that lesson
           and populates the Audio list combo box with the results.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
         # Get the widget that triggered the event and its displayed text.
         widget = event.widget
         lesson = widget.selection_get()
-        query = ("SELECT english, audio_id"
-                 " FROM hebrew_audio ha, lesson l"
-                 f" WHERE l.name = '{lesson}'"
-                 "   AND ha.lesson_id = l.lesson_id"
-                 " ORDER BY english;")
+        query = hebrew_repository.sql('audio', 'by_lesson')
+        params = (lesson,)
         if DEBUG:
-            display_sql(current_function, query)
+            display_sql('get_lesson', query, params)
 
         self.search_audio_entry.delete(0, 'end')
-        try:
-            SQL.execute(query)
-            audio_list = ['{english}      | {audio_id}'.format(**row)
-                          for row in SQL.fetchall()]
+
+        def display_lesson(records):
             if DEBUG:
-                print(audio_list)
+                print(records.english)
             #  If any matching results were found populate the Audio combobox
             # otherwise display an error
-            if len(audio_list) > 0:
-                self.active_audio_query = query
+            if len(records) > 0:
+                self.active_audio_query = (query, params)
                 if DEBUG:
-                    print(f'{current_function} Active audio query = {self.active_audio_query}')
-                self.audio_list_cbo['values'] = audio_list
+                    print(f'get_lesson Active audio query = {self.active_audio_query}')
+                self.audio_list_cbo.set_records(records)
                 self.audio_list_cbo.current(0)
                 self.audio_list_cbo.event_generate("<<ComboboxSelected>>")
             else:
                 title = 'Search Failed'
                 msg = f'No items found matching {lesson}'
                 messagebox.showerror(title=title, message=msg)
-        except sqlite3.Error as err:
-            display_sql_error(err, query)
-            
-        if DEBUG:
-            display_function_completion(current_function)
+
+        db_worker.submit(hebrew_widgets.AudioRecords.query, query, params,
+                         hebrew_widgets.by_english,
+                         on_done=display_lesson,
+                         on_error=lambda err: display_sql_error(err, query))
 
     #_____________________________________
     #             get_lessons
     #_____________________________________
+    @hebrew_trace.traced
     def get_lessons(self):
         """
             Retrieves the values from the LESSON column of the
            HEBREW_AUDIO table to populate the lessons combo box.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
+        query = hebrew_repository.sql('lesson', 'names')
 
-        query = \
-        """
-        SELECT name
-          FROM lesson
-          ORDER BY name;
-        """
-        try:
-            SQL.execute(query)
-            lessons = [row['name'] for row in SQL.fetchall()]
+        def display_lessons(rows):
+            lessons = [row['name'] for row in rows]
             # Sort the Ha-yesod lessons by the lesson number
             lessons.sort(key=lambda x: float(x.strip('Ha-yesod')))
-            if DEBUG:
-                display_function_completion(current_function)
-            return lessons
-        except sqlite3.Error as err:
-            display_sql_error(err, query)
+            self.lessons_cbo['values'] = lessons
 
-        if DEBUG:
-            display_function_completion(current_function)
+        db_worker.query(query, on_done=display_lessons,
+                        on_error=lambda err: display_sql_error(err, query))
 
     #_____________________________________
     #           is_hebrew
     #_____________________________________
+    @hebrew_trace.traced
     def is_hebrew(self, string):
         """
           If the string contains just one Hebrew character
          the assumption is that it's Hebrew text.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
-        
         if  bool(re.search('[\u0590-\u05FF]+', string)) or \
             bool(re.search('[\uFB1D-\uFB4F]+', string)):
             return True
         else:
             return False
 
-        if DEBUG:
-            display_function_completion(current_function)
-
     #_____________________________________
     #           number_keys
     #_____________________________________
@@ -2760,63 +2775,143 @@ class AudioMgr():
     #_____________________________________
     #             play_audio
     #_____________________________________
-    def play_audio(self, event=None):
+    @hebrew_trace.traced
+    def play_audio(self, event=None, on_done=None):
         """
            Plays the audio of the file displayed in the audio file entry box. The
            audio file must be in the folder specified by the HEBREW_MEDIA constant.
+            The audio plays on the audio player's thread so this returns
+           straight away. Clicking again while it plays starts it over.
+           on_done(completed) is called when it finishes or is stopped.
+            A file that's missing or couldn't be read when the media
+           folder was indexed is reported rather than played.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-            
         audio = self.audio_file.get()
 
+        def display_problem(summary):
+            self.keep_media_problems(summary)
+            problem = self.media_problems.get(audio.casefold())
+            if problem is None:
+                play()
+                return
+            messagebox.showerror(title='Audio File Problem',
+                                 message=f'{audio}:\n\n {problem}')
+            if on_done:
+                on_done(False)
+
+        def play():
+            hebrew_audio = HEBREW_MEDIA + audio
+            if DEBUG:
+                print(f'Playing {hebrew_audio}')
+            audio_player.play(hebrew_audio, on_done=on_done,
+                              on_error=display_error)
+
+        def display_error(err):
+            if isinstance(err, RuntimeError):
+                title = 'Pygame Error'
+            else:
+                title = 'play_audio Function Error'
+            msg = f'Error Message:\n {err.args[0]}'
+            messagebox.showerror(title=title, message=msg)
+            if on_done:
+                on_done(False)
+
         if bool(re.match('.*.mp3', audio)) or \
            bool(re.match('.*.wav', audio)):
-            try:
-                hebrew_audio = HEBREW_MEDIA + audio
-                if DEBUG:
-                    print(f'Playing {hebrew_audio}')
-                clock = pygame.time.Clock()
-                pygame.mixer.music.load(hebrew_audio)
-                pygame.mixer.music.play()
-                # Allows the audio to complete without interruption
-                while pygame.mixer.music.get_busy():
-                    clock.tick(1000)
-            except RuntimeError as err:
-                title = 'Pygame Error'
-                msg = f'Error Message:\n {err.args[0]}'
-                messagebox.showerror(title=title, message=msg)
-            except Exception as err:
-                title = f'{current_function} Function Error'
-                msg = f'Error Message:\n {err.args[0]}'
-                messagebox.showerror(title=title, message=msg)
+            #  A file with a problem is indexed again first in case
+            # it's been fixed since. Only changed files are read.
+            if audio.casefold() in self.media_problems:
+                self.index_media(on_done=display_problem)
+            else:
+                play()
+        elif on_done:
+            on_done(False)
 
-        if DEBUG:
-            display_function_completion(current_function)
+    #_____________________________________
+    #            index_media
+    #_____________________________________
+    def index_media(self, on_done=None):
+        """
+           Brings the index of the audio files in the media folder up
+          to date on the database worker, reading only the files that
+          have changed, and keeps the audio files that are missing or
+          couldn't be read so they're reported as soon as they're
+          played. on_done(summary) is called once it's done.
+        """
+        db_worker.submit(hebrew_media.index_media, HEBREW_MEDIA,
+                         on_done=on_done or self.keep_media_problems,
+                         on_error=lambda err: display_sql_error(err,
+                                                                hebrew_repository.sql('media',
+                                                                                      'save'),
+                                                                'index_media'))
+
+    #_____________________________________
+    #        keep_media_problems
+    #_____________________________________
+    def keep_media_problems(self, summary):
+        """
+           Keeps the audio files with problems found by index_media
+          and prints any that weren't known before.
+        """
+        known = self.media_problems
+        self.media_problems = {audio_file.casefold(): error
+                               for audio_file, error in summary['problems']}
+        for audio_file, error in summary['problems']:
+            if known.get(audio_file.casefold()) != error:
+                print(f'Audio file problem, {audio_file}: {error}')
+        if summary['read'] or summary['removed']:
+            print(f"Indexed {summary['read']} audio files,"
+                  f" {summary['unchanged']} unchanged, {summary['removed']}"
+                  f" removed, in {summary['seconds'] * 1000:.1f} ms")
+
+    #_____________________________________
+    #          prefetch_audio
+    #_____________________________________
+    def prefetch_audio(self, index):
+        """
+           Has the audio player decode the audio files of the item at
+          the index in the Audio combobox and the items following it
+          so that playing them, e.g. with step_through_audio, doesn't
+          wait on loading and decoding the file.
+        """
+        audio_ids = self.audio_list_cbo.records.ids
+        if index < 0 or len(audio_ids) == 0:
+            return
+        count = min(hebrew_audio.PREFETCH_COUNT + 1, len(audio_ids))
+        audio_ids = [audio_ids[(index + i) % len(audio_ids)]
+                     for i in range(count)]
+
+        def prefetch_files(audio_files):
+            audio_player.prefetch([HEBREW_MEDIA + audio_files[audio_id]
+                                   for audio_id in audio_ids
+                                   if re.match('.*.(mp3|wav)',
+                                               audio_files.get(audio_id) or '')])
+
+        db_worker.submit(hebrew_repository.audio_files, audio_ids,
+                         on_done=prefetch_files,
+                         on_error=lambda err: display_sql_error(err,
+                                                                hebrew_repository.sql('audio', 'files')))
 
     #_____________________________________
     #        refresh_audio
     #_____________________________________
-    def refresh_audio(self, active_query=None):
+    @hebrew_trace.traced
+    def refresh_audio(self, active_query=None, on_done=None):
         """
           Refreshes the values in the Audio combobox by rerunning
          the SQL query specified by the active_query argument.
           If there is no active_query argument then all the values
          in the HEBREW_AUDIO table will be returned.
+          Since the query runs on the database worker, on_done is
+         called once the Audio combobox has been repopulated.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
         # Clear those widgets that aren't normally overwritten
         # by refreshing the Audio combobox
         self.new_english_entry.delete(0, 'end')
  
         if DEBUG:
-            current_function = sys._getframe().f_code.co_name
             called_function = 'get_audio_list'
-            msg = (f'{current_function} '
+            msg = ('refresh_audio '
                    f'sending following query to {called_function}:\n '
                    f'{active_query}')
             print('####################################################')
@@ -2825,21 +2920,221 @@ class AudioMgr():
             else:
                 print(msg)      
             print('####################################################')        
-        # Re-populate the Audio combobox
-        self.audio_list_cbo['values'] = self.get_audio_list(active_query)
-        
-        #  In case the active query was a search that returned 1 item and
-        # the next command was to delete that item, just retrieve all the
-        # items from the audio database.
-        if len(self.audio_list_cbo['values']) == 0:
-            self.audio_list_cbo['values'] = self.get_audio_list()
-            active_query = None
-        if not active_query:
+
+        def display_audio_list(records):
+            #  In case the active query was a search that returned 1 item and
+            # the next command was to delete that item, just retrieve all the
+            # items from the audio database.
+            if len(records) == 0 and active_query:
+                self.refresh_audio(on_done=on_done)
+                return
+            # Re-populate the Audio combobox
+            self.audio_list_cbo.set_records(records)
+            if not active_query:
+                self.select_audio(0)
+            if on_done:
+                on_done()
+
+        self.get_audio_list(active_query, on_done=display_audio_list)
+
+    #_____________________________________
+    #          search_as_typed
+    #_____________________________________
+    def search_as_typed(self):
+        """
+          Lists the audio matching the text in the Audio search box
+         once typing pauses. If the text only adds to the text of the
+         last search its matches are narrowed in memory, otherwise
+         the database is searched and any search still running for
+         earlier text is cancelled.
+        """
+        search = self.audio_search.get().strip()
+        if search == self.live_search:
+            return
+        self.live_search = search
+        self.search_generation += 1
+        generation = self.search_generation
+        if self.search_future is not None:
+            db_worker.cancel(self.search_future)
+            self.search_future = None
+        if not contains_text(search):
+            return
+
+        if self.audio_matches is not None and self.audio_matches.narrows(search):
+            self.display_matches(self.audio_matches.narrow(search))
+            return
+
+        def display_results(matches):
+            # Text typed since this search started has replaced it
+            if generation == self.search_generation:
+                self.search_future = None
+                self.display_matches(matches)
+
+        def search_failed(err):
+            #  A search is only cancelled once text typed since has
+            # replaced it, so the current search being interrupted is
+            # an error like any other.
+            if generation == self.search_generation:
+                self.search_future = None
+                display_sql_error(err, hebrew_db.audio_search_query(search)[0],
+                                  'search_as_typed')
+
+        self.search_future = db_worker.submit(hebrew_search.AudioMatches.query, search,
+                                              on_done=display_results,
+                                              on_error=search_failed)
+
+    #_____________________________________
+    #          display_matches
+    #_____________________________________
+    def display_matches(self, matches):
+        """
+          Lists the audio found by a live search and displays the
+         first one. When nothing matches the list is left as it is.
+        """
+        self.audio_matches = matches
+        if len(matches.records) > 0:
+            self.active_audio_query = hebrew_db.audio_search_query(matches.search)
+            self.audio_list_cbo.set_records(matches.records)
             self.audio_list_cbo.current(0)
             self.audio_list_cbo.event_generate("<<ComboboxSelected>>")
 
-        if DEBUG:
-            display_function_completion(current_function)
+    #_____________________________________
+    #           fuzzy_search
+    #_____________________________________
+    @hebrew_trace.traced
+    def fuzzy_search(self, search, on_empty=None):
+        """
+          Lists the audio whose English or Hebrew is spelled most like
+         the search, for when a search finds nothing, e.g. Hebrew typed
+         with more or fewer ו and י than the database's spelling.
+          The results are listed closest first. If there aren't any
+         on_empty is called.
+        """
+        version = self.audio_version
+
+        def find(connection, index):
+            if index is None:
+                index = hebrew_search.FuzzyIndex.query(connection)
+            return index, index.search(search)
+
+        def display_closest(result):
+            index, matches = result
+            #  Keep the index unless the audio changed while it was built
+            if version == self.audio_version:
+                self.fuzzy_index = index
+            if not matches:
+                if on_empty:
+                    on_empty()
+                return
+            print(f"No exact matches for '{search}', listing the closest spellings")
+            audio_ids = [audio_id for distance, audio_id, english in matches]
+            self.active_audio_query = (hebrew_repository.sql('audio', 'by_ids'),
+                                       (json.dumps(audio_ids),))
+            self.audio_list_cbo.set_records(
+                hebrew_widgets.AudioRecords(audio_ids,
+                                            (english for distance, audio_id, english
+                                             in matches)))
+            self.audio_list_cbo.current(0)
+            self.audio_list_cbo.event_generate("<<ComboboxSelected>>")
+
+        db_worker.submit(find, self.fuzzy_index, on_done=display_closest,
+                         on_error=lambda err: display_sql_error(err,
+                                                                hebrew_repository.sql('audio',
+                                                                                      'texts'),
+                                                                'fuzzy_search'))
+
+    #_____________________________________
+    #          get_completions
+    #_____________________________________
+    def get_completions(self):
+        """
+          Builds the trie of the words of every audio on the database
+         worker. Until it's built no completions are offered. If audio
+         were changed while it was built it's built again.
+        """
+        version = self.audio_version
+
+        def keep_completions(completions):
+            if version == self.audio_version:
+                self.completions = completions
+            else:
+                self.get_completions()
+
+        db_worker.submit(hebrew_search.CompletionTrie.query, on_done=keep_completions,
+                         on_error=lambda err: display_sql_error(err,
+                                                                hebrew_repository.sql('audio',
+                                                                                      'texts'),
+                                                                'get_completions'))
+
+    #_____________________________________
+    #             complete
+    #_____________________________________
+    def complete(self, word):
+        """
+          Returns the completions of a word being typed, the words of
+         the most audio first, without querying the database.
+        """
+        if self.completions is None:
+            return []
+        return self.completions.complete(word)
+
+    #_____________________________________
+    #           audio_changed
+    #_____________________________________
+    def audio_changed(self):
+        """
+          Discards the fuzzy search index and the matches of the last
+         search after audio are added, edited or deleted, so the next
+         search, even for the same text, goes to the database and the
+         fuzzy search index is rebuilt.
+        """
+        self.audio_version += 1
+        self.fuzzy_index = None
+        self.audio_matches = None
+        self.live_search = None
+
+    #_____________________________________
+    #            find_audio
+    #_____________________________________
+    def find_audio(self, audio_id):
+        """
+          Returns the index of the AUDIO_ID in the Audio combobox,
+         usually the selected audio, or -1 if it isn't listed.
+        """
+        index = self.audio_list_cbo.current()
+        records = self.audio_list_cbo.records
+        if 0 <= index < len(records) and records.ids[index] == audio_id:
+            return index
+        return records.index(audio_id)
+
+    #_____________________________________
+    #         lists_new_audio
+    #_____________________________________
+    def lists_new_audio(self, lesson_name):
+        """
+          True if a new audio in the lesson belongs in the Audio
+         combobox, i.e. it lists all the audio or that lesson.
+        """
+        if self.active_audio_query is None:
+            return False
+        query, params = self.active_audio_query
+        if query == hebrew_repository.sql('audio', 'all'):
+            return True
+        return (query == hebrew_repository.sql('audio', 'by_lesson') and
+                contains_text(lesson_name) and params[0] == lesson_name)
+
+    #_____________________________________
+    #           select_audio
+    #_____________________________________
+    def select_audio(self, index):
+        """
+          Displays the audio at the index in the Audio combobox
+         and retrieves its Hebrew text, audio file and webpages.
+        """
+        records = self.audio_list_cbo.records
+        if len(records) > 0:
+            self.audio_list_cbo.current(min(index, len(records) - 1))
+            self.audio_list_cbo.event_generate("<<ComboboxSelected>>")
 
     #_____________________________________
     #           remove_gender
@@ -2854,51 +3149,10 @@ class AudioMgr():
             string = string.rstrip('נ')
         return string.strip()
                 
-    #_____________________________________
-    #           remove_niqqud
-    #_____________________________________
-    def remove_niqqud(self, string):
-        """
-          Removes all the diacritical vowel marks from the Hebrew text.
-         Oddly enough, in the case of some websites, including the niqqud
-         doesn't enhance the accurracy of the search but actually throws
-         it off. The search either fails or returns some really weird results.
-        """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-        
-        niqqud = ['\u05B0','\u05B1','\u05B2','\u05B3','\u05B4',
-                  '\u05B5','\u05B6','\u05B7','\u05B8','\u05B9',
-                  '\u05BA','\u05BB','\u05BC','\u05BD','\u05C1',
-                  '\u05C2','\u05C4','\u05C5']
-
-        for n in niqqud:
-           string = string.replace(n,'')
-
-        # Also replace "שׁ" and "שׂ" with a "ש" which has no dot
-        # and "כּ" with "כ" and "פּ" with "פּ"
-        string = string.replace("שׁ","ש")
-        string = string.replace("שׂ","ש")
-        string = string.replace("כּ","כ")
-        string = string.replace("בּ","ב")
-        string = string.replace("פּ","פ")
-        
-        # Don't know why it doesn't delete the dot from a vav
-        # with a holam or a shuruk so make sure it's replaced.
-        string = string.replace("וֹ","ו")
-        string = string.replace("וּ","ו")
-        if DEBUG:
-            print(string)
-        
-        return string.strip()
-
-        if DEBUG:
-            display_function_completion(current_function)
-
     #_____________________________________
     #        remove_plural
     #_____________________________________
+    @hebrew_trace.traced
     def remove_plural(self, hebrew):
         """
            In some of the Hebrew entries in the Hebrew entry box
@@ -2911,10 +3165,6 @@ class AudioMgr():
           right parentheses, I test for all possibilities,
           i.e. (*), (*(, )*).
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-        
         # Left parenthesis search
         pl = re.compile(r'\(')
         # Right parenthesis search
@@ -2954,99 +3204,139 @@ class AudioMgr():
         else:
             return hebrew.strip()
 
-        if DEBUG:
-            display_function_completion(current_function)
-
 
     #_______________________________________________________________________________    
     #                                run_sql  
     #_______________________________________________________________________________  
 
+    @hebrew_trace.traced
     def run_sql(self, sql_stmt):
         """
-            Executes the SQL statement passed to it.
+            Executes the SQL statement passed to it and shows the rows
+          it returns in a ResultGrid. The rows are fetched a page at a
+          time as the grid is scrolled, so a query returning any number
+          of rows shows its first page straight away. The query can be
+          cancelled while it's running or fetching a page.
         """
         
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-        
-
-         
         print(sql_stmt)
-        try:
-            SQL.execute(sql_stmt)
-            rows =  SQL.fetchall()
-            if len(rows) > 0:
-                result_win = tix.Tk()
-                result_win.geometry(("%dx%d" % (1050,600)))
-
-                columns = rows[0].keys()
-                print('columns = {}'.format(columns))
-                #columns = ['ID','Amount','Debit Date','Store','Receipt', 'Bill', 'Check Number','Check Cleared Date']  
-                total_columns = len(columns)
-                hlist_options = 'hlist.width 100 hlist.height 30' +  \
-                    ' hlist.font -adobe-helvetica-bold-r-narrow--12-120' + \
-                    ' hlist.background {} hlist.foreground {}'.format(BG_HLIST, FG_HLIST)  + \
-                    ' hlist.selectMode extended hlist.columns %d hlist.header 1' % (total_columns,)
-
-              
-                result_win.tixHList = tix.ScrolledHList(result_win,options=hlist_options)
-                hlist = result_win.tixHList.hlist
-                
-                
-                
-                hlist = result_win.tixHList.hlist
-
-                for column_name in columns:
-                    header_number = columns.index(column_name)
-                    hlist.header_create(header_number, itemtype = tix.TEXT, text = column_name,
-                                        headerbackground = BG_HLIST)
-                    #column_width = get_column_width(column_name)
-                    column_width = 50
-                    hlist.column_width(header_number, chars = column_width)
-
-                    
-                result_win.tixHList.pack(expand=1,fill=tix.BOTH,
-                                          padx=10,pady=10,side=tix.TOP) 
 
-
-                for row_num, row in enumerate(rows):   
-                    hlist.add(row_num,itemtype=tix.TEXT,text=row[0])
-                    for col_num, column in enumerate(row):
-                        hlist.item_create(row_num,col_num,itemtype=tix.TEXT,text=column)
-                 
-                result_win.mainloop()
-            else:
+        #  The statement could change anything so forget
+        # the cached audio details.
+        audio_mgr.audio_details.invalidate()
+
+        pager = hebrew_workers.QueryPager(sql_stmt)
+        result_win = tk.Toplevel()
+        result_win.geometry(("%dx%d" % (RESULT_WIN_WIDTH, RESULT_WIN_HEIGHT)))
+        result_win.title(' '.join(sql_stmt.split())[:80])
+        result_win.configure(background=BG_COLOR)
+        ttk.Style(result_win).configure('Result.Treeview', background=BG_HLIST,
+                                        fieldbackground=BG_HLIST,
+                                        foreground=FG_HLIST)
+        status = tk.StringVar(value='Running...')
+        pending = None
+
+        def fetch_more():
+            nonlocal pending
+            status.set(f'{len(grid.records):,} rows fetched, fetching more...')
+            cancel_btn.configure(state=tk.NORMAL)
+            pending = db_worker.submit(pager.fetch, on_done=fetched,
+                                       on_error=failed)
+
+        def opened(result):
+            columns, rows, done = result
+            if not result_win.winfo_exists():
+                db_worker.submit(pager.close)
+            elif columns is None:
+                result_win.destroy()
+                messagebox.showinfo(title='SQL Statement Executed',
+                                    message=f'{pager.changed} rows changed in'
+                                            f' {pager.seconds * 1000:.1f} ms by'
+                                            f' SQL statement:\n{sql_stmt}')
+            elif not rows:
+                result_win.destroy()
                 title = 'No Rows Returned'
                 message = 'No rows returned for SQL statement: \n{} '\
                          .format(sql_stmt)
-                print(message, sql_stmt)
                 messagebox.showerror(title=title, message=message)
-                
-        except sqlite3.Error as err: 
-            title = 'SQLite3 Error'
-            message = 'SQL Error Message: \n{} '\
-                     .format(err.args[0]) + '\n' +\
-                     'for SQL statement:  \n {}'.format(sql_stmt)
-            display_sql_error(err, sql_stmt, function=None)
-            
+            else:
+                grid.set_columns(columns)
+                fetched((rows, done))
+
+        def fetched(result):
+            nonlocal pending
+            rows, done = result
+            pending = None
+            if not result_win.winfo_exists():
+                return
+            grid.add_rows(rows, done)
+            if pending is None:
+                cancel_btn.configure(state=tk.DISABLED)
+                status.set(f"{len(grid.records):,}{'' if done else '+'} rows"
+                           f" in {pager.seconds * 1000:.1f} ms")
+
+        def failed(err):
+            nonlocal pending
+            pending = None
+            db_worker.submit(pager.close)
+            if str(err) == 'interrupted':
+                stopped()
+            else:
+                result_win.destroy()
+                display_sql_error(err, sql_stmt, function=None)
+
+        def stopped():
+            if not result_win.winfo_exists():
+                return
+            cancel_btn.configure(state=tk.DISABLED)
+            status.set(f'Cancelled after {len(grid.records):,} rows'
+                       f' in {pager.seconds * 1000:.1f} ms')
+            grid.finish()
+
+        def cancel():
+            nonlocal pending
+            #  A page that hadn't started being fetched reports nothing
+            # when it's cancelled. The query runs on the pager's own
+            # connection, so one being fetched is interrupted there and
+            # fails as interrupted, as does a statement changing the
+            # database, which runs on the worker's.
+            if pending is None:
+                return
+            if pending.cancel():
+                pending = None
+                db_worker.submit(pager.close)
+                stopped()
+            else:
+                pager.interrupt()
+                db_worker.cancel(pending)
 
-        if DEBUG:
-            display_function_completion(current_function)
+        def close():
+            cancel()
+            db_worker.submit(pager.close)
+            result_win.destroy()
+
+        grid = hebrew_widgets.ResultGrid(result_win, more=fetch_more)
+        grid.tree.configure(style='Result.Treeview')
+        cancel_btn = tk.Button(result_win, text="Cancel",
+                               fg=FG_COLOR, bg=BG_COLOR, command=cancel)
+        result_win.protocol('WM_DELETE_WINDOW', close)
+
+        grid.pack(expand=1, fill=tk.BOTH, padx=10, pady=10, side=tk.TOP)
+        cancel_btn.pack(side=tk.RIGHT, padx=10, pady=(0, 10))
+        tk.Label(result_win, textvariable=status, fg=FG_COLOR,
+                 bg=BG_COLOR).pack(side=tk.LEFT, padx=10, pady=(0, 10))
+
+        pending = db_worker.submit(pager.open, on_done=opened, on_error=failed)
 
     #_____________________________________
     #        select_audio_file
     #_____________________________________
+    @hebrew_trace.traced
     def select_audio_file(self, event=None):
         """
             Opens a file dialog box to select an audio file for a new
           audio file or replace an audio file for an existing entry.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-            
         # Get the widget that triggered the event and its displayed text.
         widget = event.widget
         audio_file_name = widget.get()
@@ -3065,12 +3355,10 @@ class AudioMgr():
             print(audio_file_name)
         audio_mgr.audio_file.set(audio_file_name)
 
-        if DEBUG:
-            display_function_completion(current_function)
-
     #_____________________________________
     #       step_through_audio
     #_____________________________________
+    @hebrew_trace.traced
     def step_through_audio(self, event=None):
         """
            Each right-click of the mouse in the Audio list combobox entry box
@@ -3079,21 +3367,21 @@ class AudioMgr():
           combobox.
            When it reaches the end of the list it loops back to the beginning.
         """
-        if DEBUG:
-            current_function = sys._getframe().f_code.co_name
-            display_function(current_function)
-
-        
-        self.play_audio()
-        next_index = self.audio_index.get() + 1
-        if next_index < len(self.audio_list_cbo['values']):
-            self.audio_list_cbo.current(next_index)
+        def next_audio(completed):
+            next_index = self.audio_index.get() + 1
+            if next_index < len(self.audio_list_cbo.records):
+                self.select_audio(next_index)
+            else:
+                self.select_audio(0)
+
+        #  A right-click while the audio is still playing cuts it short
+        # and moves on to the next item. Otherwise step to the next item
+        # once the audio has finished so the item stays displayed while
+        # it's heard.
+        if audio_player.busy:
+            audio_player.interrupt()
         else:
-            self.audio_list_cbo.current(0)
-        self.audio_list_cbo.event_generate("<<ComboboxSelected>>")
-
-        if DEBUG:
-            display_function_completion(current_function)
+            self.play_audio(on_done=next_audio)
 
     #_____________________________________
     #       transliterate
@@ -3112,6 +3400,8 @@ class AudioMgr():
         Hebrew text that contains any niqqud leaves
         the English letter as is. It is NOT 
         transliterated.
+         Completions of the word being typed are then
+        offered from the words of the audio.
         """
         hebrew_char = {'a': 'א', 'b': 'ב', 'c': 'כ', 'd': 'ד',  
                        'e': 'ע', 'f': 'פ', 'g': 'ג', 'h': 'ה',
@@ -3124,17 +3414,23 @@ class AudioMgr():
                        'M': 'ם', 'N': 'ן', 'P': 'ף', 'X': 'ץ'									 
                       }
         entry_text =  self.hebrew.get()
-        print('Entry text = ', entry_text)
-        if not self.contains_niqqud(entry_text):
-            self.hebrew_text.delete(0, 'end')
-            for i, char in enumerate(entry_text):
-                if char in hebrew_char.keys():
-                    print('hebrew = ', i, hebrew_char[char])
-                    self.hebrew_text.insert(i, hebrew_char[char])
-                elif char in hebrew_char.values():
-                    self.hebrew_text.insert(i, char)
-                elif not bool(re.search('[a-zA-Z]', char)):
-                    self.hebrew_text.insert(i, char)
+        if DEBUG:
+            print('Entry text = ', entry_text)
+        if not hebrew_text.contains_niqqud(entry_text):
+            #  The text is only replaced if a letter was transliterated
+            # since replacing it calls this function again.
+            new_text = ''.join(hebrew_char[char] if char in hebrew_char.keys()
+                               else char for char in entry_text
+                               if char in hebrew_char.keys() or
+                                  char in hebrew_char.values() or
+                                  not bool(re.search('[a-zA-Z]', char)))
+            if new_text != entry_text:
+                cursor = self.hebrew_text.index('insert')
+                self.hebrew_text.delete(0, 'end')
+                self.hebrew_text.insert(0, new_text)
+                self.hebrew_text.icursor(min(cursor, len(new_text)))
+                return
+        self.hebrew_completions.refresh()
                     
 
 #############################
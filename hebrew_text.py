@@ -0,0 +1,192 @@
+"""
+   Text normalization shared by the Hebrew Studies app and the
+  SQLite functions registered on its database connections.
+
+"""
+
+import codecs
+import re
+import unicodedata
+
+# Hebrew final letters and the regular letters they're folded into
+FINAL_LETTERS = {'ך': 'כ', 'ם': 'מ', 'ן': 'נ', 'ף': 'פ', 'ץ': 'צ'}
+
+#  The niqqud, i.e. vowel points, dagesh, shin and sin dots, etc.,
+# removed from the Hebrew text displayed in the Audio frame.
+NIQQUD = ['\u05B0','\u05B1','\u05B2','\u05B3','\u05B4',
+          '\u05B5','\u05B6','\u05B7','\u05B8','\u05B9',
+          '\u05BA','\u05BB','\u05BC','\u05BD','\u05C1',
+          '\u05C2','\u05C4','\u05C5']
+
+#  Letters with a dot that some keyboards and websites produce as
+# a single Unicode presentation form rather than a letter followed
+# by a dagesh or shin dot.
+DOTTED_LETTERS = {'\uFB2A': 'ש', '\uFB2B': 'ש', '\uFB3B': 'כ',
+                  '\uFB31': 'ב', '\uFB44': 'פ', '\uFB4B': 'ו',
+                  '\uFB35': 'ו'}
+
+
+#_____________________________________
+#        _build_niqqud_table
+#_____________________________________
+def _build_niqqud_table():
+    """
+       Builds the str.translate table used by remove_niqqud. The
+      niqqud are deleted and the dotted letters replaced by plain
+      letters. Every other character below the Hebrew presentation
+      forms maps to itself since a hit in the table is much faster
+      than the lookup error str.translate handles for a miss.
+    """
+    table = {code: code for code in range(0x0600)}
+    for n in NIQQUD:
+        table[ord(n)] = None
+    for dotted, plain in DOTTED_LETTERS.items():
+        table[ord(dotted)] = plain
+    return table
+
+_NIQQUD_TABLE = _build_niqqud_table()
+_NIQQUD_RE = re.compile('[' + ''.join(NIQQUD) + ''.join(DOTTED_LETTERS) + ']')
+
+#  Separates the values of a column joined into one string by
+# remove_niqqud_column. It never appears in the database text.
+_COLUMN_SEPARATOR = '\x00'
+
+#  The characters remove_niqqud_column handles in bulk: ASCII, the
+# Hebrew block, the dotted letters and the spaces, dashes, quotes and
+# direction marks found alongside them. There must be at most 256.
+_BULK_CHARACTERS = (''.join(map(chr, range(0x80))) +
+                    ''.join(map(chr, range(0x0591, 0x05F5))) +
+                    ''.join(DOTTED_LETTERS) +
+                    '\u00A0\u2013\u2014\u2018\u2019\u201C\u201D'
+                    '\u2026\u200E\u200F\u3000\uFEFF')
+
+
+#_____________________________________
+#         _build_bulk_codec
+#_____________________________________
+def _build_bulk_codec():
+    """
+       Builds the single byte character map used by
+      remove_niqqud_column, in which each of the _BULK_CHARACTERS is
+      one byte, and the bytes.translate table and deleted bytes that
+      remove the niqqud from text encoded with it.
+       Returns (decoding table, encoding map, table, niqqud bytes).
+    """
+    decoding = _BULK_CHARACTERS.ljust(256, '\uFFFE')
+    codes = {character: code for code, character in enumerate(_BULK_CHARACTERS)}
+    table = bytearray(range(256))
+    for dotted, plain in DOTTED_LETTERS.items():
+        table[codes[dotted]] = codes[plain]
+    niqqud = bytes(codes[n] for n in NIQQUD)
+    return decoding, codecs.charmap_build(decoding), bytes(table), niqqud
+
+_BULK_DECODING, _BULK_ENCODING, _BULK_TABLE, _BULK_NIQQUD = _build_bulk_codec()
+
+
+#_____________________________________
+#       _build_search_key_table
+#_____________________________________
+def _build_search_key_table():
+    """
+       Builds the str.translate table used by search_key. Every
+      combining mark in the Latin and Hebrew ranges is deleted and
+      the Hebrew final letters are replaced by their regular forms.
+    """
+    table = {}
+    for code in list(range(0x0300, 0x0370)) + list(range(0x0591, 0x05C8)):
+        if unicodedata.category(chr(code)) == 'Mn':
+            table[code] = None
+    for final, regular in FINAL_LETTERS.items():
+        table[ord(final)] = regular
+    return table
+
+_SEARCH_KEY_TABLE = _build_search_key_table()
+
+
+#_____________________________________
+#           contains_niqqud
+#_____________________________________
+def contains_niqqud(string):
+    """
+      Detects the presence of niqqud in the Hebrew text
+    """
+    return _NIQQUD_RE.search(string) is not None
+
+
+#_____________________________________
+#            remove_niqqud
+#_____________________________________
+def remove_niqqud(string):
+    """
+       Removes all the diacritical vowel marks from the Hebrew text
+      and replaces the dotted presentation forms of shin, sin, kaf,
+      bet, pe and vav with the plain letters.
+       Oddly enough, in the case of some websites, including the
+      niqqud doesn't enhance the accuracy of the search but actually
+      throws it off.
+    """
+    if string is None:
+        return None
+    return string.translate(_NIQQUD_TABLE).strip()
+
+
+#_____________________________________
+#         remove_niqqud_column
+#_____________________________________
+def remove_niqqud_column(column):
+    """
+       Removes the niqqud from every value in a column of text, e.g.
+      the HEBREW column of the HEBREW_AUDIO table, and returns them
+      as a list in the same order. None values stay None.
+       The values are joined into one string, encoded a byte per
+      character, stripped of the niqqud by a single bytes.translate
+      and decoded, all in C, rather than making a Python call per
+      value. A column with text outside the _BULK_CHARACTERS is done
+      a value at a time by remove_niqqud.
+    """
+    values = list(column)
+    joined = _COLUMN_SEPARATOR.join(['' if value is None else value
+                                     for value in values])
+    try:
+        encoded = codecs.charmap_encode(joined, 'strict', _BULK_ENCODING)[0]
+    except UnicodeEncodeError:
+        return [remove_niqqud(value) for value in values]
+    joined = codecs.charmap_decode(encoded.translate(_BULK_TABLE, _BULK_NIQQUD),
+                                   'strict', _BULK_DECODING)[0]
+    return [None if value is None else text.strip()
+            for value, text in zip(values, joined.split(_COLUMN_SEPARATOR))]
+
+
+#_____________________________________
+#             search_key
+#_____________________________________
+def search_key(text):
+    """
+       Returns the canonical form of the text used to compare Hebrew
+      and English search text regardless of how it was typed:
+         - presentation forms such as 'שׁ' are split into the letter
+           and its mark and non-breaking spaces become plain spaces
+         - all niqqud, dagesh, shin/sin dots and cantillation marks
+           are removed
+         - final letters are folded into regular letters, e.g. ם → מ
+         - English is lowercased
+         - runs of white space are collapsed into a single space
+       The keys are kept in the HEBREW_KEY, ENGLISH_KEY and TOPIC_KEY
+      columns, which are indexed, see hebrew_db.create_search_keys.
+    """
+    if text is None:
+        return None
+    text = unicodedata.normalize('NFKD', text).translate(_SEARCH_KEY_TABLE)
+    return ' '.join(text.casefold().split())
+
+
+#_____________________________________
+#            prefix_range
+#_____________________________________
+def prefix_range(key):
+    """
+       Returns the (low, high) bounds of every search key that starts
+      with the key so that a prefix search can be written as a range
+      over an index:  low <= key_column < high
+    """
+    return key, key + '\U0010FFFF'
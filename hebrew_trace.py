@@ -0,0 +1,212 @@
+"""
+   Tracing and profiling for the Hebrew Studies app.
+
+   A function decorated with traced is returned unchanged unless
+  tracing was enabled before it was defined, so tracing costs nothing
+  when it's off. When it's on, every call of a traced function and
+  every function run on the database worker is timed. The call count,
+  cumulative time and recent latencies of each are kept along with a
+  ring buffer of the most recent RING_SIZE events, which dump prints.
+   Tracing is enabled by setting the HEBREW_STUDIES_TRACE environment
+  variable, or by calling enable() before the traced modules are
+  imported. on_enter and on_exit, if set, are called with the name of
+  every traced function as it starts and finishes, e.g. to print the
+  program flow.
+
+   Usage:
+       HEBREW_STUDIES_TRACE=1 python hebrew_studies.py
+
+       @hebrew_trace.traced
+       def get_lessons(self):
+           ...
+
+       hebrew_trace.record('sql', 'SELECT ...', seconds, rows)
+       hebrew_trace.dump()
+
+"""
+
+import collections
+import functools
+import math
+import os
+import sys
+import threading
+import time
+
+ENABLED = os.environ.get('HEBREW_STUDIES_TRACE', '') not in ('', '0')
+
+#  Number of events kept in the ring buffer and of the latest
+# latencies of each function kept to work out its percentiles.
+RING_SIZE = 10000
+SAMPLES = 1000
+
+# Longest name of a function or SQL statement printed by dump
+NAME_WIDTH = 60
+
+#  Called with the name of each traced function as it starts
+# and finishes.
+on_enter = None
+on_exit = None
+
+#  (time, kind, name, seconds, rows) of the latest events and the
+# Timings of each (kind, name). Events are recorded by both the Tk
+# main loop and the database worker.
+events = collections.deque(maxlen=RING_SIZE)
+timings = {}
+_lock = threading.Lock()
+
+
+#====================================================================
+#                             Timings
+#====================================================================
+class Timings():
+    """
+       The number of calls of a function or SQL statement, their
+      cumulative time and rows, and the latencies of the latest
+      SAMPLES calls.
+    """
+    __slots__ = ('calls', 'seconds', 'rows', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.samples = collections.deque(maxlen=SAMPLES)
+
+    #_____________________________________
+    #             percentile
+    #_____________________________________
+    def percentile(self, fraction):
+        """
+           Returns the latency the fraction of the latest calls
+          took no longer than, e.g. percentile(.95) for the p95.
+        """
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, math.ceil(fraction * len(samples)) - 1)]
+
+
+#_____________________________________
+#              enable
+#_____________________________________
+def enable(enabled=True):
+    """
+       Turns tracing on or off for the functions defined from now on.
+      Functions already decorated keep whatever traced made them.
+    """
+    global ENABLED
+    ENABLED = enabled
+
+
+#_____________________________________
+#              record
+#_____________________________________
+def record(kind, name, seconds, rows=None):
+    """
+       Records an event, e.g. a 'call' of a function or an 'sql'
+      statement, that took seconds and returned rows.
+    """
+    with _lock:
+        events.append((time.time(), kind, name, seconds, rows))
+        entry = timings.get((kind, name))
+        if entry is None:
+            entry = timings[kind, name] = Timings()
+        entry.calls += 1
+        entry.seconds += seconds
+        entry.rows += rows or 0
+        entry.samples.append(seconds)
+
+
+#_____________________________________
+#              traced
+#_____________________________________
+def traced(function):
+    """
+       Decorator that times every call of the function when tracing
+      is enabled and otherwise returns the function itself.
+    """
+    if not ENABLED:
+        return function
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def trace(*args, **kwargs):
+        if on_enter:
+            on_enter(name)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record('call', name, time.perf_counter() - start)
+            if on_exit:
+                on_exit(name)
+    return trace
+
+
+#_____________________________________
+#              summary
+#_____________________________________
+def summary(kind=None):
+    """
+       Returns (kind, name, Timings) for every function and statement
+      recorded, or just those of one kind, the most time first.
+    """
+    with _lock:
+        found = [(entry_kind, name, entry)
+                 for (entry_kind, name), entry in timings.items()
+                 if kind is None or entry_kind == kind]
+    return sorted(found, key=lambda item: -item[2].seconds)
+
+
+#_____________________________________
+#               dump
+#_____________________________________
+def dump(file=None, last=50):
+    """
+       Prints the call count, cumulative, mean and p95 latency of
+      everything recorded followed by the last events in the ring
+      buffer.
+    """
+    file = file or sys.stdout
+    print(f"{'kind':<5} {'name':<{NAME_WIDTH}} {'calls':>7} {'total ms':>10}"
+          f" {'mean ms':>9} {'p95 ms':>9} {'rows':>8}", file=file)
+    for kind, name, entry in summary():
+        print(f'{kind:<5} {shorten(name):<{NAME_WIDTH}} {entry.calls:>7}'
+              f' {entry.seconds * 1000:>10.2f}'
+              f' {entry.seconds / entry.calls * 1000:>9.3f}'
+              f' {entry.percentile(.95) * 1000:>9.3f} {entry.rows:>8}', file=file)
+    with _lock:
+        latest = list(events)[-last:]
+    if latest:
+        print(f'\nLast {len(latest)} of {len(events)} events:', file=file)
+    for when, kind, name, seconds, rows in latest:
+        print(f"{time.strftime('%H:%M:%S', time.localtime(when))}"
+              f" {kind:<5} {shorten(name):<{NAME_WIDTH}} {seconds * 1000:>9.3f} ms"
+              f"{'' if rows is None else f'  {rows} rows'}", file=file)
+
+
+#_____________________________________
+#              shorten
+#_____________________________________
+def shorten(name):
+    """
+       Returns the name, e.g. an SQL statement, on one line and no
+      longer than NAME_WIDTH.
+    """
+    name = ' '.join(name.split())
+    if len(name) > NAME_WIDTH:
+        name = name[:NAME_WIDTH - 3] + '...'
+    return name
+
+
+#_____________________________________
+#              reset
+#_____________________________________
+def reset():
+    """
+       Forgets everything recorded.
+    """
+    with _lock:
+        events.clear()
+        timings.clear()
@@ -0,0 +1,968 @@
+"""
+   Widgets for the Hebrew Studies app.
+
+   The Audio list used to be a ttk.Combobox whose values were every
+  row of the active query formatted as 'english      | audio_id'.
+  Assigning the values made Tk copy and re-tokenize the whole list and
+  the AUDIO_ID was parsed back out of the text with split('|').
+   The VirtualCombobox looks and behaves like a ttk.Combobox but its
+  dropdown list is drawn from an AudioRecords model, a compact array of
+  (AUDIO_ID, English) records, and only the rows that can be seen are
+  ever handed to Tk. Giving it a new list takes the same time however
+  long the list is and the AUDIO_ID is never part of the displayed text.
+   Saving, adding or deleting an audio patches the records in place.
+  When the records are in order, e.g. by their English, the position
+  of a new or edited record is found with a binary search so the list
+  never has to be queried again.
+   A CompletionList offers completions of the word being typed in an
+  entry box in a small list below it. The entry keeps the focus so
+  typing carries on while the list is open.
+   A ToolTip shows a short message below a widget when the pointer
+  rests on it, in place of the tix Balloon, so the app no longer needs
+  the deprecated Tix extension loaded into Tk at start up.
+   A ResultGrid shows the rows of an SQL query in the same way, only
+  the rows in view are ever in the Treeview, and asks for more rows
+  as it's scrolled towards the last of those fetched.
+
+"""
+
+import array
+import bisect
+import re
+import tkinter as tk
+import tkinter.ttk as ttk
+
+# Number of rows shown in the dropdown list
+VISIBLE_ROWS = 20
+
+# The letters of the word before the insertion cursor
+_WORD_END_RE = re.compile(r'\w+\Z')
+
+#  Milliseconds the pointer has to rest on a widget before its
+# ToolTip is shown, and the look of the tip.
+TOOL_TIP_DELAY = 500
+TOOL_TIP_FONT = 'Helvetica 10 italic'
+TOOL_TIP_BACKGROUND = '#ffff99'
+
+#  Number of rows shown by a ResultGrid, the width of its columns
+# in pixels and the most characters of a value it shows.
+RESULT_ROWS = 25
+RESULT_COLUMN_WIDTH = 160
+RESULT_CELL_CHARS = 200
+
+
+#_____________________________________
+#            by_english
+#_____________________________________
+def by_english(english):
+    """
+       The sort key of records in the order of their English,
+      i.e. the order of a query's ORDER BY english.
+    """
+    return english
+
+
+#====================================================================
+#                          AudioRecords
+#====================================================================
+class AudioRecords():
+    """
+       The (AUDIO_ID, English) records listed in the Audio combobox,
+      held as a typed array of the IDs and a parallel list of the
+      English, which is all the dropdown needs to display a row. The
+      Topics combobox lists (URL_ID, topic) records the same way.
+       The records are built on the database worker by query() so the
+      Tk main loop never formats or parses the rows.
+       key is the sort key of the English the records are kept in
+      order by, or None if they're in some other order, e.g. best
+      search match first, in which case new records are appended.
+      The key of each record is kept in a third parallel list, keys,
+      which is what a new or edited record's place is bisected in.
+    """
+    __slots__ = ('ids', 'english', 'key', 'keys')
+
+    def __init__(self, ids=(), english=(), key=None, keys=None):
+        self.ids = array.array('q', ids)
+        self.english = list(english)
+        self.key = key
+        self.keys = None
+        if key is not None:
+            self.keys = list(map(key, self.english)) if keys is None else list(keys)
+
+    #_____________________________________
+    #               query
+    #_____________________________________
+    @classmethod
+    def query(cls, connection, sql_stmt, params=(), key=None):
+        """
+           Returns the records of the rows of a query that selects
+          the ENGLISH and AUDIO_ID columns. Without a key they're in
+          the query's order. Rows the query orders by English are
+          already in by_english order, for any other key they're
+          sorted by it.
+        """
+        rows = connection.execute(sql_stmt, params).fetchall()
+        records = cls((row['audio_id'] for row in rows),
+                      (row['english'] for row in rows), key)
+        if key is None or key is by_english:
+            return records
+        return records.sorted(key)
+
+    #_____________________________________
+    #             __len__
+    #_____________________________________
+    def __len__(self):
+        return len(self.ids)
+
+    #_____________________________________
+    #           __getitem__
+    #_____________________________________
+    def __getitem__(self, index):
+        """
+           Returns the (AUDIO_ID, English) record at the index.
+        """
+        return self.ids[index], self.english[index]
+
+    #_____________________________________
+    #               index
+    #_____________________________________
+    def index(self, audio_id):
+        """
+           Returns the position of the AUDIO_ID in the records or -1
+          if it isn't there.
+        """
+        try:
+            return self.ids.index(int(audio_id))
+        except ValueError:
+            return -1
+
+    #_____________________________________
+    #               find
+    #_____________________________________
+    def find(self, audio_id, english):
+        """
+           Returns the position of the record with the AUDIO_ID and
+          English, or -1 if it isn't there. Records in order by a key
+          are found with a binary search for the English, any others,
+          or one whose English has changed, by their AUDIO_ID.
+        """
+        audio_id = int(audio_id)
+        if self.key is not None:
+            key = self.key(english)
+            index = bisect.bisect_left(self.keys, key)
+            while index < len(self.ids) and self.keys[index] == key:
+                if self.ids[index] == audio_id:
+                    return index
+                index += 1
+        return self.index(audio_id)
+
+    #_____________________________________
+    #              sorted
+    #_____________________________________
+    def sorted(self, key):
+        """
+           Returns a copy of the records sorted by key(english).
+        """
+        keys = list(map(key, self.english))
+        order = sorted(range(len(self.ids)), key=keys.__getitem__)
+        return AudioRecords((self.ids[i] for i in order),
+                            (self.english[i] for i in order), key,
+                            (keys[i] for i in order))
+
+    #_____________________________________
+    #             position
+    #_____________________________________
+    def position(self, english):
+        """
+           Returns the index a record with the English belongs at,
+          after any with the same key, found by a binary search.
+          Records that aren't in order by a key go at the end.
+        """
+        if self.key is None:
+            return len(self.ids)
+        return bisect.bisect_right(self.keys, self.key(english))
+
+    #_____________________________________
+    #              insert
+    #_____________________________________
+    def insert(self, audio_id, english):
+        """
+           Inserts a record in its place and returns its index.
+        """
+        index = self.position(english)
+        self.ids.insert(index, int(audio_id))
+        self.english.insert(index, english)
+        if self.keys is not None:
+            self.keys.insert(index, self.key(english))
+        return index
+
+    #_____________________________________
+    #              update
+    #_____________________________________
+    def update(self, index, english):
+        """
+           Changes the English of the record at the index, moving it
+          to its new place if the records are in order, and returns
+          its new index.
+        """
+        if self.key is None:
+            self.english[index] = english
+            return index
+        audio_id = self.ids[index]
+        self.delete(index)
+        return self.insert(audio_id, english)
+
+    #_____________________________________
+    #              delete
+    #_____________________________________
+    def delete(self, index):
+        """
+           Removes the record at the index.
+        """
+        del self.ids[index]
+        del self.english[index]
+        if self.keys is not None:
+            del self.keys[index]
+
+
+#====================================================================
+#                         VirtualCombobox
+#====================================================================
+class VirtualCombobox(ttk.Combobox):
+    """
+       A ttk.Combobox whose dropdown list shows the records of an
+      AudioRecords model rather than its values option. The dropdown
+      is a Listbox that only ever holds the VISIBLE_ROWS records in
+      view, refilled as it's scrolled.
+       The entry shows just the English of the selected record and can
+      still be edited. current() and selected_id() keep returning the
+      selected record after its text is edited. Selecting a record
+      generates <<ComboboxSelected>> just like a ttk.Combobox.
+    """
+    def __init__(self, master=None, rows=VISIBLE_ROWS, **options):
+        super().__init__(master, **options)
+        self.records = AudioRecords()
+        self.selected = -1
+        self.rows = rows
+        self.top = 0
+        self.active = 0
+        self.popup = None
+        self.listbox = None
+        self.scrollbar = None
+        #  Open our own dropdown instead of the ttk one
+        self.bind('<Button-1>', self.press)
+        self.bind('<Down>', self.post)
+
+    #_____________________________________
+    #           set_records
+    #_____________________________________
+    def set_records(self, records):
+        """
+           Lists the records. Only the records in view, if the
+          dropdown is open, are passed to Tk so this takes the same
+          time however many records there are.
+        """
+        self.records = records
+        self.selected = -1
+        self.top = self.active = 0
+        if self.is_posted():
+            self.show()
+
+    #_____________________________________
+    #           insert_record
+    #_____________________________________
+    def insert_record(self, audio_id, english):
+        """
+           Adds a record to the list in its place and returns its
+          index. The selected record stays selected.
+        """
+        index = self.records.insert(audio_id, english)
+        if self.selected >= index:
+            self.selected += 1
+        self.patched()
+        return index
+
+    #_____________________________________
+    #           update_record
+    #_____________________________________
+    def update_record(self, index, english):
+        """
+           Changes the English of the record at the index, moving it
+          to its new place, and returns its new index. The selected
+          record stays selected.
+        """
+        new_index = self.records.update(index, english)
+        if self.selected == index:
+            self.selected = new_index
+        elif index < self.selected <= new_index:
+            self.selected -= 1
+        elif new_index <= self.selected < index:
+            self.selected += 1
+        self.patched()
+        return new_index
+
+    #_____________________________________
+    #           delete_record
+    #_____________________________________
+    def delete_record(self, index):
+        """
+           Removes the record at the index from the list. If it was
+          the selected record nothing is selected.
+        """
+        self.records.delete(index)
+        if self.selected == index:
+            self.selected = -1
+        elif self.selected > index:
+            self.selected -= 1
+        self.patched()
+
+    #_____________________________________
+    #              patched
+    #_____________________________________
+    def patched(self):
+        """
+           Redraws the dropdown, if it's open, after the records
+          have been changed.
+        """
+        self.active = max(self.selected, 0)
+        if self.is_posted():
+            self.show()
+
+    #_____________________________________
+    #              current
+    #_____________________________________
+    def current(self, newindex=None):
+        """
+           Selects the record at newindex and displays its English or,
+          without a newindex, returns the index of the selected record
+          or -1 if there isn't one.
+        """
+        if newindex is None:
+            return self.selected
+        self.selected = self.active = newindex
+        super().set(self.records.english[newindex])
+        return None
+
+    #_____________________________________
+    #                set
+    #_____________________________________
+    def set(self, value):
+        """
+           Displays the text and deselects the current record.
+        """
+        self.selected = -1
+        super().set(value)
+
+    #_____________________________________
+    #            selected_id
+    #_____________________________________
+    def selected_id(self):
+        """
+           Returns the AUDIO_ID of the selected record or None.
+        """
+        if 0 <= self.selected < len(self.records):
+            return self.records.ids[self.selected]
+        return None
+
+    #_____________________________________
+    #               press
+    #_____________________________________
+    def press(self, event):
+        """
+           Opens or closes the dropdown when the arrow is clicked.
+          Clicks in the text are left to the entry.
+        """
+        if 'arrow' not in self.identify(event.x, event.y):
+            return None
+        if self.is_posted():
+            self.unpost()
+        else:
+            self.post()
+        return 'break'
+
+    #_____________________________________
+    #             is_posted
+    #_____________________________________
+    def is_posted(self):
+        """
+           True while the dropdown is open.
+        """
+        return self.popup is not None and self.popup.winfo_ismapped()
+
+    #_____________________________________
+    #               post
+    #_____________________________________
+    def post(self, event=None):
+        """
+           Opens the dropdown below the entry, scrolled so the selected
+          record is in view.
+        """
+        if len(self.records) == 0:
+            return 'break'
+        if self.popup is None:
+            self.create_popup()
+        self.active = max(self.selected, 0)
+        self.top = self.active - self.rows // 2
+        self.listbox.configure(width=self['width'])
+        self.show()
+        self.popup.geometry(f'+{self.winfo_rootx()}'
+                            f'+{self.winfo_rooty() + self.winfo_height()}')
+        self.popup.deiconify()
+        self.popup.lift()
+        self.listbox.focus_set()
+        self.popup.grab_set()
+        return 'break'
+
+    #_____________________________________
+    #              unpost
+    #_____________________________________
+    def unpost(self, event=None):
+        """
+           Closes the dropdown.
+        """
+        if self.is_posted():
+            self.popup.grab_release()
+            self.popup.withdraw()
+            self.focus_set()
+        return 'break'
+
+    #_____________________________________
+    #           create_popup
+    #_____________________________________
+    def create_popup(self):
+        """
+           Creates the dropdown, a borderless window holding a Listbox
+          of VISIBLE_ROWS rows and a scrollbar that spans all the
+          records.
+        """
+        self.popup = tk.Toplevel(self)
+        self.popup.withdraw()
+        self.popup.overrideredirect(True)
+        self.listbox = tk.Listbox(self.popup, height=self.rows,
+                                  activestyle='none', exportselection=False,
+                                  selectmode='browse')
+        self.scrollbar = ttk.Scrollbar(self.popup, orient='vertical',
+                                       command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.listbox.pack(side='left', fill='both', expand=True)
+
+        self.listbox.bind('<ButtonRelease-1>',
+                          lambda event: self.choose(self.top +
+                                                    self.listbox.nearest(event.y)))
+        self.listbox.bind('<Return>', lambda event: self.choose(self.active))
+        self.listbox.bind('<Escape>', self.unpost)
+        self.listbox.bind('<Up>', lambda event: self.move(-1))
+        self.listbox.bind('<Down>', lambda event: self.move(1))
+        self.listbox.bind('<Prior>', lambda event: self.move(-self.rows))
+        self.listbox.bind('<Next>', lambda event: self.move(self.rows))
+        self.listbox.bind('<MouseWheel>',
+                          lambda event: self.yview('scroll',
+                                                   -3 if event.delta > 0 else 3,
+                                                   'units'))
+        self.listbox.bind('<Button-4>', lambda event: self.yview('scroll', -3, 'units'))
+        self.listbox.bind('<Button-5>', lambda event: self.yview('scroll', 3, 'units'))
+        #  While the dropdown has the grab a click anywhere outside
+        # it is reported to the popup window itself.
+        self.popup.bind('<Button-1>', self.click_outside)
+
+    #_____________________________________
+    #               show
+    #_____________________________________
+    def show(self):
+        """
+           Fills the Listbox with the records in view and sets the
+          scrollbar to their position in the whole list.
+        """
+        count = len(self.records)
+        self.top = max(0, min(self.top, count - self.rows))
+        visible = self.records.english[self.top:self.top + self.rows]
+        self.listbox.delete(0, 'end')
+        if visible:
+            self.listbox.insert('end', *visible)
+        if self.top <= self.active < self.top + len(visible):
+            self.listbox.selection_set(self.active - self.top)
+        if count:
+            self.scrollbar.set(self.top / count,
+                               (self.top + len(visible)) / count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    #_____________________________________
+    #               yview
+    #_____________________________________
+    def yview(self, *args):
+        """
+           Scrolls the dropdown. Called by the scrollbar with either
+          'moveto' fraction or 'scroll' number 'units' or 'pages'.
+        """
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.records))
+        elif args[0] == 'scroll':
+            step = self.rows if args[2] == 'pages' else 1
+            self.top += int(args[1]) * step
+        self.show()
+        return 'break'
+
+    #_____________________________________
+    #               move
+    #_____________________________________
+    def move(self, step):
+        """
+           Moves the highlighted record by step, scrolling to keep
+          it in view.
+        """
+        self.active = max(0, min(self.active + step, len(self.records) - 1))
+        if self.active < self.top:
+            self.top = self.active
+        elif self.active >= self.top + self.rows:
+            self.top = self.active - self.rows + 1
+        self.show()
+        return 'break'
+
+    #_____________________________________
+    #              choose
+    #_____________________________________
+    def choose(self, index):
+        """
+           Selects the record, closes the dropdown and generates
+          <<ComboboxSelected>>.
+        """
+        self.unpost()
+        if 0 <= index < len(self.records):
+            self.current(index)
+            self.event_generate('<<ComboboxSelected>>')
+        return 'break'
+
+    #_____________________________________
+    #          click_outside
+    #_____________________________________
+    def click_outside(self, event):
+        """
+           Closes the dropdown if the click was outside it.
+        """
+        if event.widget is self.popup and not (
+                0 <= event.x < self.popup.winfo_width() and
+                0 <= event.y < self.popup.winfo_height()):
+            self.unpost()
+
+
+#====================================================================
+#                            CompletionList
+#====================================================================
+class CompletionList():
+    """
+       Offers completions of the word before the insertion cursor of
+      an Entry in a borderless list below it. complete is called with
+      the word and returns the completions, best first.
+       The entry keeps the focus while the list is open: <Down> and
+      <Up> highlight a completion, <Return> or <Tab> replaces the word
+      with the highlighted one, as does clicking a completion, and
+      <Escape> closes the list.
+    """
+    def __init__(self, entry, complete):
+        self.entry = entry
+        self.complete = complete
+        self.popup = None
+        self.listbox = None
+        self.words = []
+        self.active = -1
+        self.pending = None
+        self.entry.bind('<Down>', lambda event: self.move(1), add='+')
+        self.entry.bind('<Up>', lambda event: self.move(-1), add='+')
+        self.entry.bind('<Return>', self.choose_active, add='+')
+        self.entry.bind('<Tab>', self.choose_active, add='+')
+        self.entry.bind('<Escape>', self.hide, add='+')
+        #  Clicking a completion takes the focus from the entry
+        # so the list is only closed once the click is handled.
+        self.entry.bind('<FocusOut>',
+                        lambda event: self.entry.after(100, self.hide), add='+')
+
+    #_____________________________________
+    #              refresh
+    #_____________________________________
+    def refresh(self, *args):
+        """
+           Offers the completions of the word once the entry's text
+          has settled, so a text changed several times by one key,
+          e.g. by transliterate, is only completed once. Can be used
+          as a StringVar trace.
+        """
+        if self.pending is not None:
+            self.entry.after_cancel(self.pending)
+        self.pending = self.entry.after_idle(self.offer)
+
+    #_____________________________________
+    #               word
+    #_____________________________________
+    def word(self):
+        """
+           Returns the index where the word before the insertion
+          cursor starts and the word.
+        """
+        cursor = self.entry.index('insert')
+        match = _WORD_END_RE.search(self.entry.get()[:cursor])
+        if match is None:
+            return cursor, ''
+        return match.start(), match.group()
+
+    #_____________________________________
+    #               offer
+    #_____________________________________
+    def offer(self):
+        """
+           Shows the completions of the word before the insertion
+          cursor, if there are any and the entry has the focus.
+        """
+        self.pending = None
+        start, word = self.word()
+        words = self.complete(word) if word else []
+        if not words or self.entry.focus_get() is not self.entry:
+            self.hide()
+            return
+        if self.popup is None:
+            self.create_popup()
+        self.words = words
+        self.active = -1
+        self.listbox.delete(0, 'end')
+        self.listbox.insert('end', *words)
+        self.listbox.configure(height=len(words))
+        self.popup.geometry(f'+{self.entry.winfo_rootx()}'
+                            f'+{self.entry.winfo_rooty() + self.entry.winfo_height()}')
+        self.popup.deiconify()
+        self.popup.lift()
+
+    #_____________________________________
+    #           create_popup
+    #_____________________________________
+    def create_popup(self):
+        """
+           Creates the list, a borderless window holding a Listbox
+          that never takes the focus from the entry.
+        """
+        self.popup = tk.Toplevel(self.entry)
+        self.popup.withdraw()
+        self.popup.overrideredirect(True)
+        self.listbox = tk.Listbox(self.popup, activestyle='none',
+                                  exportselection=False, takefocus=0,
+                                  font=self.entry['font'])
+        self.listbox.pack(fill='both', expand=True)
+        #  Handled here rather than by the Listbox bindings, which
+        # would move the focus to it and close the list.
+        self.listbox.bind('<Button-1>',
+                          lambda event: self.choose(self.listbox.nearest(event.y)))
+
+    #_____________________________________
+    #             is_shown
+    #_____________________________________
+    def is_shown(self):
+        """
+           True while the list is open.
+        """
+        return self.popup is not None and self.popup.winfo_ismapped()
+
+    #_____________________________________
+    #               hide
+    #_____________________________________
+    def hide(self, event=None):
+        """
+           Closes the list. <Escape> is left to the entry unless it
+          closed it.
+        """
+        if not self.is_shown():
+            return None
+        self.popup.withdraw()
+        self.words = []
+        self.active = -1
+        return 'break' if event is not None else None
+
+    #_____________________________________
+    #               move
+    #_____________________________________
+    def move(self, step):
+        """
+           Moves the highlight by step. The keys are left to the
+          entry while the list is closed.
+        """
+        if not self.is_shown():
+            return None
+        self.active = max(0, min(self.active + step, len(self.words) - 1))
+        self.listbox.selection_clear(0, 'end')
+        self.listbox.selection_set(self.active)
+        return 'break'
+
+    #_____________________________________
+    #           choose_active
+    #_____________________________________
+    def choose_active(self, event=None):
+        """
+           Chooses the highlighted completion, if there is one.
+        """
+        if not self.is_shown() or self.active < 0:
+            return None
+        return self.choose(self.active)
+
+    #_____________________________________
+    #              choose
+    #_____________________________________
+    def choose(self, index):
+        """
+           Replaces the word before the insertion cursor with the
+          completion at the index and closes the list.
+        """
+        words = self.words
+        self.hide()
+        if 0 <= index < len(words):
+            start, word = self.word()
+            self.entry.delete(start, 'insert')
+            self.entry.insert(start, words[index])
+            self.entry.icursor(start + len(words[index]))
+            #  Don't offer completions of the completion
+            if self.pending is not None:
+                self.entry.after_cancel(self.pending)
+                self.pending = None
+        return 'break'
+
+
+#====================================================================
+#                             ToolTip
+#====================================================================
+class ToolTip():
+    """
+       Shows the message bound to a widget in a small borderless
+      window below it once the pointer has rested on the widget for
+      TOOL_TIP_DELAY milliseconds, and hides it when the pointer
+      leaves or a button is pressed. The window is only created the
+      first time a tip is shown and is shared by every widget.
+       bind_widget takes the same balloonmsg option as the tix Balloon
+      it replaces.
+    """
+    def __init__(self, master, delay=TOOL_TIP_DELAY):
+        self.master = master
+        self.delay = delay
+        self.messages = {}
+        self.pending = None
+        self.popup = None
+        self.label = None
+
+    #_____________________________________
+    #           bind_widget
+    #_____________________________________
+    def bind_widget(self, widget, balloonmsg=''):
+        """
+           Shows balloonmsg whenever the pointer rests on the widget.
+        """
+        if widget not in self.messages:
+            widget.bind('<Enter>', self.schedule, add='+')
+            widget.bind('<Leave>', self.hide, add='+')
+            widget.bind('<ButtonPress>', self.hide, add='+')
+        self.messages[widget] = balloonmsg
+
+    #_____________________________________
+    #             schedule
+    #_____________________________________
+    def schedule(self, event):
+        """
+           Shows the widget's tip once the pointer has rested on it.
+        """
+        self.hide()
+        self.pending = self.master.after(self.delay, self.show, event.widget)
+
+    #_____________________________________
+    #               show
+    #_____________________________________
+    def show(self, widget):
+        """
+           Shows the widget's tip just below it.
+        """
+        self.pending = None
+        message = self.messages.get(widget)
+        if not message or not widget.winfo_exists():
+            return
+        if self.popup is None:
+            self.popup = tk.Toplevel(self.master)
+            self.popup.withdraw()
+            self.popup.overrideredirect(True)
+            self.label = tk.Label(self.popup, justify='left',
+                                  font=TOOL_TIP_FONT,
+                                  background=TOOL_TIP_BACKGROUND,
+                                  relief='solid', borderwidth=1)
+            self.label.pack()
+        self.label.configure(text=message)
+        self.popup.geometry(f'+{widget.winfo_rootx() + 10}'
+                            f'+{widget.winfo_rooty() + widget.winfo_height() + 2}')
+        self.popup.deiconify()
+        self.popup.lift()
+
+    #_____________________________________
+    #               hide
+    #_____________________________________
+    def hide(self, event=None):
+        """
+           Hides the tip or stops it from being shown.
+        """
+        if self.pending is not None:
+            self.master.after_cancel(self.pending)
+            self.pending = None
+        if self.popup is not None:
+            self.popup.withdraw()
+
+
+#_____________________________________
+#            cell_text
+#_____________________________________
+def cell_text(value):
+    """
+       Returns a column value as the text shown in a ResultGrid, on
+      one line and no longer than RESULT_CELL_CHARS.
+    """
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bytes):
+        return f'<{len(value)} bytes>'
+    text = ' '.join(str(value).split())
+    if len(text) > RESULT_CELL_CHARS:
+        text = text[:RESULT_CELL_CHARS - 3] + '...'
+    return text
+
+
+#====================================================================
+#                            ResultGrid
+#====================================================================
+class ResultGrid(ttk.Frame):
+    """
+       A table of the rows returned by an SQL query. The Treeview
+      only ever holds the rows in view, refilled as it's scrolled,
+      so showing a page takes the same time however many rows have
+      been fetched.
+       Rows are added as they're fetched. While there are more to
+      come, more() is called whenever the view gets within a page of
+      the last row fetched, and the scrollbar leaves room below the
+      rows for them.
+    """
+    def __init__(self, master=None, rows=RESULT_ROWS, more=None, **options):
+        super().__init__(master, **options)
+        self.rows = rows
+        self.more = more
+        self.records = []
+        self.complete = True
+        self.waiting = False
+        self.top = 0
+        self.tree = ttk.Treeview(self, show='headings', height=rows,
+                                 selectmode='browse')
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical',
+                                       command=self.yview)
+        self.xscrollbar = ttk.Scrollbar(self, orient='horizontal',
+                                        command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.xscrollbar.set)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+        self.xscrollbar.grid(row=1, column=0, sticky='ew')
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.tree.bind('<MouseWheel>',
+                       lambda event: self.yview('scroll',
+                                                -3 if event.delta > 0 else 3,
+                                                'units'))
+        self.tree.bind('<Button-4>', lambda event: self.yview('scroll', -3, 'units'))
+        self.tree.bind('<Button-5>', lambda event: self.yview('scroll', 3, 'units'))
+        self.tree.bind('<Prior>', lambda event: self.yview('scroll', -1, 'pages'))
+        self.tree.bind('<Next>', lambda event: self.yview('scroll', 1, 'pages'))
+        self.tree.bind('<Home>', lambda event: self.yview('moveto', 0))
+        self.tree.bind('<End>', lambda event: self.yview('moveto', 1))
+
+    #_____________________________________
+    #           set_columns
+    #_____________________________________
+    def set_columns(self, columns):
+        """
+           Starts showing the rows of a query with these column names.
+        """
+        self.records = []
+        self.complete = False
+        self.waiting = False
+        self.top = 0
+        self.tree.delete(*self.tree.get_children())
+        self.tree.configure(columns=[str(number) for number in range(len(columns))])
+        for number, name in enumerate(columns):
+            self.tree.heading(str(number), text=name, anchor='w')
+            self.tree.column(str(number), width=RESULT_COLUMN_WIDTH,
+                             minwidth=40, stretch=False)
+
+    #_____________________________________
+    #             add_rows
+    #_____________________________________
+    def add_rows(self, rows, complete):
+        """
+           Adds fetched rows after those already fetched. complete is
+          True if they're the last.
+        """
+        self.records.extend(tuple(cell_text(value) for value in row)
+                            for row in rows)
+        self.complete = complete
+        self.waiting = False
+        self.show()
+
+    #_____________________________________
+    #              finish
+    #_____________________________________
+    def finish(self):
+        """
+           Stops asking for more rows, e.g. once the query has been
+          cancelled.
+        """
+        self.complete = True
+        self.waiting = False
+        self.show()
+
+    #_____________________________________
+    #               show
+    #_____________________________________
+    def show(self):
+        """
+           Fills the Treeview with the rows in view, sets the scrollbar
+          to their position and asks for more rows if the view is
+          within a page of the last row fetched.
+        """
+        count = len(self.records)
+        self.top = max(0, min(self.top, count - self.rows))
+        visible = self.records[self.top:self.top + self.rows]
+        self.tree.delete(*self.tree.get_children())
+        for values in visible:
+            self.tree.insert('', 'end', values=values)
+        total = self.total()
+        if total:
+            self.scrollbar.set(self.top / total,
+                               (self.top + len(visible)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        if (not self.complete and not self.waiting and self.more and
+                self.top + 2 * self.rows >= count):
+            self.waiting = True
+            self.more()
+
+    #_____________________________________
+    #               total
+    #_____________________________________
+    def total(self):
+        """
+           The number of rows the scrollbar spans, a page more than
+          have been fetched while there are more to come.
+        """
+        return len(self.records) + (0 if self.complete else self.rows)
+
+    #_____________________________________
+    #               yview
+    #_____________________________________
+    def yview(self, *args):
+        """
+           Scrolls the rows. Called by the scrollbar with either
+          'moveto' fraction or 'scroll' number 'units' or 'pages'.
+        """
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * self.total())
+        elif args[0] == 'scroll':
+            step = self.rows if args[2] == 'pages' else 1
+            self.top += int(args[1]) * step
+        self.show()
+        return 'break'
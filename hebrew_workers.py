@@ -0,0 +1,487 @@
+"""
+   Background workers for the Hebrew Studies app.
+
+   Tkinter widgets may only be touched by the thread running the Tk
+  main loop, so anything slow, e.g. an SQLite query, is run on a
+  worker thread and its result is posted back to the main loop by a
+  TkDispatcher which polls a queue with the Tk after() method.
+   A QueryPager fetches the rows of a query on the worker a page at
+  a time as they're wanted.
+
+"""
+
+import concurrent.futures
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+
+import hebrew_db
+import hebrew_trace
+
+# How often, in milliseconds, the Tk main loop checks for results
+POLL_INTERVAL = 20
+
+# Number of rows a QueryPager fetches at a time
+PAGE_ROWS = 500
+
+
+#====================================================================
+#                           TkDispatcher
+#====================================================================
+class TkDispatcher():
+    """
+       Runs functions posted from any thread on the Tk main loop.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.pending = queue.SimpleQueue()
+        self.root.after(POLL_INTERVAL, self.poll)
+
+    #_____________________________________
+    #               post
+    #_____________________________________
+    def post(self, function, *args):
+        """
+           Queues the function to be called with the args on the Tk
+          main loop. Safe to call from any thread.
+        """
+        self.pending.put((function, args))
+
+    #_____________________________________
+    #               poll
+    #_____________________________________
+    def poll(self):
+        """
+           Calls every function posted since the last poll and
+          reschedules itself.
+        """
+        try:
+            while True:
+                function, args = self.pending.get_nowait()
+                try:
+                    function(*args)
+                except Exception:
+                    traceback.print_exc()
+        except queue.Empty:
+            pass
+        self.root.after(POLL_INTERVAL, self.poll)
+
+    #_____________________________________
+    #             when_done
+    #_____________________________________
+    def when_done(self, future, on_done=None, on_error=None):
+        """
+           Arranges for on_done(result) or on_error(exception) to be
+          called on the Tk main loop once the future has finished.
+          Cancelled futures call neither.
+        """
+        def finished(future):
+            if future.cancelled():
+                return
+            err = future.exception()
+            if err is None:
+                if on_done:
+                    self.post(on_done, future.result())
+            elif on_error:
+                self.post(on_error, err)
+            else:
+                self.post(traceback.print_exception,
+                          type(err), err, err.__traceback__)
+
+        future.add_done_callback(finished)
+        return future
+
+
+#====================================================================
+#                            Debouncer
+#====================================================================
+class Debouncer():
+    """
+       Calls a function on the Tk main loop once it hasn't been
+      called for delay milliseconds, e.g. once a pause in typing
+      shows the search text is ready. Bound to an event in place of
+      the function, a burst of events makes a single call.
+    """
+    def __init__(self, widget, delay, function):
+        self.widget = widget
+        self.delay = delay
+        self.function = function
+        self.pending = None
+
+    #_____________________________________
+    #             __call__
+    #_____________________________________
+    def __call__(self, event=None):
+        """
+           Restarts the delay before the function is called.
+        """
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+        self.pending = self.widget.after(self.delay, self.fire)
+
+    #_____________________________________
+    #               fire
+    #_____________________________________
+    def fire(self):
+        """
+           Calls the function once the delay is up.
+        """
+        self.pending = None
+        self.function()
+
+
+#====================================================================
+#                           DbWorker
+#====================================================================
+class DbWorker():
+    """
+       A thread that owns its own connection to the database and runs
+      the functions submitted to it one at a time in the order they
+      were submitted, so a write submitted before a query is always
+      visible to that query.
+       Each function is called with the worker's connection as its
+      first argument and its result is returned through a
+      concurrent.futures.Future.
+    """
+    def __init__(self, path, dispatcher=None):
+        self.path = path
+        self.dispatcher = dispatcher
+        self.connection = None
+        self.requests = queue.SimpleQueue()
+        #  The future of the function that's running and the number of
+        # statements earlier functions left active on the connection,
+        # guarded by the lock so cancel() never interrupts the function
+        # after it.
+        self.running = None
+        self.left_active = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name='DbWorker',
+                                       daemon=True)
+        self.thread.start()
+
+    #_____________________________________
+    #               run
+    #_____________________________________
+    def run(self):
+        """
+           Opens the worker's connection and runs the submitted
+          functions until stop() is called.
+        """
+        self.connection = hebrew_db.open_database(self.path)
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            future, function, args = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self.lock:
+                self.running = future
+                self.left_active = self.connection.active_statements
+            start = time.perf_counter()
+            try:
+                result = function(self.connection, *args)
+            except BaseException as err:
+                if self.connection.in_transaction:
+                    self.connection.rollback()
+                with self.lock:
+                    self.running = None
+                if hebrew_trace.ENABLED:
+                    trace_request(function, time.perf_counter() - start)
+                future.set_exception(err)
+            else:
+                with self.lock:
+                    self.running = None
+                if hebrew_trace.ENABLED:
+                    trace_request(function, time.perf_counter() - start)
+                future.set_result(result)
+        self.connection.close()
+
+    #_____________________________________
+    #              submit
+    #_____________________________________
+    def submit(self, function, *args, on_done=None, on_error=None):
+        """
+           Queues function(connection, *args) to run on the worker
+          thread and returns its Future. If on_done or on_error are
+          given they're called on the Tk main loop with the result
+          or the exception.
+        """
+        future = concurrent.futures.Future()
+        if self.dispatcher and (on_done or on_error):
+            self.dispatcher.when_done(future, on_done, on_error)
+        self.requests.put((future, function, args))
+        return future
+
+    #_____________________________________
+    #              query
+    #_____________________________________
+    def query(self, sql_stmt, params=(), on_done=None, on_error=None):
+        """
+           Runs a query on the worker thread. Its result is the
+          list of rows returned.
+        """
+        return self.submit(fetch_all, sql_stmt, params,
+                           on_done=on_done, on_error=on_error)
+
+    #_____________________________________
+    #             execute
+    #_____________________________________
+    def execute(self, sql_stmt, params=(), on_done=None, on_error=None):
+        """
+           Runs and commits a statement that changes the database on
+          the worker thread. Its result is the number of rows changed.
+        """
+        return self.submit(execute_commit, sql_stmt, params,
+                           on_done=on_done, on_error=on_error)
+
+    #_____________________________________
+    #               call
+    #_____________________________________
+    def call(self, function, *args, timeout=None):
+        """
+           Runs function(connection, *args) on the worker thread and
+          waits for its result. Only for work that has to finish
+          before the caller can continue, e.g. creating indexes at
+          start up.
+        """
+        return self.submit(function, *args).result(timeout)
+
+    #_____________________________________
+    #            interrupt
+    #_____________________________________
+    def interrupt(self):
+        """
+           Aborts the query the worker is currently running. Its
+          future fails with sqlite3.OperationalError('interrupted').
+        """
+        if self.connection:
+            self.connection.interrupt()
+
+    #_____________________________________
+    #              cancel
+    #_____________________________________
+    def cancel(self, future):
+        """
+           Cancels a submitted function that's no longer wanted, e.g.
+          the search for text that has since been typed over. If it
+          hasn't started it never runs, if it's running its query is
+          interrupted. Nothing else the worker runs is interrupted, so
+          if an earlier function left a statement active on the
+          connection, which an interrupt would abort as well, the
+          function is left to finish.
+          Returns False if the function had already finished or is
+          left to finish.
+        """
+        if future.cancel():
+            return True
+        with self.lock:
+            if self.running is future and not self.left_active:
+                self.connection.interrupt()
+                return True
+        return False
+
+    #_____________________________________
+    #               stop
+    #_____________________________________
+    def stop(self, wait=True):
+        """
+           Lets the worker finish what's already been submitted
+          then closes its connection.
+        """
+        self.requests.put(None)
+        if wait:
+            self.thread.join()
+
+
+#====================================================================
+#                           QueryPager
+#====================================================================
+class QueryPager():
+    """
+       A query whose rows are fetched a page at a time, so however
+      many rows it returns only the pages asked for are ever read or
+      held in memory.
+       open, fetch and close are submitted to the DbWorker, which
+      calls them with its connection, so the cursor is only ever used
+      on the worker thread. The query runs on the pager's own read
+      only connection rather than the worker's, since its statement
+      stays active between pages and interrupting the worker's
+      connection would interrupt it too, along with every query after
+      it until it finished. A page being fetched can be interrupted
+      with interrupt.
+    """
+    def __init__(self, sql_stmt, params=()):
+        self.sql_stmt = sql_stmt
+        self.params = params
+        self.reader = None
+        self.cursor = None
+        #  Time spent running the statement and fetching its rows
+        # and, for a statement that doesn't return rows, the number
+        # of rows it changed.
+        self.seconds = 0.0
+        self.changed = None
+
+    #_____________________________________
+    #               open
+    #_____________________________________
+    def open(self, connection, count=PAGE_ROWS):
+        """
+           Runs the statement and returns (columns, rows, done) where
+          columns are the names of its columns, rows its first page
+          of tuples and done is True if there are no more.
+           A statement that changes the database can't run on the
+          read only connection, so it's run on the worker's and
+          committed. Any rows it returns, e.g. with RETURNING, are
+          all returned at once and, if it returns none,
+          (None, [], True) is returned with the number of rows it
+          changed in changed.
+        """
+        self.reader = hebrew_db.open_read_only(hebrew_db.database_path(connection))
+        start = time.perf_counter()
+        cursor = self.reader.cursor()
+        try:
+            cursor.execute(self.sql_stmt, self.params)
+        except sqlite3.OperationalError as err:
+            self.close()
+            if not str(err).startswith('attempt to write a readonly database'):
+                raise
+            return self.write(connection)
+        except BaseException:
+            self.close()
+            raise
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.cursor = cursor
+        if cursor.description is None:
+            self.changed = max(cursor.rowcount, 0)
+            self.close()
+            return None, [], True
+        columns = [column[0] for column in cursor.description]
+        return (columns,) + self.fetch(connection, count)
+
+    #_____________________________________
+    #               write
+    #_____________________________________
+    def write(self, connection):
+        """
+           Runs and commits a statement that changes the database on
+          the worker's connection, fetching all its rows so nothing
+          is left running on it.
+        """
+        start = time.perf_counter()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(self.sql_stmt, self.params)
+            columns = rows = None
+            if cursor.description is not None:
+                columns = [column[0] for column in cursor.description]
+                rows = [tuple(row) for row in cursor.fetchall()]
+            self.changed = cursor.rowcount
+            if connection.in_transaction:
+                connection.commit()
+        finally:
+            cursor.close()
+            self.seconds += time.perf_counter() - start
+        if columns is None:
+            return None, [], True
+        return columns, rows, True
+
+    #_____________________________________
+    #               fetch
+    #_____________________________________
+    def fetch(self, connection, count=PAGE_ROWS):
+        """
+           Returns (rows, done), the next page of rows as tuples and
+          True if they were the last. The cursor and the pager's
+          connection are closed after the last page.
+        """
+        start = time.perf_counter()
+        try:
+            rows = self.cursor.fetchmany(count)
+        finally:
+            self.seconds += time.perf_counter() - start
+        done = len(rows) < count
+        if done:
+            self.close(connection)
+        return [tuple(row) for row in rows], done
+
+    #_____________________________________
+    #             interrupt
+    #_____________________________________
+    def interrupt(self):
+        """
+           Aborts the page being fetched, which fails with
+          sqlite3.OperationalError('interrupted'), as does any page
+          fetched after it. Only the pager's own connection is
+          interrupted. Safe to call from any thread.
+        """
+        reader = self.reader
+        if reader is not None:
+            try:
+                reader.interrupt()
+            except sqlite3.ProgrammingError:
+                #  The pager was closed in the meantime
+                pass
+
+    #_____________________________________
+    #               close
+    #_____________________________________
+    def close(self, connection=None):
+        """
+           Closes the cursor and the pager's connection, e.g. once the
+          rows are no longer wanted, without fetching the rest of them.
+        """
+        if self.cursor is not None:
+            self.cursor.close()
+            self.cursor = None
+        if self.reader is not None:
+            reader, self.reader = self.reader, None
+            reader.close()
+
+
+#_____________________________________
+#           trace_request
+#_____________________________________
+def trace_request(function, seconds):
+    """
+       Records the time a function took on the database worker. The
+      statements it ran are recorded by the connection's cursors.
+    """
+    hebrew_trace.record('db', getattr(function, '__qualname__', repr(function)),
+                        seconds)
+
+
+#_____________________________________
+#            fetch_all
+#_____________________________________
+def fetch_all(connection, sql_stmt, params=()):
+    """
+       Returns all the rows returned by the query.
+    """
+    return connection.execute(sql_stmt, params).fetchall()
+
+
+#_____________________________________
+#            fetch_one
+#_____________________________________
+def fetch_one(connection, sql_stmt, params=()):
+    """
+       Returns the first row returned by the query or None.
+    """
+    return connection.execute(sql_stmt, params).fetchone()
+
+
+#_____________________________________
+#          execute_commit
+#_____________________________________
+def execute_commit(connection, sql_stmt, params=()):
+    """
+       Executes and commits the statement and returns the
+      number of rows it changed.
+    """
+    with hebrew_db.transaction(connection):
+        cursor = connection.execute(sql_stmt, params)
+    return cursor.rowcount
@@ -0,0 +1,45 @@
+"""
+   Tests of the Hebrew Studies app's modules that don't need Tk or
+  pygame.
+
+   The database tests run against temporary copies of the tracked
+  hebrew_studies.db so the real one is never changed.
+
+   Usage:
+       python -m pytest -q
+       python -m unittest discover tests
+
+"""
+
+import contextlib
+import os
+import shutil
+
+import hebrew_db
+
+HEBREW_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'hebrew_studies.db')
+
+
+#_____________________________________
+#           copy_database
+#_____________________________________
+def copy_database(directory, upgrade=True):
+    """
+       Copies the database into the directory and returns the path of
+      the copy. If upgrade is True the app's start up migrations,
+      indexes and views are applied to it, as they are when the app
+      starts.
+    """
+    path = os.path.join(directory, 'hebrew_studies.db')
+    shutil.copyfile(HEBREW_DB, path)
+    if upgrade:
+        with contextlib.closing(hebrew_db.open_database(path)) as connection:
+            for upgrade_step in (hebrew_db.migrate_categories,
+                                 hebrew_db.create_search_keys,
+                                 hebrew_db.create_lookup_indexes,
+                                 hebrew_db.create_audio_fts,
+                                 hebrew_db.create_audio_detail_view,
+                                 hebrew_db.create_sheet_build_state):
+                upgrade_step(connection)
+    return path
@@ -0,0 +1,91 @@
+"""
+   Tests of the database migrations in hebrew_db.
+"""
+
+import contextlib
+import sqlite3
+import tempfile
+import unittest
+
+import hebrew_db
+
+from tests import copy_database
+
+
+#====================================================================
+#                     MigrateCategoriesTest
+#====================================================================
+class MigrateCategoriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = copy_database(self.directory.name, upgrade=False)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def legacy_members(self):
+        """
+           Returns the AUDIO_IDs of the legacy table, or the view that
+          replaced it, of every category that has one, keyed by the
+          category's name.
+        """
+        with contextlib.closing(sqlite3.connect(self.path)) as connection:
+            tables = {row[0].lower(): row[0] for row in
+                      connection.execute("SELECT name FROM sqlite_master"
+                                         " WHERE type IN ('table', 'view');")}
+            members = {}
+            for name, in connection.execute('SELECT name FROM category;').fetchall():
+                table = tables.get(name.replace(' ', '_').lower())
+                if table:
+                    members[name] = sorted(row[0] for row in connection.execute(
+                        f'SELECT audio_id FROM "{table}";'))
+            return members
+
+    def test_moves_every_member(self):
+        members = self.legacy_members()
+        self.assertTrue(members)
+        with contextlib.closing(hebrew_db.open_database(self.path)) as connection:
+            self.assertTrue(hebrew_db.migrate_categories(connection))
+            for name, audio_ids in members.items():
+                with self.subTest(category=name):
+                    migrated = sorted(row[0] for row in connection.execute(
+                        'SELECT cm.audio_id FROM category_member cm'
+                        '  JOIN category c ON c.category_id = cm.category_id'
+                        ' WHERE c.name = ?;', (name,)))
+                    self.assertEqual(migrated, audio_ids)
+
+    def test_legacy_tables_become_views(self):
+        members = self.legacy_members()
+        with contextlib.closing(hebrew_db.open_database(self.path)) as connection:
+            hebrew_db.migrate_categories(connection)
+            views = {row[0].lower() for row in
+                     connection.execute("SELECT name FROM sqlite_master"
+                                        " WHERE type = 'view';")}
+        self.assertEqual(self.legacy_members(), members)
+        for name in members:
+            self.assertIn(name.replace(' ', '_').lower(), views)
+
+    def test_categories_keep_their_names(self):
+        with contextlib.closing(sqlite3.connect(self.path)) as connection:
+            names = sorted(row[0] for row in connection.execute('SELECT name FROM category;'))
+        with contextlib.closing(hebrew_db.open_database(self.path)) as connection:
+            hebrew_db.migrate_categories(connection)
+            self.assertEqual(sorted(row[0] for row in
+                                    connection.execute('SELECT name FROM category;')),
+                             names)
+            self.assertEqual(connection.execute('SELECT count(*) FROM category'
+                                                ' WHERE category_id IS NULL;')
+                             .fetchone()[0], 0)
+
+    def test_runs_once(self):
+        with contextlib.closing(hebrew_db.open_database(self.path)) as connection:
+            self.assertTrue(hebrew_db.migrate_categories(connection))
+            count = connection.execute('SELECT count(*) FROM category_member;').fetchone()[0]
+            self.assertFalse(hebrew_db.migrate_categories(connection))
+            self.assertEqual(connection.execute('SELECT count(*) FROM category_member;')
+                             .fetchone()[0], count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+   Tests of the MP3 and WAV parsing in hebrew_media.
+"""
+
+import io
+import struct
+import unittest
+import wave
+
+import hebrew_media
+
+#  The header of an MPEG 1 Layer III frame at 128 kbps and 44.1 kHz,
+# stereo and without padding, and the length of the frame in bytes.
+MP3_HEADER = b'\xff\xfb\x90\x00'
+MP3_FRAME = 144 * 128000 // 44100
+#  The same frame in mono
+MP3_MONO_HEADER = b'\xff\xfb\x90\xc0'
+
+
+#_____________________________________
+#            mp3_frame
+#_____________________________________
+def mp3_frame(header=MP3_HEADER, tag=None):
+    """
+       Returns a frame of silence, or the Xing or Info frame with the
+      tag after the side information of a stereo frame.
+    """
+    frame = bytearray(MP3_FRAME)
+    frame[:4] = header
+    if tag:
+        frame[36:40] = tag
+    return bytes(frame)
+
+
+#_____________________________________
+#            id3v2_tag
+#_____________________________________
+def id3v2_tag(size):
+    """
+       Returns an ID3v2.4 tag with size bytes of padding.
+    """
+    syncsafe = bytes((size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b'ID3\x04\x00\x00' + syncsafe + bytes(size)
+
+
+#_____________________________________
+#             wav_file
+#_____________________________________
+def wav_file(frames, channels=1, sample_width=2, sample_rate=22050):
+    """
+       Returns a WAV file of frames frames of silence written by the
+      standard library's wave module.
+    """
+    data = io.BytesIO()
+    with wave.open(data, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames * channels * sample_width))
+    return data.getvalue()
+
+
+#====================================================================
+#                           Mp3InfoTest
+#====================================================================
+class Mp3InfoTest(unittest.TestCase):
+
+    def test_frames(self):
+        info = hebrew_media.mp3_info(mp3_frame() * 100)
+        self.assertEqual(info['format'], 'mp3')
+        self.assertAlmostEqual(info['duration'], 100 * 1152 / 44100)
+        self.assertEqual(info['sample_rate'], 44100)
+        self.assertEqual(info['channels'], 2)
+        #  Real encoders pad some frames to average 128 kbps exactly
+        self.assertEqual(info['bitrate'], round(MP3_FRAME * 8 * 44100 / 1152))
+
+    def test_mono(self):
+        info = hebrew_media.mp3_info(mp3_frame(MP3_MONO_HEADER) * 10)
+        self.assertEqual(info['channels'], 1)
+
+    def test_skips_tags_and_the_info_frame(self):
+        data = (id3v2_tag(1000) + id3v2_tag(20) + mp3_frame(tag=b'Xing') +
+                mp3_frame() * 50 + b'TAG' + bytes(125))
+        info = hebrew_media.mp3_info(data)
+        self.assertAlmostEqual(info['duration'], 50 * 1152 / 44100)
+
+    def test_skips_a_stray_sync_byte(self):
+        data = b'\xff\xfb\x00' + mp3_frame() * 10
+        self.assertAlmostEqual(hebrew_media.mp3_info(data)['duration'],
+                               10 * 1152 / 44100)
+
+    def test_frame_header(self):
+        self.assertEqual(hebrew_media.mpeg_frame_header(mp3_frame(), 0),
+                         (MP3_FRAME, 1152, 44100, 2, 128000))
+        self.assertIsNone(hebrew_media.mpeg_frame_header(b'\xff\xfb\xf0\x00', 0))
+        self.assertIsNone(hebrew_media.mpeg_frame_header(b'\xff\xfb', 0))
+
+    def test_errors(self):
+        for data in (b'', b'not an mp3' * 100, id3v2_tag(100),
+                     mp3_frame() * 10 + mp3_frame()[:100]):
+            with self.subTest(data=data[:12]):
+                with self.assertRaises(ValueError):
+                    hebrew_media.mp3_info(data)
+
+
+#====================================================================
+#                           WavInfoTest
+#====================================================================
+class WavInfoTest(unittest.TestCase):
+
+    def test_matches_the_wave_module(self):
+        for channels, sample_width, sample_rate in ((1, 2, 22050), (2, 2, 44100),
+                                                    (1, 1, 8000)):
+            with self.subTest(channels=channels, sample_width=sample_width,
+                              sample_rate=sample_rate):
+                data = wav_file(sample_rate // 2, channels, sample_width, sample_rate)
+                info = hebrew_media.wav_info(data)
+                with wave.open(io.BytesIO(data)) as wav:
+                    duration = wav.getnframes() / wav.getframerate()
+                self.assertEqual(info['format'], 'wav')
+                self.assertAlmostEqual(info['duration'], duration)
+                self.assertEqual(info['sample_rate'], sample_rate)
+                self.assertEqual(info['channels'], channels)
+                self.assertEqual(info['bitrate'],
+                                 sample_rate * channels * sample_width * 8)
+
+    def test_skips_other_chunks(self):
+        data = wav_file(22050)
+        chunk = b'LIST' + struct.pack('<I', 5) + b'INFO\x00\x00'
+        data = data[:12] + chunk + data[12:]
+        data = data[:4] + struct.pack('<I', len(data) - 8) + data[8:]
+        self.assertAlmostEqual(hebrew_media.wav_info(data)['duration'], 1.0)
+
+    def test_errors(self):
+        data = wav_file(22050)
+        for name, broken in (('not RIFF', b'RIFX' + data[4:]),
+                             ('cut short', data[:-100]),
+                             ('no data chunk', data[:36]),
+                             ('no fmt chunk', data[:12] + data[36:])):
+            with self.subTest(name):
+                with self.assertRaises(ValueError):
+                    hebrew_media.wav_info(broken)
+
+
+if __name__ == '__main__':
+    unittest.main()
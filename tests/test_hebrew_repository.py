@@ -0,0 +1,102 @@
+"""
+   Tests of the named statements in hebrew_repository.
+"""
+
+import contextlib
+import sqlite3
+import tempfile
+import unittest
+
+import hebrew_db
+import hebrew_repository
+
+from tests import copy_database
+
+
+#====================================================================
+#                         SheetQueryTest
+#====================================================================
+class SheetQueryTest(unittest.TestCase):
+    """
+       The language of a study sheet becomes its ORDER BY clause, so
+      only the SHEET_ORDERS are accepted.
+    """
+    def test_orders_by_the_language(self):
+        for language in hebrew_repository.SHEET_ORDERS:
+            with self.subTest(language=language):
+                sql_stmt, params = hebrew_repository.sheet_query(language,
+                                                                 lesson='Ha-yesod 1')
+                self.assertTrue(sql_stmt.endswith(f' ORDER BY {language};'))
+                self.assertEqual(params, ('Ha-yesod 1',))
+                sql_stmt, params = hebrew_repository.sheet_query(language,
+                                                                 category='animals')
+                self.assertTrue(sql_stmt.endswith(f' ORDER BY {language};'))
+                self.assertEqual(params, ('animals',))
+
+    def test_rejects_anything_else(self):
+        for language in ('english', 'Hebrew DESC', 'English; DROP TABLE lesson',
+                         '1', '', None):
+            with self.subTest(language=language):
+                with self.assertRaises(ValueError):
+                    hebrew_repository.sheet_query(language, lesson='Ha-yesod 1')
+
+    def test_queries_run(self):
+        with tempfile.TemporaryDirectory() as directory, \
+             contextlib.closing(hebrew_db.open_database(copy_database(directory))) \
+             as connection:
+            lesson = hebrew_repository.fetch_all(connection, 'lesson', 'names')[0]['name']
+            for language in hebrew_repository.SHEET_ORDERS:
+                sql_stmt, params = hebrew_repository.sheet_query(language, lesson=lesson)
+                rows = connection.execute(sql_stmt, params).fetchall()
+                self.assertTrue(rows)
+                self.assertEqual(rows[0].keys(), ['english', 'hebrew', 'audio_file'])
+
+
+#====================================================================
+#                         SearchKeysTest
+#====================================================================
+class SearchKeysTest(unittest.TestCase):
+    """
+       The search key columns are filled in by the app when it writes
+      a row and by create_search_keys for rows written by any other
+      SQLite client, which has no Python functions.
+    """
+    def test_audio_and_webpage_keys(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = copy_database(directory)
+            with contextlib.closing(hebrew_db.open_database(path)) as connection:
+                with hebrew_db.transaction(connection):
+                    hebrew_repository.execute(
+                        connection, 'audio', 'insert',
+                        hebrew_repository.audio_keys({'english': 'Test Peace',
+                                                      'hebrew': 'שָׁלוֹם',
+                                                      'audio_file': 'No Audio',
+                                                      'lesson': None}))
+                row = connection.execute('SELECT hebrew_no_niqqud, hebrew_key, english_key'
+                                         ' FROM hebrew_audio'
+                                         " WHERE english = 'Test Peace';").fetchone()
+                self.assertEqual(tuple(row), ('שלום', 'שלומ', 'test peace'))
+                sql_stmt, params = hebrew_db.audio_key_query('שלו')
+                self.assertIn('Test Peace', [row['english'] for row in
+                                             connection.execute(sql_stmt, params)])
+
+            plain = sqlite3.connect(path)
+            with plain:
+                plain.execute("INSERT INTO webpage(topic, url)"
+                              " VALUES ('Test Topic', 'https://example.com');")
+                plain.execute("UPDATE hebrew_audio SET english = 'Test Quiet'"
+                              " WHERE english = 'Test Peace';")
+            plain.close()
+
+            with contextlib.closing(hebrew_db.open_database(path)) as connection:
+                hebrew_db.create_search_keys(connection)
+                self.assertEqual(connection.execute("SELECT topic_key FROM webpage"
+                                                    " WHERE topic = 'Test Topic';")
+                                 .fetchone()[0], 'test topic')
+                self.assertEqual(connection.execute("SELECT english_key FROM hebrew_audio"
+                                                    " WHERE english = 'Test Quiet';")
+                                 .fetchone()[0], 'test quiet')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+"""
+   Tests of the in memory searches in hebrew_search.
+"""
+
+import tempfile
+import unittest
+
+import hebrew_db
+import hebrew_search
+
+from tests import copy_database
+
+ROWS = [(1, 'peace', 'שָׁלוֹם'),
+        (2, 'hello', 'שָׁלוֹם'),
+        (3, 'good morning', 'בֹּקֶר טוֹב'),
+        (4, 'book', 'סֵפֶר'),
+        (5, 'library', 'סִפְרִיָּה'),
+        (6, 'good night', 'לַיְלָה טוֹב')]
+
+
+#====================================================================
+#                          TopicIndexTest
+#====================================================================
+class TopicIndexTest(unittest.TestCase):
+    """
+       The index has to find the same topics as
+      webpage_search_query. Only searches LIKE treats the same as a
+      search key, i.e. lower case ASCII, are compared with the SQL.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.connection = hebrew_db.open_database(copy_database(cls.directory.name))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.connection.close()
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.index = hebrew_search.TopicIndex.query(self.connection)
+
+    def sql_search(self, search):
+        sql_stmt, params = hebrew_db.webpage_search_query(search)
+        return sorted((row['topic'], row['url_id']) for row in
+                      self.connection.execute(sql_stmt, params))
+
+    def test_same_as_the_query(self):
+        for search in ('verb', 'ing', 'he', 'v', 'the%', 'ha-yesod', 'v_rb',
+                       '%lesson%1', 'h_b%', 'xyzzy'):
+            with self.subTest(search=search):
+                self.assertEqual(sorted(self.index.search(search)),
+                                 self.sql_search(search))
+
+    def test_topic_order(self):
+        found = self.index.search('ing')
+        self.assertEqual([topic for topic, url_id in found],
+                         sorted(topic for topic, url_id in found))
+
+    def test_ignores_case_and_niqqud(self):
+        self.assertEqual(self.index.search('VERB'), self.index.search('verb'))
+        index = hebrew_search.TopicIndex([('שָׁלוֹם', 1), ('Peace', 2)])
+        self.assertEqual(index.search('שלום'), [('שָׁלוֹם', 1)])
+        self.assertEqual(index.search('שלו%'), [('שָׁלוֹם', 1)])
+        self.assertEqual(index.search('pea%'), [('Peace', 2)])
+
+    def test_add_update_and_remove(self):
+        count = len(self.index)
+        self.index.add('Zzyzx road', 99999)
+        self.assertEqual(self.index.search('zzyzx'), [('Zzyzx road', 99999)])
+        self.index.update('Zzyzx street', 99999)
+        self.assertEqual(self.index.search('zzy%'), [('Zzyzx street', 99999)])
+        self.assertEqual(self.index.search('road'), self.sql_search('road'))
+        self.index.remove(99999)
+        self.assertEqual(self.index.search('zzyzx'), [])
+        self.assertEqual(len(self.index), count)
+
+
+#====================================================================
+#                       AudioMatchesTest
+#====================================================================
+class AudioMatchesTest(unittest.TestCase):
+    """
+       Narrowing the matches of a search in memory has to find the
+      same audio as running audio_search_query for the longer text,
+      whether the search uses the LIKE scans or the full-text index.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.connection = hebrew_db.open_database(copy_database(cls.directory.name))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.connection.close()
+        cls.directory.cleanup()
+
+    def test_narrow_matches_the_query(self):
+        for search, longer in (('go', 'goo'), ('goo', 'good m'),
+                               ('של', 'שלום'), ('שָׁ', 'שָׁלוֹ'),
+                               ('ing', 'ings'), ('the', 'the d'),
+                               ('GO', 'good')):
+            with self.subTest(search=search, longer=longer):
+                matches = hebrew_search.AudioMatches.query(self.connection, search)
+                self.assertTrue(matches.narrows(longer))
+                narrowed = matches.narrow(longer)
+                queried = hebrew_search.AudioMatches.query(self.connection, longer)
+                self.assertEqual(sorted(narrowed.records.ids),
+                                 sorted(queried.records.ids))
+
+    def test_narrow_keeps_the_order(self):
+        matches = hebrew_search.AudioMatches.query(self.connection, 'go')
+        narrowed = matches.narrow('goo')
+        ids = list(matches.records.ids)
+        positions = [ids.index(audio_id) for audio_id in narrowed.records.ids]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_only_plain_searches_narrow(self):
+        matches = hebrew_search.AudioMatches.query(self.connection, 'go')
+        self.assertFalse(matches.narrows('og'))
+        self.assertFalse(matches.narrows('go%'))
+        wildcard = hebrew_search.AudioMatches.query(self.connection, 'go%')
+        self.assertFalse(wildcard.narrows('good'))
+
+
+#====================================================================
+#                         FuzzyIndexTest
+#====================================================================
+class FuzzyIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = hebrew_search.FuzzyIndex(ROWS)
+
+    def test_finds_misspelled_words(self):
+        self.assertEqual(self.index.search('pease'), [(1.0, 1, 'peace')])
+        self.assertEqual(self.index.search('god morning'),
+                         [(1.0, 3, 'good morning')])
+
+    def test_hebrew_ignores_niqqud_and_final_letters(self):
+        self.assertEqual(self.index.search('שלומ'),
+                         [(0.0, 2, 'hello'), (0.0, 1, 'peace')])
+
+    def test_every_close_entry(self):
+        self.assertEqual(self.index.search('god'),
+                         [(1.0, 3, 'good morning'), (1.0, 6, 'good night')])
+        self.assertEqual(self.index.search('good nigt'),
+                         [(1.0, 6, 'good night')])
+
+    def test_nothing_close(self):
+        self.assertEqual(self.index.search('xyzzy'), [])
+        self.assertEqual(self.index.search(''), [])
+
+    def test_add(self):
+        self.index.add(7, 'goodbye', 'לְהִתְרָאוֹת')
+        self.assertEqual(len(self.index), 7)
+        self.assertEqual(self.index.search('godbye')[0][1], 7)
+
+
+#====================================================================
+#                       CompletionTrieTest
+#====================================================================
+class CompletionTrieTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = hebrew_search.CompletionTrie(ROWS)
+
+    def test_completes_prefixes(self):
+        self.assertEqual(self.trie.complete('go'), ['good'])
+        self.assertEqual(self.trie.complete('ס'), ['ספר', 'ספריה'])
+
+    def test_ignores_niqqud(self):
+        self.assertEqual(self.trie.complete('שָׁ'), ['שלום'])
+
+    def test_leaves_out_the_prefix_itself(self):
+        self.assertEqual(self.trie.complete('book'), [])
+        self.assertEqual(self.trie.complete('ספר'), ['ספריה'])
+
+    def test_unknown_prefix(self):
+        self.assertEqual(self.trie.complete('q'), [])
+        self.assertEqual(self.trie.complete(''), [])
+
+    def test_words_in_the_most_audio_first(self):
+        trie = hebrew_search.CompletionTrie([(1, 'bread', ''), (2, 'bread roll', ''),
+                                             (3, 'breakfast', '')])
+        self.assertEqual(trie.complete('bre'), ['bread', 'breakfast'])
+
+    def test_count(self):
+        self.assertEqual(self.trie.complete('ס', count=1), ['ספר'])
+
+    def test_add_and_remove(self):
+        self.trie.remove(4)
+        self.assertEqual(self.trie.complete('ס'), ['ספריה'])
+        self.assertEqual(self.trie.complete('bo'), [])
+        self.trie.add(7, 'books', 'סְפָרִים')
+        self.assertEqual(self.trie.complete('ס'), ['ספריה', 'ספרים'])
+        self.assertEqual(self.trie.complete('bo'), ['books'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,315 @@
+"""
+   Tests of the study sheets written by hebrew_sheets.
+"""
+
+import contextlib
+import os
+import tempfile
+import unittest
+
+import hebrew_db
+import hebrew_repository
+import hebrew_sheets
+import hebrew_text
+
+from tests import copy_database
+
+
+#_____________________________________
+#          old_study_sheet
+#_____________________________________
+def old_study_sheet(rows, language, niqqud=True, lesson=None, category=None):
+    """
+       Returns the study sheet the way the original
+      AudioMgr.create_html_study_sheet wrote it, one write at a time.
+      The original passed an undefined name to remove_niqqud, so the
+      niqqud is removed here the way it was meant to be.
+    """
+    html = []
+    write = html.append
+    if lesson:
+        study_title = lesson.replace(' ', ' Lesson ')
+        lesson_link = lesson.replace('Ha-yesod', '#Lesson')
+    else:
+        study_title = category
+        lesson_link = ''
+    write('<!DOCTYPE html>\n'
+          '<html lang="en">\n'
+          '<head>\n'
+          '   <meta charset = "UTF-8">\n'
+          f'   <title>{study_title}</title> \n'
+          '       <link rel="stylesheet" type="text/css" href="hebrew.css"> \n'
+          '   </style> \n'
+          '</head> \n'
+          '<body> \n'
+          f'   <h2 class="lesson_header"> {study_title} </h2> \n'
+          '<a href="Ha-yesod_verb_list.html" target="_blank">Ha-Yesod Verb List</a> <br>\n'
+          f'<a href="Ha-yesod-verbs_present.html{lesson_link}" target="_blank">Ha-Yesod Verbs Present Tense</a> <br>\n'
+          f'<a href="Ha-yesod-verbs_past.html{lesson_link}" target="_blank">Ha-Yesod Verbs Past Tense</a> <br>\n'
+          '<a href="grammar_verbs.html" target="_blank">Verb Conjugation</a> <br><br>\n'
+          '<a href="https://www.pealim.com" target="_blank">\n'
+          '   <img src="pealim.png" alt="Pealim Logo" style="width:24px;height:24px;"></a>\n'
+          ' <a style="color:#2c6cac;"> Displays the pealim.com webpage for the Hebrew word (if found). </a><br>\n'
+          f'<h4> {language} Vocabulary:</h4> \n'
+          '<table > \n'
+          '<colgroup> \n'
+          '<col  style="text-align: left;"> \n'
+          '<col  style="text-align: right;" > \n'
+          '</colgroup> \n'
+          '<tbody> \n')
+    if language != 'English, Hebrew':
+        write('<tr>\n'
+              '   <td></td>\n'
+              '   <td></td>\n'
+              '   <td></td>\n'
+              '   <td></td>\n'
+              '   <td>&nbsp &nbsp</td>\n'
+              '   <td> <button class="hide_answers_button" onclick="hide_answers()">Hide Answers</button></td>\n'
+              '</tr>\n')
+
+    row_num = 0
+    for row in rows:
+        pealim_search = row['hebrew']
+        pealim_button = (f'   <td><a href="https://www.pealim.com/search/?q={pealim_search}" target="_blank"> \n'
+                         '       <img src="pealim.png" alt="Pealim Logo" style="width:24px;height:24px;"></a></td> \n')
+        if language == 'English, Hebrew':
+            row_num += 1
+            write('<tr> \n')
+            write(f'   <td class="english_text">&nbsp &nbsp {row["english"]}</td> \n')
+            audio_id = f'audio_{row_num}'
+            if row['audio_file'] == 'No Audio':
+                audio_found = False
+                cursor_icon = 'no-audio-cursor'
+            else:
+                audio_found = True
+                cursor_icon = 'play-audio-cursor'
+            write(f'   <td class="hebrew_text {cursor_icon}" onclick="play(\'{audio_id}\')">&nbsp {row["hebrew"]}</td> \n')
+            if audio_found:
+                write(f'   <audio id="{audio_id}" src="{row["audio_file"]}"></audio> \n')
+            write(f'   <td>&nbsp &nbsp</td>\n{pealim_button}')
+            write('</tr> \n')
+        else:
+            if language == 'Hebrew':
+                test_text = row['hebrew'].strip()
+                if not niqqud:
+                    test_text = hebrew_text.remove_niqqud(test_text)
+                input_class = 'english_input'
+                translation = 'hebrew_text'
+                answer_text = row['english']
+            else:
+                test_text = row['english'].strip()
+                input_class = 'hebrew_input'
+                translation = 'english_text'
+                answer_text = row['hebrew']
+            row_num += 1
+            if row_num & 1 == 1:
+                row_class = 'row_odd'
+            else:
+                row_class = 'row_even'
+            answer_text_id = f'text_{row_num}'
+            audio_id = f'audio_{row_num}'
+            audio_file = row['audio_file']
+            if audio_file == 'No Audio':
+                audio_found = False
+                cursor_icon = 'no-audio-cursor'
+            else:
+                audio_found = True
+                cursor_icon = 'play-audio-cursor'
+            write('<tr> \n')
+            write((f'   <td><input type="text" class="{input_class}" '
+                   ' name="comment" value=" "></td> \n'))
+            answer_button = (f'   <td class="answer_button">'
+                             f'<button onclick="toggle_answer_display(\'{answer_text_id}\')">Answer</button></td> \n')
+            if language == 'Hebrew':
+                write((f'   <td class="{translation} {row_class} {cursor_icon}" onclick="play(\'{audio_id}\')">'
+                       f'&nbsp &nbsp {test_text}</td> \n'))
+                write(f'{answer_button}')
+                write(f'{pealim_button}   <td></td>\n')
+                write((f'   <td id="{answer_text_id}" class="answer_text english_text {row_class}">{answer_text}</td> \n'))
+            else:
+                write((f'   <td class="{translation} {row_class}">'
+                       f'&nbsp &nbsp {test_text}</td> \n'))
+                write(f'{answer_button}')
+                write(f'{pealim_button}   <td></td>\n')
+                write((f'   <td id="{answer_text_id}" class="answer_text hebrew_text {cursor_icon} {row_class}" '
+                       f' onclick="play(\'{audio_id}\')">{answer_text}</td> \n'))
+            if audio_found:
+                write(f'   <audio id="{audio_id}" src="{audio_file}"></audio> \n')
+            write('</tr> \n')
+
+    write("</tbody> \n")
+    write("</table> \n")
+    write('<script src="hebrew.js" ></script> \n')
+    write(('<script> \n'
+           'let elements = document.getElementsByClassName("hebrew_input"); \n'
+           'for (var i = 0; i < elements.length; i++) {  \n'
+           '    elements[i].addEventListener("keyup", convertTextToHebrew, false); \n'
+           '} \n'
+           '</script> \n'))
+    write("</body> \n")
+    write("</html> \n")
+    return ''.join(html).encode('utf8')
+
+
+# Rows covering the cases each layout handles differently
+EDGE_ROWS = [{'english': 'peace', 'hebrew': ' שָׁלוֹם ', 'audio_file': 'shalom.mp3'},
+             {'english': ' good morning ', 'hebrew': 'בֹּקֶר טוֹב', 'audio_file': 'No Audio'},
+             {'english': 'book', 'hebrew': 'סֵפֶר', 'audio_file': 'sefer.wav'}]
+
+
+#====================================================================
+#                        StudySheetTest
+#====================================================================
+class StudySheetTest(unittest.TestCase):
+    """
+       The study sheets written by iter_study_sheet have to be byte for
+      byte the sheets the original code wrote.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = copy_database(cls.directory.name)
+        with contextlib.closing(hebrew_db.open_database(cls.path)) as connection:
+            cls.lesson = hebrew_repository.fetch_all(connection, 'lesson', 'names')[0]['name']
+            cls.category = hebrew_repository.fetch_all(connection, 'category', 'names')[0]['name']
+            cls.rows = {}
+            for language in hebrew_sheets.LANGUAGES:
+                for kind, subject in (('lesson', cls.lesson), ('category', cls.category)):
+                    sql_stmt, params = hebrew_repository.sheet_query(language,
+                                                                     **{kind: subject})
+                    cls.rows[language, kind] = [dict(row) for row in
+                                                connection.execute(sql_stmt, params)]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def new_study_sheet(self, rows, language, niqqud, chunk_rows, **subject):
+        return ''.join(hebrew_sheets.iter_study_sheet(rows, language, niqqud,
+                                                      chunk_rows=chunk_rows,
+                                                      **subject)).encode('utf8')
+
+    def test_same_as_the_old_layout(self):
+        for language in hebrew_sheets.LANGUAGES:
+            for niqqud in (True, False):
+                for kind, subject in (('lesson', self.lesson),
+                                      ('category', self.category)):
+                    rows = self.rows[language, kind] + EDGE_ROWS
+                    expected = old_study_sheet(rows, language, niqqud, **{kind: subject})
+                    for chunk_rows in (None, 1, 7, hebrew_sheets.CHUNK_ROWS):
+                        with self.subTest(language=language, niqqud=niqqud,
+                                          kind=kind, chunk_rows=chunk_rows):
+                            self.assertEqual(self.new_study_sheet(rows, language, niqqud,
+                                                                  chunk_rows,
+                                                                  **{kind: subject}),
+                                             expected)
+
+    def test_niqqud_only_removed_from_hebrew_tests(self):
+        for language in hebrew_sheets.LANGUAGES:
+            with_niqqud, _ = hebrew_sheets.render_study_sheet(EDGE_ROWS, language, True,
+                                                              lesson=self.lesson)
+            without, _ = hebrew_sheets.render_study_sheet(EDGE_ROWS, language, False,
+                                                          lesson=self.lesson)
+            self.assertEqual(with_niqqud == without, language != 'Hebrew')
+            self.assertEqual('&nbsp &nbsp שלום</td>' in without, language == 'Hebrew')
+
+    def test_returns_the_row_count(self):
+        html, row_count = hebrew_sheets.render_study_sheet(EDGE_ROWS, 'English',
+                                                           category=self.category)
+        self.assertEqual(row_count, len(EDGE_ROWS))
+
+    def test_streamed_file(self):
+        with tempfile.TemporaryDirectory() as media, \
+             contextlib.closing(hebrew_db.open_database(self.path)) as connection:
+            path, row_count = hebrew_sheets.create_study_sheet(connection, media,
+                                                               'Hebrew',
+                                                               lesson=self.lesson)
+            with open(path, 'rb') as study_file:
+                written = study_file.read()
+        rows = self.rows['Hebrew', 'lesson']
+        self.assertEqual(row_count, len(rows))
+        self.assertEqual(written, old_study_sheet(rows, 'Hebrew', lesson=self.lesson))
+
+
+#====================================================================
+#                         StaleJobsTest
+#====================================================================
+class StaleJobsTest(unittest.TestCase):
+    """
+       Only the sheets whose rows, template or file changed since they
+      were last built are rebuilt.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.media = os.path.join(self.directory.name, 'Media')
+        os.mkdir(self.media)
+        self.path = copy_database(self.directory.name)
+        self.connection = hebrew_db.open_database(self.path)
+        jobs = hebrew_sheets.sheet_jobs(self.connection)
+        self.lesson_jobs = [job for job in jobs if job[0] == 'lesson'][:3]
+        self.category_jobs = [job for job in jobs if job[0] == 'category'][:3]
+        self.jobs = self.lesson_jobs + self.category_jobs
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def build(self, niqqud=True):
+        stale, unchanged = hebrew_sheets.stale_jobs(self.connection, self.media,
+                                                    self.jobs, niqqud)
+        entries = hebrew_sheets.build_sheets(self.path, self.media, stale, niqqud)
+        hebrew_sheets.record_builds(self.connection, entries)
+        return stale, unchanged
+
+    def stale(self, niqqud=True, force=False):
+        return [job for job, _ in hebrew_sheets.stale_jobs(self.connection, self.media,
+                                                           self.jobs, niqqud, force)[0]]
+
+    def test_everything_is_stale_at_first(self):
+        stale, unchanged = self.build()
+        self.assertEqual([job for job, _ in stale], self.jobs)
+        self.assertEqual(unchanged, 0)
+        self.assertEqual(self.stale(), [])
+
+    def test_force(self):
+        self.build()
+        self.assertEqual(self.stale(force=True), self.jobs)
+
+    def test_changed_rows(self):
+        self.build()
+        lesson = self.lesson_jobs[0][1]
+        audio_id = self.connection.execute('SELECT min(audio_id) FROM hebrew_audio'
+                                           ' WHERE lesson_id = (SELECT lesson_id FROM lesson'
+                                           '                     WHERE name = ?);',
+                                           (lesson,)).fetchone()[0]
+        categories = {row[0] for row in
+                      self.connection.execute('SELECT c.name FROM category c'
+                                              '  JOIN category_member cm'
+                                              '    ON cm.category_id = c.category_id'
+                                              ' WHERE cm.audio_id = ?;', (audio_id,))}
+        with hebrew_db.transaction(self.connection):
+            self.connection.execute("UPDATE hebrew_audio SET english = english || ' (changed)'"
+                                    ' WHERE audio_id = ?;', (audio_id,))
+        self.assertEqual(self.stale(),
+                         [job for job in self.jobs
+                          if job[1] == lesson or
+                             job[0] == 'category' and job[1] in categories])
+
+    def test_changed_file(self):
+        self.build()
+        job = self.category_jobs[1]
+        path = hebrew_sheets.sheet_path(self.media, job[2], category=job[1])
+        with open(path, 'a', encoding='utf8') as study_file:
+            study_file.write('\n')
+        self.assertEqual(self.stale(), [job])
+        os.remove(path)
+        self.assertEqual(self.stale(), [job])
+
+    def test_niqqud_only_changes_hebrew_tests(self):
+        self.build(niqqud=True)
+        self.assertEqual(self.stale(niqqud=False),
+                         [job for job in self.jobs if job[2] == 'Hebrew'])
+
+
+if __name__ == '__main__':
+    unittest.main()
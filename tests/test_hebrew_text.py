@@ -0,0 +1,78 @@
+"""
+   Tests of the text normalization in hebrew_text.
+"""
+
+import unittest
+
+import hebrew_text
+
+
+#====================================================================
+#                        RemoveNiqqudTest
+#====================================================================
+class RemoveNiqqudTest(unittest.TestCase):
+
+    def test_removes_vowels_and_dots(self):
+        self.assertEqual(hebrew_text.remove_niqqud('שָׁלוֹם'), 'שלום')
+        self.assertEqual(hebrew_text.remove_niqqud('בֹּקֶר טוֹב'), 'בקר טוב')
+
+    def test_replaces_dotted_presentation_forms(self):
+        self.assertEqual(hebrew_text.remove_niqqud('שׁלום'), 'שלום')
+        self.assertEqual(hebrew_text.remove_niqqud('בּית'), 'בית')
+        self.assertEqual(hebrew_text.remove_niqqud('פּה'), 'פה')
+
+    def test_keeps_other_text_and_strips(self):
+        self.assertEqual(hebrew_text.remove_niqqud('  good morning '), 'good morning')
+        self.assertEqual(hebrew_text.remove_niqqud(''), '')
+        self.assertIsNone(hebrew_text.remove_niqqud(None))
+
+    def test_column_matches_one_at_a_time(self):
+        column = ['שָׁלוֹם', None, ' שָׁנָה ', '', 'peace', 'כֶּלֶב',
+                  'שׁלום\u00A0', 'בּית – פּה', '\u05C4\u05C5ו\uFB4B']
+        self.assertEqual(hebrew_text.remove_niqqud_column(column),
+                         [hebrew_text.remove_niqqud(text) for text in column])
+
+    def test_column_with_other_text(self):
+        #  Text outside the characters handled in bulk
+        column = ['שָׁלוֹם', 'café', None, 'שׁלום 🙂 ']
+        self.assertEqual(hebrew_text.remove_niqqud_column(column),
+                         ['שלום', 'café', None, 'שלום 🙂'])
+
+    def test_contains_niqqud(self):
+        self.assertTrue(hebrew_text.contains_niqqud('שָׁלוֹם'))
+        self.assertFalse(hebrew_text.contains_niqqud('שלום'))
+
+
+#====================================================================
+#                         SearchKeyTest
+#====================================================================
+class SearchKeyTest(unittest.TestCase):
+
+    def test_ignores_niqqud_and_final_letters(self):
+        self.assertEqual(hebrew_text.search_key('שָׁלוֹם'), 'שלומ')
+        self.assertEqual(hebrew_text.search_key('שלום'), 'שלומ')
+        self.assertEqual(hebrew_text.search_key('שׁלום'), 'שלומ')
+        self.assertEqual(hebrew_text.search_key('אֶרֶץ'),
+                         hebrew_text.search_key('ארצ'))
+
+    def test_folds_case_and_white_space(self):
+        self.assertEqual(hebrew_text.search_key('  Good   MORNING '),
+                         'good morning')
+        self.assertEqual(hebrew_text.search_key('Café'),
+                         hebrew_text.search_key('cafe'))
+
+    def test_none(self):
+        self.assertIsNone(hebrew_text.search_key(None))
+
+    def test_prefix_range(self):
+        low, high = hebrew_text.prefix_range(hebrew_text.search_key('של'))
+        for text in ('שלום', 'שָׁלוֹם', 'שלחן', 'של'):
+            key = hebrew_text.search_key(text)
+            self.assertTrue(low <= key < high, text)
+        for text in ('שם', 'ש', 'שמלה', 'תלמיד'):
+            key = hebrew_text.search_key(text)
+            self.assertFalse(low <= key < high, text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+   Tests of the AudioRecords model behind the Audio and Topics
+  comboboxes in hebrew_widgets.
+"""
+
+import unittest
+
+import hebrew_widgets
+
+
+#_____________________________________
+#             topic_key
+#_____________________________________
+def topic_key(value):
+    """
+       The sort key of a 'topic | url_id' record, as the Topics
+      combobox orders them.
+    """
+    return value.split('|')[0].strip()
+
+
+#====================================================================
+#                        AudioRecordsTest
+#====================================================================
+class AudioRecordsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = hebrew_widgets.AudioRecords(
+            (1, 2, 3, 4, 5),
+            ('apple | 1', 'bread | 2', 'bread | 3', 'milk | 4', 'water | 5'),
+            topic_key)
+
+    def assertInOrder(self, records):
+        keys = [topic_key(english) for english in records.english]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(records.ids), len(records.english))
+
+    def test_insert_in_place(self):
+        self.assertEqual(self.records.insert(6, 'cheese | 6'), 3)
+        self.assertEqual(self.records.insert(7, 'bread | 7'), 3)
+        self.assertEqual(self.records.insert(8, 'aardvark | 8'), 0)
+        self.assertEqual(self.records.insert(9, 'zebra | 9'), 8)
+        self.assertInOrder(self.records)
+        self.assertEqual(list(self.records.ids), [8, 1, 2, 3, 7, 6, 4, 5, 9])
+
+    def test_update_moves_the_record(self):
+        self.assertEqual(self.records.update(0, 'tea | 1'), 3)
+        self.assertEqual(self.records.update(4, 'apple | 5'), 0)
+        self.assertInOrder(self.records)
+        self.assertEqual(list(self.records.ids), [5, 2, 3, 4, 1])
+
+    def test_find(self):
+        for index, (url_id, english) in enumerate(zip(self.records.ids,
+                                                      self.records.english)):
+            with self.subTest(english=english):
+                self.assertEqual(self.records.find(url_id, english), index)
+        #  A record whose English has changed is found by its ID
+        self.assertEqual(self.records.find(3, 'juice | 3'), 2)
+        self.assertEqual(self.records.find(99, 'bread | 99'), -1)
+
+    def test_delete(self):
+        self.records.delete(1)
+        self.assertEqual(list(self.records.ids), [1, 3, 4, 5])
+        self.assertEqual(self.records.find(3, 'bread | 3'), 1)
+
+    def test_unordered_records(self):
+        records = hebrew_widgets.AudioRecords((5, 1, 3), ('water', 'apple', 'bread'))
+        self.assertEqual(records.insert(2, 'aardvark'), 3)
+        self.assertEqual(records.update(0, 'wine'), 0)
+        self.assertEqual(records.find(1, 'apple'), 1)
+        self.assertEqual(list(records.ids), [5, 1, 3, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
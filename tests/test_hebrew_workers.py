@@ -0,0 +1,218 @@
+"""
+   Tests of the DbWorker and QueryPager in hebrew_workers.
+"""
+
+import contextlib
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+import hebrew_db
+import hebrew_workers
+
+from tests import copy_database
+
+AUDIO_QUERY = 'SELECT audio_id, english FROM hebrew_audio ORDER BY audio_id;'
+
+#  A query that runs until it's interrupted
+ENDLESS_QUERY = ('WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n)'
+                 ' SELECT count(*) FROM n;')
+
+
+#_____________________________________
+#           open_cursor
+#_____________________________________
+def open_cursor(connection):
+    """
+       Returns a cursor with rows still to fetch, leaving its
+      statement active on the connection.
+    """
+    cursor = connection.execute(AUDIO_QUERY)
+    cursor.fetchone()
+    return cursor
+
+
+#====================================================================
+#                         QueryPagerTest
+#====================================================================
+class QueryPagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = copy_database(self.directory.name, upgrade=False)
+        self.connection = hebrew_db.open_database(self.path)
+        self.expected = [tuple(row) for row in
+                         self.connection.execute(AUDIO_QUERY).fetchall()]
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def read_all(self, pager, count):
+        """
+           Opens the pager and fetches every page, checking that only
+          the last one is short, and returns all the rows.
+        """
+        columns, rows, done = pager.open(self.connection, count)
+        self.assertEqual(columns, ['audio_id', 'english'])
+        pages = [rows]
+        while not done:
+            rows, done = pager.fetch(self.connection, count)
+            pages.append(rows)
+        self.assertTrue(all(len(page) == count for page in pages[:-1]))
+        self.assertLess(len(pages[-1]), count)
+        self.assertIsNone(pager.cursor)
+        return [row for page in pages for row in page]
+
+    def test_pages_add_up_to_the_query(self):
+        for count in (1, 7, 100, hebrew_workers.PAGE_ROWS, len(self.expected),
+                      len(self.expected) + 1):
+            with self.subTest(count=count):
+                pager = hebrew_workers.QueryPager(AUDIO_QUERY)
+                self.assertEqual(self.read_all(pager, count), self.expected)
+
+    def test_parameters(self):
+        pager = hebrew_workers.QueryPager('SELECT audio_id, english FROM hebrew_audio'
+                                          ' WHERE audio_id <= ? ORDER BY audio_id;',
+                                          (self.expected[9][0],))
+        self.assertEqual(self.read_all(pager, 4), self.expected[:10])
+
+    def test_only_the_pages_asked_for_are_read(self):
+        pager = hebrew_workers.QueryPager(AUDIO_QUERY)
+        columns, rows, done = pager.open(self.connection, 10)
+        self.assertEqual(rows, self.expected[:10])
+        self.assertFalse(done)
+        rows, done = pager.fetch(self.connection, 5)
+        self.assertEqual(rows, self.expected[10:15])
+        pager.close(self.connection)
+        self.assertIsNone(pager.cursor)
+        self.assertGreater(pager.seconds, 0)
+
+    def test_statement_without_rows(self):
+        pager = hebrew_workers.QueryPager("UPDATE hebrew_audio SET english = english"
+                                          " WHERE audio_id <= ?;",
+                                          (self.expected[2][0],))
+        self.assertEqual(pager.open(self.connection), (None, [], True))
+        self.assertEqual(pager.changed, 3)
+        self.assertFalse(self.connection.in_transaction)
+
+    def test_committed(self):
+        pager = hebrew_workers.QueryPager("UPDATE hebrew_audio SET english = 'paged'"
+                                          ' WHERE audio_id = ?;', (self.expected[0][0],))
+        pager.open(self.connection)
+        with contextlib.closing(sqlite3.connect(self.path)) as other:
+            self.assertEqual(other.execute('SELECT english FROM hebrew_audio'
+                                           ' WHERE audio_id = ?;',
+                                           (self.expected[0][0],)).fetchone()[0],
+                             'paged')
+
+    def test_returning(self):
+        pager = hebrew_workers.QueryPager("UPDATE hebrew_audio SET english = english"
+                                          ' WHERE audio_id <= ? RETURNING audio_id;',
+                                          (self.expected[2][0],))
+        columns, rows, done = pager.open(self.connection)
+        self.assertEqual(columns, ['audio_id'])
+        self.assertEqual(sorted(rows), [row[:1] for row in self.expected[:3]])
+        self.assertTrue(done)
+        self.assertFalse(self.connection.in_transaction)
+
+    def test_own_connection(self):
+        #  Interrupting the connection the pager was opened with while
+        # its statement is between pages mustn't leave that connection
+        # interrupted.
+        pager = hebrew_workers.QueryPager(AUDIO_QUERY)
+        pager.open(self.connection, 10)
+        self.connection.interrupt()
+        self.assertEqual(self.connection.execute('SELECT count(*) FROM hebrew_audio;')
+                         .fetchone()[0], len(self.expected))
+        rows, done = pager.fetch(self.connection, 10)
+        self.assertEqual(rows, self.expected[10:20])
+        pager.close()
+        self.assertIsNone(pager.reader)
+
+    def test_interrupt(self):
+        pager = hebrew_workers.QueryPager(AUDIO_QUERY)
+        pager.open(self.connection, 10)
+        pager.interrupt()
+        with self.assertRaisesRegex(sqlite3.OperationalError, 'interrupted'):
+            pager.fetch(self.connection, 10)
+        pager.close()
+        pager.interrupt()
+        self.assertEqual(self.connection.execute('SELECT count(*) FROM hebrew_audio;')
+                         .fetchone()[0], len(self.expected))
+
+    def test_error(self):
+        pager = hebrew_workers.QueryPager('SELECT nothing FROM hebrew_audio;')
+        with self.assertRaises(sqlite3.OperationalError):
+            pager.open(self.connection)
+        self.assertIsNone(pager.cursor)
+
+    def test_on_the_db_worker(self):
+        worker = hebrew_workers.DbWorker(self.path)
+        try:
+            pager = hebrew_workers.QueryPager(AUDIO_QUERY)
+            columns, rows, done = worker.call(pager.open, 50, timeout=10)
+            pages = [rows]
+            while not done:
+                rows, done = worker.call(pager.fetch, 50, timeout=10)
+                pages.append(rows)
+        finally:
+            worker.stop()
+        self.assertEqual([row for page in pages for row in page], self.expected)
+
+
+#====================================================================
+#                          DbWorkerTest
+#====================================================================
+class DbWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.worker = hebrew_workers.DbWorker(copy_database(self.directory.name,
+                                                            upgrade=False))
+
+    def tearDown(self):
+        self.worker.stop()
+        self.directory.cleanup()
+
+    def wait_until_running(self, future):
+        while self.worker.running is not future:
+            self.assertFalse(future.done())
+            time.sleep(0.001)
+
+    def test_cancel_before_it_runs(self):
+        blocker = threading.Event()
+        self.worker.submit(lambda connection: blocker.wait(10))
+        future = self.worker.query(AUDIO_QUERY)
+        self.assertTrue(self.worker.cancel(future))
+        blocker.set()
+        self.assertTrue(future.cancelled())
+
+    def test_cancel_while_running(self):
+        future = self.worker.query(ENDLESS_QUERY)
+        self.wait_until_running(future)
+        self.assertTrue(self.worker.cancel(future))
+        with self.assertRaisesRegex(sqlite3.OperationalError, 'interrupted'):
+            future.result(10)
+        self.assertTrue(self.worker.call(hebrew_workers.fetch_all, AUDIO_QUERY,
+                                         timeout=10))
+
+    def test_statements_left_active_are_not_interrupted(self):
+        cursor = self.worker.call(open_cursor, timeout=10)
+        future = self.worker.query('WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL'
+                                   ' SELECT i + 1 FROM n WHERE i < 1000000)'
+                                   ' SELECT count(*) FROM n;')
+        self.wait_until_running(future)
+        self.assertFalse(self.worker.cancel(future))
+        self.assertEqual(future.result(10)[0][0], 1000000)
+        self.assertTrue(self.worker.call(lambda connection: cursor.fetchmany(10),
+                                         timeout=10))
+        self.worker.call(lambda connection: cursor.close(), timeout=10)
+        self.assertEqual(self.worker.call(lambda connection:
+                                          connection.active_statements, timeout=10), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()